@@ -16,10 +16,14 @@
 import importlib
 from abc import ABCMeta, abstractmethod
 from collections import deque
+from threading import BoundedSemaphore, Lock
+from time import sleep, time
+from urllib.parse import urlparse
 
 from oc.index.identifier.issn import ISSNManager
 from oc.index.identifier.orcid import ORCIDManager
 from oc.index.utils.config import get_config
+from oc.index.utils.pipeline import batches, parallel_map
 
 
 class ResourceFinder(metaclass=ABCMeta):
@@ -28,14 +32,17 @@ class ResourceFinder(metaclass=ABCMeta):
     the signatures of the methods that should be implemented, and a basic
     constructor."""
 
-    def __init__(self, data={}, use_api_service=True, id_type="doi"):
+    def __init__(self, data={}, use_api_service=True, id_type="doi", session=None):
         """Resource finder constructor.
 
         Args:
             data (dict): support data to use prior to api.
             use_api_service (bool): true whenever you want make use of api, false otherwise.
+            session (requests.Session, optional): session used to query the api, if
+            None the one shared by the process is used.
         """
         self._data = data
+        self._session = session
 
         config = get_config()
         module, classname = config.get("identifier", id_type).split(":")
@@ -43,7 +50,7 @@ class ResourceFinder(metaclass=ABCMeta):
             importlib.import_module(module), classname
         )
 
-        self._dm = self.__id_type_manager_class(data, use_api_service)
+        self._dm = self.__id_type_manager_class(data, use_api_service, session=session)
         self._im = ISSNManager()
         self._om = ORCIDManager()
 
@@ -214,6 +221,30 @@ class ApiDOIResourceFinder(ResourceFinder, metaclass=ABCMeta):
         """
         return self._dm.normalise(id_string, include_prefix=True)
 
+    def fetch(self, id_string, valid=None):
+        """It retrieves all the support information of an id through the api,
+        without looking at the support data.
+
+        Args:
+            id_string (str): the id
+            valid (bool, optional): the validity of the id if already known, if
+            None it is checked through the identifier manager. Defaults to None.
+
+        Returns:
+            dict: the support information, in the form of a data source row.
+        """
+        result = {"valid": False, "date": None, "issn": [], "orcid": []}
+        if valid is None:
+            valid = self._dm.is_valid(id_string)
+        if valid:
+            result["valid"] = True
+            json_obj = self._call_api(self.normalise(id_string))
+            if json_obj is not None:
+                result["date"] = self._get_date(json_obj)
+                result["issn"] = list(self._get_issn(json_obj))
+                result["orcid"] = list(self._get_orcid(json_obj))
+        return result
+
     def _get_item(self, doi_entity, column):
         if self.is_valid(doi_entity):
             doi = self.normalise(doi_entity)
@@ -233,6 +264,30 @@ class ApiDOIResourceFinder(ResourceFinder, metaclass=ABCMeta):
             return self._data[doi][column]
 
 
+class _HostLimiter(object):
+    """It limits the number of concurrent requests to a host and their rate."""
+
+    def __init__(self, concurrency, rate):
+        self.__semaphore = BoundedSemaphore(concurrency)
+        self.__interval = 1 / rate if rate > 0 else 0
+        self.__lock = Lock()
+        self.__next = 0
+
+    def __enter__(self):
+        self.__semaphore.acquire()
+        if self.__interval:
+            with self.__lock:
+                now = time()
+                wait = self.__next - now
+                self.__next = max(now, self.__next) + self.__interval
+            if wait > 0:
+                sleep(wait)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.__semaphore.release()
+
+
 class ResourceFinderHandler(object):
     """This class allows one to use multiple resource finders at the same time
     so as to find the information needed for the creation of the citations to
@@ -246,6 +301,102 @@ class ResourceFinderHandler(object):
         """
         self.resource_finders = resource_finders
 
+    def prefetch(self, ids, workers=8, host_workers=4, rate=0):
+        """It retrieves in parallel, through the api of the resource finders, the
+        support information of the ids that are not in the support data yet, and
+        adds it to the support data of the finders. In this way the following
+        calls to get_date, share_issn and share_orcid for these ids do not query
+        any api. Each id is validated only once, then the information found by all
+        the finders for the valid ids is merged: the date is the first one found,
+        issn and orcid are the union of the ones found.
+
+        Args:
+            ids (iterable): the ids to retrieve
+            workers (int, optional): maximum number of concurrent requests.
+            Defaults to 8.
+            host_workers (int, optional): maximum number of concurrent requests to
+            the same host. Defaults to 4.
+            rate (float, optional): maximum number of requests per second to the
+            same host, no limit if 0. Defaults to 0.
+
+        Returns:
+            dict: the support information retrieved for each id, including the
+            invalid ones.
+        """
+        finders = [
+            finder
+            for finder in self.resource_finders
+            if isinstance(finder, ApiDOIResourceFinder) and finder._use_api_service
+        ]
+        ids = [
+            id_string
+            for id_string in set(ids)
+            if any(finder._data.get(id_string) is None for finder in finders)
+        ]
+        if not finders or not ids:
+            return {}
+
+        # All the finders use the same kind of identifier manager
+        id_manager = finders[0]._dm
+        limiters = {}
+        for url in [getattr(id_manager, "_api", "")] + [f._api for f in finders]:
+            host = urlparse(url).netloc
+            if host not in limiters:
+                limiters[host] = _HostLimiter(host_workers, rate)
+
+        def validate(id_string):
+            with limiters[urlparse(getattr(id_manager, "_api", "")).netloc]:
+                try:
+                    return id_manager.is_valid(id_string)
+                except Exception:
+                    # The id will be checked again when needed
+                    return None
+
+        def fetch(task):
+            finder, id_string = task
+            with limiters[urlparse(finder._api).netloc]:
+                try:
+                    return finder.fetch(id_string, True)
+                except Exception:
+                    # The id will be retrieved again when needed
+                    return None
+
+        result = {}
+        valid_ids = []
+        for id_string, valid in zip(
+            ids, parallel_map(validate, ids, workers, threads=True)
+        ):
+            if valid:
+                valid_ids.append(id_string)
+            elif valid is not None:
+                result[id_string] = {
+                    "valid": False,
+                    "date": None,
+                    "issn": [],
+                    "orcid": [],
+                }
+
+        tasks = ((finder, id_string) for id_string in valid_ids for finder in finders)
+        rows = parallel_map(fetch, tasks, workers, threads=True)
+        for id_string, id_rows in zip(valid_ids, batches(rows, len(finders))):
+            if None in id_rows:
+                continue
+            row = {"valid": True, "date": None, "issn": [], "orcid": []}
+            for finder_row in id_rows:
+                if row["date"] is None:
+                    row["date"] = finder_row["date"]
+                for column in ("issn", "orcid"):
+                    for value in finder_row[column]:
+                        if value not in row[column]:
+                            row[column].append(value)
+            result[id_string] = row
+
+        for id_string, row in result.items():
+            for finder in finders:
+                finder._data[id_string] = row
+
+        return result
+
     def get_date(self, id_string):
         """_summary_
 
@@ -13,21 +13,21 @@
 # ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
 # SOFTWARE.
 
-from requests import get
 from datetime import datetime
 
 from urllib.parse import quote
 
 import oc.index.utils.dictionary as dict_utils
 from oc.index.finder.base import ApiDOIResourceFinder
+from oc.index.utils.cache import cached_get
 
 
 class CrossrefResourceFinder(ApiDOIResourceFinder):
     """This class implements an api doi resource finder for crossref"""
 
-    def __init__(self, data={}, use_api_service=True):
+    def __init__(self, data={}, use_api_service=True, session=None):
         """Crossref resource finder constructor."""
-        super().__init__(data, use_api_service)
+        super().__init__(data, use_api_service, session=session)
         self._api = "https://api.crossref.org/works/"
 
     def _get_orcid(self, json_obj):
@@ -84,7 +84,12 @@ class CrossrefResourceFinder(ApiDOIResourceFinder):
     def _call_api(self, doi_full):
         if self._use_api_service:
             doi = self._dm.normalise(doi_full)
-            r = get(self._api + quote(doi), headers=self._headers, timeout=30)
+            r = cached_get(
+                self._api + quote(doi),
+                headers=self._headers,
+                timeout=30,
+                session=self._session,
+            )
             if r.status_code == 200:
                 r.encoding = "utf-8"
                 return r.json().get("message")
@@ -15,18 +15,18 @@
 
 from json import loads
 from urllib.parse import quote
-from requests import get
 
 import oc.index.utils.dictionary as dict_utils
 from oc.index.finder.base import ApiDOIResourceFinder
+from oc.index.utils.cache import cached_get
 
 
 class DataCiteResourceFinder(ApiDOIResourceFinder):
     """This class implements an identifier manager for data cite identifier"""
 
-    def __init__(self, data={}, use_api_service=True):
+    def __init__(self, data={}, use_api_service=True, session=None):
         """Data cite resource finder constructor."""
-        super().__init__(data, use_api_service=use_api_service)
+        super().__init__(data, use_api_service=use_api_service, session=session)
         self._api = "https://api.datacite.org/dois/"
 
     def _get_orcid(self, json_obj):
@@ -86,7 +86,12 @@ class DataCiteResourceFinder(ApiDOIResourceFinder):
     def _call_api(self, doi_entity):
         if self._use_api_service:
             doi = self._dm.normalise(doi_entity)
-            r = get(self._api + quote(doi), headers=self._headers, timeout=30)
+            r = cached_get(
+                self._api + quote(doi),
+                headers=self._headers,
+                timeout=30,
+                session=self._session,
+            )
             if r.status_code == 200:
                 r.encoding = "utf-8"
                 json_res = loads(r.text)
@@ -13,7 +13,6 @@
 # ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
 # SOFTWARE.
 
-from requests import get
 from datetime import datetime
 import re
 from urllib.parse import quote
@@ -21,14 +20,17 @@ from bs4 import BeautifulSoup
 
 import oc.index.utils.dictionary as dict_utils
 from oc.index.finder.base import ApiDOIResourceFinder
+from oc.index.utils.cache import cached_get
 
 
 class NIHResourceFinder(ApiDOIResourceFinder):
     """This class implements an api doi resource finder for crossref"""
 
-    def __init__(self, data={}, use_api_service=True):
+    def __init__(self, data={}, use_api_service=True, session=None):
         """National Institute of Health resource finder constructor."""
-        super().__init__(data, use_api_service=use_api_service, id_type="pmid")
+        super().__init__(
+            data, use_api_service=use_api_service, id_type="pmid", session=session
+        )
         self._api = "https://pubmed.ncbi.nlm.nih.gov/"
 
     def _get_issn(self, txt_obj):
@@ -78,10 +80,11 @@ class NIHResourceFinder(ApiDOIResourceFinder):
     def _call_api(self, pmid_full):
         if self._use_api_service:
             pmid = self._dm.normalise(pmid_full)
-            r = get(
+            r = cached_get(
                 self._api + quote(pmid) + "/?format=pubmed",
                 headers=self._headers,
                 timeout=30,
+                session=self._session,
             )
             if r.status_code == 200:
                 r.encoding = "utf-8"
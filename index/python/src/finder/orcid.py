@@ -13,18 +13,18 @@
 # ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
 # SOFTWARE.
 
-from requests import get
 from urllib.parse import quote
 from json import loads
 
 
 from oc.index.finder.base import ApiDOIResourceFinder
+from oc.index.utils.cache import cached_get
 
 
 class ORCIDResourceFinder(ApiDOIResourceFinder):
     """This class implements an identifier manager for orcid identifier"""
 
-    def __init__(self, data={}, use_api_service=True, api_key=None):
+    def __init__(self, data={}, use_api_service=True, api_key=None, session=None):
         """ORCID resource finder constructor.
 
         Args:
@@ -34,8 +34,10 @@ class ORCIDResourceFinder(ApiDOIResourceFinder):
             doi (str, optional): path to doi file. Defaults to None.
             use_api_service (bool, optional): true if you want to use api service. Defaults to True.
             key (str, optional): api key. Defaults to None.
+            session (requests.Session, optional): session used to query the api.
+            Defaults to None.
         """
-        super().__init__(data, use_api_service=use_api_service)
+        super().__init__(data, use_api_service=use_api_service, session=session)
         self._api = "https://pub.orcid.org/v2.1/search?q="
         self._api_key = api_key
 
@@ -59,11 +61,12 @@ class ORCIDResourceFinder(ApiDOIResourceFinder):
             self._headers["Content-Type"] = "application/json"
 
             doi = self._dm.normalise(doi_full)
-            r = get(
+            r = cached_get(
                 self._api
                 + quote('doi-self:"%s" OR doi-self:"%s"' % (doi, doi.upper())),
                 headers=self._headers,
                 timeout=30,
+                session=self._session,
             )
             if r.status_code == 200:
                 r.encoding = "utf-8"
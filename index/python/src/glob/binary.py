@@ -0,0 +1,344 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import heapq
+import json
+import mmap
+import os
+
+from csv import reader
+from itertools import chain, groupby
+from shutil import copyfileobj
+from struct import Struct
+from tempfile import TemporaryDirectory
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from oc.index.utils.config import get_config
+from oc.index.utils.pipeline import batches
+from oc.index.glob.datasource import DataSource
+
+_header = Struct("<4sIQ")
+_offset = Struct("<Q")
+_key_length = Struct("<H")
+_value_length = Struct("<I")
+_magic = b"OCDS"
+_version = 1
+
+
+class BinaryDataSource(DataSource):
+    """This class implements a read-mostly data source on a binary file, built
+    once from the glob CSV files with build. The file contains the entries sorted
+    by id, preceded by a table of their offsets, and it is memory-mapped: opening
+    it does not load anything and each lookup is a binary search on the file
+    pages, which are shared by all the processes using the same file. The entries
+    added with set and mset are appended to a log file next to the binary one,
+    which overrides it and is merged into it by the following build. The log is
+    shared by all the processes using the same file: it is written while holding
+    an exclusive lock, and the entries added by the other processes are loaded
+    by each mset and by each lookup of a missing id."""
+
+    def __init__(self, path=None):
+        """Binary data source constructor.
+
+        Args:
+            path (str, optional): path to the binary file, if None it is read from
+            the section binary of the configuration. Defaults to None.
+        """
+        if path is None:
+            path = os.path.expanduser(get_config().get("binary", "path"))
+        self._path = path
+        self._new = {}
+        self._log = None
+        self._log_offset = 0
+        self.__sync_log()
+
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count = _header.unpack_from(self._mm, 0)
+        if magic != _magic or version != _version:
+            raise ValueError(path + " is not a valid binary data source")
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._mm.close()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def get(self, resource_id):
+        if resource_id in self._new:
+            return self._new[resource_id]
+        value = self.__find(resource_id)
+        if value is None:
+            # It may have been added by another process in the meantime
+            self.__sync_log()
+            value = self._new.get(resource_id)
+        return value
+
+    def mget(self, resources_id):
+        return {key: self.get(key) for key in resources_id}
+
+    def set(self, resource_id, value):
+        return self.mset({resource_id: value})
+
+    def mset(self, resources):
+        resources = {
+            key: BinaryDataSource.__normalise(value) for key, value in resources.items()
+        }
+        self.__sync_log(
+            "".join(
+                json.dumps([key, value]) + "\n" for key, value in resources.items()
+            ).encode("utf-8")
+        )
+        self._new.update(resources)
+
+    def __sync_log(self, data=b""):
+        # The entries appended by the other processes are loaded and the new ones,
+        # if any, are appended while holding an exclusive lock, so that the lines
+        # of different processes are never interleaved
+        if self._log is None:
+            if not data and not os.path.exists(self._path + ".log"):
+                return
+            self._log = open(self._path + ".log", "a+b")
+        f = self._log
+        if not data and os.fstat(f.fileno()).st_size <= self._log_offset:
+            return
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX if data else fcntl.LOCK_SH)
+        try:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size > self._log_offset:
+                f.seek(self._log_offset)
+                tail = f.read(size - self._log_offset).decode("utf-8")
+                for key, value in BinaryDataSource.__parse_log(tail.splitlines()):
+                    self._new[key] = value
+            if data:
+                f.write(data)
+                f.flush()
+            self._log_offset = f.tell()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __find(self, resource_id):
+        key = resource_id.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            offset = _offset.unpack_from(
+                self._mm, _header.size + _offset.size * middle
+            )[0]
+            key_length = _key_length.unpack_from(self._mm, offset)[0]
+            offset += _key_length.size
+            current = self._mm[offset : offset + key_length]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                offset += key_length
+                value_length = _value_length.unpack_from(self._mm, offset)[0]
+                offset += _value_length.size
+                return BinaryDataSource.__decode(
+                    self._mm[offset : offset + value_length]
+                )
+
+    @staticmethod
+    def build(
+        path,
+        valid=None,
+        date=None,
+        issn=None,
+        orcid=None,
+        identifier=None,
+        run_size=1000000,
+    ):
+        """It builds the binary file of a data source from the glob CSV files,
+        merging the entries in its log file, if any. The rows of the files are
+        sorted externally, in runs of at most 'run_size' rows stored in temporary
+        files next to the binary one, and then merged, so that only one entry at a
+        time is kept in memory.
+
+        Args:
+            path (str): path to the binary file to create
+            valid (str, optional): path to the CSV with the valid ids
+            date (str, optional): path to the CSV with the dates of the ids
+            issn (str, optional): path to the CSV with the ISSNs of the ids
+            orcid (str, optional): path to the CSV with the ORCIDs of the ids
+            identifier (str, optional): prefix added to the ids that do not have
+            it, e.g. doi
+            run_size (int, optional): maximum number of rows sorted in memory.
+            Defaults to 1000000.
+
+        Returns:
+            int: the number of entries stored.
+        """
+        log_path = path + ".log"
+        rows = chain(
+            (
+                (key, column, value)
+                for column, csv_path in (
+                    ("valid", valid),
+                    ("date", date),
+                    ("issn", issn),
+                    ("orcid", orcid),
+                )
+                for key, value in BinaryDataSource.__read_csv(csv_path, identifier)
+            ),
+            (
+                (key, "log", value)
+                for key, value in BinaryDataSource.__read_log(log_path)
+            ),
+        )
+
+        tmp_path = path + ".tmp"
+        count = 0
+        with TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as tmp_dir:
+            # The records are written once the number of entries, and then the
+            # size of the table of their offsets, is known
+            records_path = os.path.join(tmp_dir, "records")
+            offsets_path = os.path.join(tmp_dir, "offsets")
+            with open(records_path, "wb") as records, open(
+                offsets_path, "wb"
+            ) as offsets:
+                offset = 0
+                for key, value in BinaryDataSource.__merge_rows(
+                    rows, tmp_dir, run_size
+                ):
+                    record = BinaryDataSource.__encode(key.encode("utf-8"), value)
+                    offsets.write(_offset.pack(offset))
+                    records.write(record)
+                    offset += len(record)
+                    count += 1
+
+            table_size = _header.size + _offset.size * count
+            with open(tmp_path, "wb") as f:
+                f.write(_header.pack(_magic, _version, count))
+                with open(offsets_path, "rb") as offsets:
+                    block = offsets.read(_offset.size * 65536)
+                    while block:
+                        f.write(
+                            b"".join(
+                                _offset.pack(offset + table_size)
+                                for (offset,) in _offset.iter_unpack(block)
+                            )
+                        )
+                        block = offsets.read(_offset.size * 65536)
+                with open(records_path, "rb") as records:
+                    copyfileobj(records, f, 1048576)
+
+        os.replace(tmp_path, path)
+        if os.path.exists(log_path):
+            os.remove(log_path)
+
+        return count
+
+    @staticmethod
+    def __merge_rows(rows, tmp_dir, run_size):
+        # Each row is numbered, so that the rows of an id are merged in the
+        # order of the files, as if they were read one after the other
+        runs = []
+        for run in batches(enumerate(rows), run_size):
+            run.sort(key=lambda row: (row[1][0], row[0]))
+            run_path = os.path.join(tmp_dir, "run_%d" % len(runs))
+            with open(run_path, "w", encoding="utf-8") as f:
+                for idx, (key, column, value) in run:
+                    f.write(json.dumps([key, idx, column, value]) + "\n")
+            runs.append(run_path)
+
+        files = [open(run_path, encoding="utf-8") for run_path in runs]
+        try:
+            merged = heapq.merge(
+                *[map(json.loads, f) for f in files], key=lambda row: row[:2]
+            )
+            for key, group in groupby(merged, key=lambda row: row[0]):
+                entry = {"date": None, "valid": False, "issn": [], "orcid": []}
+                for _, _, column, value in group:
+                    if column == "valid":
+                        entry["valid"] = value == "v"
+                    elif column == "date":
+                        entry["date"] = value
+                    elif column == "log":
+                        entry = value
+                    elif value not in entry[column]:
+                        entry[column].append(value)
+                yield key, entry
+        finally:
+            for f in files:
+                f.close()
+
+    @staticmethod
+    def __read_csv(csv_path, identifier):
+        if csv_path is not None and os.path.exists(csv_path):
+            with open(csv_path, encoding="utf-8") as f:
+                csv_reader = reader(f)
+                next(csv_reader, None)
+                for row in csv_reader:
+                    if len(row) >= 2 and row[0] and row[1]:
+                        key = row[0]
+                        if identifier is not None and identifier not in key:
+                            key = identifier + ":" + key
+                        yield key, row[1].strip()
+
+    @staticmethod
+    def __read_log(log_path):
+        if os.path.exists(log_path):
+            with open(log_path, encoding="utf-8") as f:
+                yield from BinaryDataSource.__parse_log(f)
+
+    @staticmethod
+    def __parse_log(lines):
+        for line in lines:
+            if line.strip():
+                key, value = json.loads(line)
+                yield key, value
+
+    @staticmethod
+    def __normalise(value):
+        return {
+            "date": value.get("date") or None,
+            "valid": bool(value.get("valid")),
+            "issn": list(value.get("issn") or []),
+            "orcid": list(value.get("orcid") or []),
+        }
+
+    @staticmethod
+    def __encode(key, value):
+        value = "\t".join(
+            (
+                "1" if value["valid"] else "0",
+                value["date"] or "",
+                " ".join(value["issn"]),
+                " ".join(value["orcid"]),
+            )
+        ).encode("utf-8")
+        return _key_length.pack(len(key)) + key + _value_length.pack(len(value)) + value
+
+    @staticmethod
+    def __decode(value):
+        valid, date, issn, orcid = value.decode("utf-8").split("\t")
+        return {
+            "date": date or None,
+            "valid": valid == "1",
+            "issn": issn.split(),
+            "orcid": orcid.split(),
+        }
@@ -18,6 +18,7 @@ import json
 from oc.index.utils.config import get_config
 from oc.index.glob.datasource import DataSource
 from oc.index.legacy.csv import CSVManager
+from oc.index.utils.logging import get_logger
 
 
 class CSVDataSource(DataSource):
@@ -27,6 +28,24 @@ class CSVDataSource(DataSource):
         self._id_orcid = CSVManager(csv_path=get_config().get("csv", "id_orcid"))
         self._id_issn = CSVManager(csv_path=get_config().get("csv", "id_issn"))
 
+        logger = get_logger()
+        for csv_manager in (
+            self._valid_doi,
+            self._id_date,
+            self._id_orcid,
+            self._id_issn,
+        ):
+            logger.info(
+                "Loaded %d rows (%.1f MB) of %s in %.2f s, %.1f MB/s"
+                % (
+                    csv_manager.loaded_rows,
+                    csv_manager.loaded_bytes / 1048576,
+                    csv_manager.csv_path,
+                    csv_manager.load_time,
+                    csv_manager.load_throughput / 1048576,
+                )
+            )
+
     def get(self, resource_id):
         entry = self.new()
         entry["valid"] = self._valid_doi.get_value(resource_id)
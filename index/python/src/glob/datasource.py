@@ -40,3 +40,26 @@ class DataSource(metaclass=ABCMeta):
     @abstractmethod
     def mset(self, resources):
         pass
+
+    def update(self, column, values, append=False):
+        """It updates the same column of the entries of several resources, creating
+        the entries that do not exist.
+
+        Args:
+            column (str): the column to update, i.e. date, valid, issn or orcid
+            values (list): pairs of resource id and value to set
+            append (bool, optional): True if the values have to be added to the
+            list of values of the column, if not already there. Defaults to False.
+        """
+        entries = self.mget(list(set(key for key, _ in values)))
+        for key, value in values:
+            entry = entries[key]
+            if entry is None:
+                entry = self.new()
+                entries[key] = entry
+            if append:
+                if not value in entry[column]:
+                    entry[column].append(value)
+            else:
+                entry[column] = value
+        self.mset(entries)
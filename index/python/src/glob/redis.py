@@ -19,26 +19,205 @@ import json
 from oc.index.utils.config import get_config
 from oc.index.glob.datasource import DataSource
 
+# Fields of the redis hashes storing the entries, for each column
+_fields = {"valid": "v", "date": "d", "issn": "i", "orcid": "o"}
+
+# It updates a field of the hashes in KEYS with the values in ARGV, after the
+# field name and the append flag. Entries still stored as JSON strings are
+# converted to hashes first.
+_update_script = """
+local field = ARGV[1]
+local append = ARGV[2] == '1'
+for i, key in ipairs(KEYS) do
+    local value = ARGV[i + 2]
+    if redis.call('TYPE', key).ok == 'string' then
+        local row = cjson.decode(redis.call('GET', key))
+        redis.call('DEL', key)
+        redis.call('HSET', key, 'v', row.valid == true and '1' or '0')
+        if type(row.date) == 'string' and row.date ~= '' then
+            redis.call('HSET', key, 'd', row.date)
+        end
+        for f, column in pairs({i = 'issn', o = 'orcid'}) do
+            if type(row[column]) == 'table' and #row[column] > 0 then
+                redis.call('HSET', key, f, table.concat(row[column], ' '))
+            end
+        end
+    end
+    local current = false
+    if append then
+        current = redis.call('HGET', key, field)
+    end
+    if not current then
+        redis.call('HSET', key, field, value)
+    elseif not string.find(' ' .. current .. ' ', ' ' .. value .. ' ', 1, true) then
+        redis.call('HSET', key, field, current .. ' ' .. value)
+    end
+    redis.call('HSETNX', key, 'v', '0')
+end
+return #KEYS
+"""
+
 
 class RedisDataSource(DataSource):
-    def __init__(self):
-        self._r = redis.Redis(
-            host=get_config().get("redis", "host"),
-            port=get_config().get("redis", "port"),
-            db=get_config().get("redis", "db"),
+    """This class implements a data source on Redis. Each entry can be stored as a
+    JSON string (json encoding) or as a hash with a short field for each column
+    (hash encoding), where lists are stored as space separated values. Hashes
+    take much less memory and are cheaper to decode, and allow update to work
+    on the server through a Lua script, without reading the entries first.
+    Entries stored as JSON strings are always readable, so that an existing
+    database can be migrated while in use."""
+
+    ENCODINGS = ("json", "hash")
+
+    def __init__(self, connection=None, encoding=None, use_lua=None):
+        """Redis data source constructor.
+
+        Args:
+            connection (redis.Redis, optional): the connection to use, if None it is
+            created from the configuration. Defaults to None.
+            encoding (str, optional): json or hash, if None it is read from the
+            configuration. Defaults to None.
+            use_lua (bool, optional): true whenever update has to use a Lua script
+            for the hash encoding, if None it is read from the configuration.
+            Defaults to None.
+        """
+        config = get_config()
+        if connection is None:
+            connection = redis.Redis(
+                host=config.get("redis", "host"),
+                port=config.get("redis", "port"),
+                db=config.get("redis", "db"),
+            )
+        if encoding is None:
+            encoding = config.get("redis", "encoding", fallback="json")
+        if encoding not in self.ENCODINGS:
+            raise ValueError(
+                encoding
+                + " is not a valid encoding, use "
+                + " or ".join(self.ENCODINGS)
+            )
+        if use_lua is None:
+            use_lua = config.getboolean("redis", "lua", fallback=True)
+
+        self._r = connection
+        self._encoding = encoding
+        self._update_script = (
+            self._r.register_script(_update_script) if use_lua else None
         )
 
     def get(self, resource_id):
-        return json.loads(self._r.get(resource_id))
+        return self.mget([resource_id])[resource_id]
 
     def mget(self, resources_id):
-        return {
-            resources_id[i]: json.loads(v) if not v is None else None
-            for i, v in enumerate(self._r.mget(resources_id))
-        }
+        if self._encoding == "json":
+            return {
+                resources_id[i]: json.loads(v) if not v is None else None
+                for i, v in enumerate(self._r.mget(resources_id))
+            }
+
+        pipeline = self._r.pipeline(transaction=False)
+        for resource_id in resources_id:
+            pipeline.hgetall(resource_id)
+        result = {}
+        legacy = []
+        for i, v in enumerate(pipeline.execute(raise_on_error=False)):
+            if isinstance(v, redis.ResponseError):
+                # Entry still stored as a JSON string
+                legacy.append(resources_id[i])
+            else:
+                result[resources_id[i]] = self.__decode(v)
+        if legacy:
+            for i, v in enumerate(self._r.mget(legacy)):
+                result[legacy[i]] = json.loads(v) if not v is None else None
+        return result
 
     def set(self, resource_id, value):
-        return self._r.set(resource_id, json.dumps(value))
+        return self.mset({resource_id: value})
 
     def mset(self, resources):
-        return self._r.mset({k: json.dumps(v) for k, v in resources.items()})
+        if self._encoding == "json":
+            return self._r.mset({k: json.dumps(v) for k, v in resources.items()})
+
+        pipeline = self._r.pipeline(transaction=False)
+        for key, value in resources.items():
+            pipeline.delete(key)
+            pipeline.hset(key, mapping=self.__encode(value))
+        pipeline.execute()
+        return True
+
+    def update(self, column, values, append=False):
+        if self._encoding == "json" or self._update_script is None:
+            return super().update(column, values, append)
+
+        if not values:
+            return
+        keys = []
+        args = [_fields[column], "1" if append else "0"]
+        for key, value in values:
+            keys.append(key)
+            args.append(self.__encode_value(column, value))
+        self._update_script(keys=keys, args=args)
+
+    def migrate(self, batch_size=10000):
+        """It converts to hashes all the entries stored as JSON strings.
+
+        Args:
+            batch_size (int, optional): number of entries converted at a time.
+            Defaults to 10000.
+
+        Returns:
+            int: the number of entries converted.
+        """
+        migrated = 0
+        keys = []
+        for key in self._r.scan_iter(count=batch_size, _type="string"):
+            keys.append(key)
+            if len(keys) >= batch_size:
+                migrated += self.__migrate_keys(keys)
+                keys = []
+        if keys:
+            migrated += self.__migrate_keys(keys)
+        return migrated
+
+    def __migrate_keys(self, keys):
+        pipeline = self._r.pipeline(transaction=False)
+        migrated = 0
+        for i, v in enumerate(self._r.mget(keys)):
+            if v is not None:
+                pipeline.delete(keys[i])
+                pipeline.hset(keys[i], mapping=self.__encode(json.loads(v)))
+                migrated += 1
+        pipeline.execute()
+        return migrated
+
+    @staticmethod
+    def __encode_value(column, value):
+        if column == "valid":
+            return "1" if value else "0"
+        if isinstance(value, str):
+            return value
+        return " ".join(value) if column in ("issn", "orcid") else str(value)
+
+    @staticmethod
+    def __encode(value):
+        mapping = {"v": RedisDataSource.__encode_value("valid", value.get("valid"))}
+        for column in ("date", "issn", "orcid"):
+            if value.get(column):
+                mapping[_fields[column]] = RedisDataSource.__encode_value(
+                    column, value[column]
+                )
+        return mapping
+
+    @staticmethod
+    def __decode(mapping):
+        if not mapping:
+            return None
+        date = mapping.get(b"d")
+        issn = mapping.get(b"i")
+        orcid = mapping.get(b"o")
+        return {
+            "date": date.decode("utf-8") if date else None,
+            "valid": mapping.get(b"v") == b"1",
+            "issn": issn.decode("utf-8").split() if issn else [],
+            "orcid": orcid.decode("utf-8").split() if orcid else [],
+        }
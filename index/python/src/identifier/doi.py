@@ -13,23 +13,23 @@
 # ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
 # SOFTWARE.
 
-from re import sub, match
+from re import sub, match, DOTALL
 from urllib.parse import unquote, quote
-from requests import get
 from json import loads
 from requests import ReadTimeout
 from requests.exceptions import ConnectionError
-from time import sleep
 
 from oc.index.identifier.base import IdentifierManager
+from oc.index.utils.cache import cached_get
 
 
 class DOIManager(IdentifierManager):
     """This class implements an identifier manager for doi identifier"""
 
-    def __init__(self, data={}, use_api_service=True):
+    def __init__(self, data={}, use_api_service=True, session=None):
         """DOI manager constructor."""
         super().__init__()
+        self._session = session
         self._api = "https://doi.org/api/handles/"
         self._use_api_service = use_api_service
         self._p = "doi:"
@@ -75,23 +75,49 @@ class DOIManager(IdentifierManager):
             # Any error in processing the DOI will return None
             return None
 
+    def normalise_series(self, series, include_prefix=False):
+        """It returns all the dois of a pandas Series normalized, in the same way
+        as normalise but through vectorized string operations.
+
+        Args:
+            series (pandas.Series): the dois to normalize.
+            include_prefix (bool, optional): indicates if include the prefix. Defaults to False.
+
+        Returns:
+            pandas.Series: the normalized dois, None for the ones that cannot be
+            normalized
+        """
+        dois = series.fillna("").astype(str).str.extract("(10\\..*)", flags=DOTALL)[0]
+        quoted = dois.str.contains("%", regex=False, na=False)
+        if quoted.any():
+            dois[quoted] = dois[quoted].map(unquote)
+        dois = (
+            dois.str.replace("\\s+", "", regex=True)
+            .str.replace("\0", "", regex=False)
+            .str.lower()
+            .str.strip()
+            .astype(object)
+        )
+        if include_prefix:
+            dois = self._p + dois
+        return dois.where(dois.notna(), None)
+
     def __doi_exists(self, doi_full):
         if self._use_api_service:
             doi = self.normalise(doi_full)
-            tentative = 3
-            while tentative:
-                tentative -= 1
-                try:
-                    r = get(self._api + quote(doi), headers=self._headers, timeout=30)
-                    if r.status_code == 200:
-                        r.encoding = "utf-8"
-                        json_res = loads(r.text)
-                        return json_res.get("responseCode") == 1
-                except ReadTimeout:
-                    # Do nothing, just try again
-                    pass
-                except ConnectionError:
-                    # Sleep 5 seconds, then try again
-                    sleep(5)
+            try:
+                r = cached_get(
+                    self._api + quote(doi),
+                    headers=self._headers,
+                    timeout=30,
+                    session=self._session,
+                )
+                if r.status_code == 200:
+                    r.encoding = "utf-8"
+                    json_res = loads(r.text)
+                    return json_res.get("responseCode") == 1
+            except (ReadTimeout, ConnectionError):
+                # The session has already tried again the request
+                pass
 
         return False
@@ -15,18 +15,18 @@
 # SOFTWARE.
 from re import sub
 from urllib.parse import unquote, quote
-from requests import get
 from json import loads
 from requests import ReadTimeout
 from requests.exceptions import ConnectionError
-from time import sleep
 
 from oc.index.identifier.base import IdentifierManager
+from oc.index.utils.cache import cached_get
 
 class MetaIDManager(IdentifierManager):
-    def __init__(self, data = {}, use_api_service=False): 
+    def __init__(self, data = {}, use_api_service=False, session=None): 
 
         self.p = "meta:"
+        self._session = session
         self.use_api_service=use_api_service
         self._api = "https://w3id.org/oc/meta/"
         self._data = data
@@ -51,21 +51,20 @@ class MetaIDManager(IdentifierManager):
     def __metaid_exists(self, metaid_full):
         if self._use_api_service:
             metaid = self.normalise(metaid_full)
-            tentative = 3
-            while tentative:
-                tentative -= 1
-                try:
-                    r = get(self._api + quote(metaid), headers=self._headers, timeout=30)
-                    if r.status_code == 200:
-                        r.encoding = "utf-8"
-                        json_res = loads(r.text)
-                        return json_res.get("responseCode") == 1
-                except ReadTimeout:
-                    # Do nothing, just try again
-                    pass
-                except ConnectionError:
-                    # Sleep 5 seconds, then try again
-                    sleep(5)
+            try:
+                r = cached_get(
+                    self._api + quote(metaid),
+                    headers=self._headers,
+                    timeout=30,
+                    session=self._session,
+                )
+                if r.status_code == 200:
+                    r.encoding = "utf-8"
+                    json_res = loads(r.text)
+                    return json_res.get("responseCode") == 1
+            except (ReadTimeout, ConnectionError):
+                # The session has already tried again the request
+                pass
 
         return False
 
@@ -15,22 +15,22 @@
 
 from re import sub, match
 from urllib.parse import unquote, quote
-from requests import get
 from json import loads
 from requests import ReadTimeout
 from requests.exceptions import ConnectionError
-from time import sleep
 from bs4 import BeautifulSoup
 
 from oc.index.identifier.base import IdentifierManager
+from oc.index.utils.cache import cached_get
 
 
 class PMIDManager(IdentifierManager):
     """This class implements an identifier manager for pmid identifier"""
 
-    def __init__(self, data={}, use_api_service=True):
+    def __init__(self, data={}, use_api_service=True, session=None):
         """PMID manager constructor."""
         super().__init__()
+        self._session = session
         self._api = "https://pubmed.ncbi.nlm.nih.gov/"
         self._use_api_service = use_api_service
         self._p = "pmid:"
@@ -72,31 +72,45 @@ class PMIDManager(IdentifierManager):
             # Any error in processing the PMID will return None
             return None
 
+    def normalise_series(self, series, include_prefix=False):
+        """It returns all the pmids of a pandas Series normalized, in the same way
+        as normalise but through vectorized string operations.
+
+        Args:
+            series (pandas.Series): the pmids to normalize.
+            include_prefix (bool, optional): indicates if include the prefix. Defaults to False.
+
+        Returns:
+            pandas.Series: the normalized pmids
+        """
+        pmids = (
+            series.fillna("")
+            .astype(str)
+            .str.replace("[^\\d+]", "", regex=True)
+            .str.lstrip("0")
+            .astype(object)
+        )
+        return self._p + pmids if include_prefix else pmids
+
     def __pmid_exists(self, pmid_full):
         if self._use_api_service:
             pmid = self.normalise(pmid_full)
-            tentative = 3
-            while tentative:
-                tentative -= 1
-                try:
-                    r = get(
-                        self._api + quote(pmid) + "/?format=pmid",
-                        headers=self._headers,
-                        timeout=30,
-                    )
-                    if r.status_code == 200:
-                        r.encoding = "utf-8"
-                        soup = BeautifulSoup(r.content, features="lxml")
-                        for i in soup.find_all("meta", {"name": "uid"}):
-                            id = i["content"]
-                            if id == pmid:
-                                return True
-
-                except ReadTimeout:
-                    # Do nothing, just try again
-                    pass
-                except ConnectionError:
-                    # Sleep 5 seconds, then try again
-                    sleep(5)
+            try:
+                r = cached_get(
+                    self._api + quote(pmid) + "/?format=pmid",
+                    headers=self._headers,
+                    timeout=30,
+                    session=self._session,
+                )
+                if r.status_code == 200:
+                    r.encoding = "utf-8"
+                    soup = BeautifulSoup(r.content, features="lxml")
+                    for i in soup.find_all("meta", {"name": "uid"}):
+                        id = i["content"]
+                        if id == pmid:
+                            return True
+            except (ReadTimeout, ConnectionError):
+                # The session has already tried again the request
+                pass
 
         return False
@@ -15,18 +15,18 @@
 # SOFTWARE.
 from re import sub, match
 from urllib.parse import unquote, quote
-from requests import get
 from json import loads
 from requests import ReadTimeout
 from requests.exceptions import ConnectionError
-from time import sleep
 import os
 from oc.index.identifier.base import IdentifierManager
+from oc.index.utils.cache import cached_get
     
 class WikiDataIDManager(IdentifierManager):
     '''This class is used to validate WikiData Identifiers. This is done through an ASK query to the WikiData SPARQL Endpoint.'''
-    def __init__(self, data = {}, use_api_service=True):
+    def __init__(self, data = {}, use_api_service=True, session=None):
         super().__init__()
+        self._session = session
         self._api = "http://wikidata.org/entity/"
         self._data = data
         self.use_api_service = use_api_service
@@ -54,18 +54,19 @@ class WikiDataIDManager(IdentifierManager):
     def __qid_exists(self, qid_full):
         if self.use_api_service:
             qid = self.normalise(qid_full)
-            tentative = 3
-            while tentative:
-                tentative -= 1
-                try:
-                    r = get(self._api + quote(qid), headers=self._headers, timeout=30)
-                    if r.status_code == 200:
-                        r.encoding = "utf-8"
-                        json_res = loads(r.text)
-                        return json_res.get("responseCode") == 1
-                except ReadTimeout:
-                    pass  # Do nothing, just try again
-                except ConnectionError:
-                    sleep(5)  # Sleep 5 seconds, then try again
+            try:
+                r = cached_get(
+                    self._api + quote(qid),
+                    headers=self._headers,
+                    timeout=30,
+                    session=self._session,
+                )
+                if r.status_code == 200:
+                    r.encoding = "utf-8"
+                    json_res = loads(r.text)
+                    return json_res.get("responseCode") == 1
+            except (ReadTimeout, ConnectionError):
+                # The session has already tried again the request
+                pass
 
         return False
\ No newline at end of file
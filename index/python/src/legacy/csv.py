@@ -13,30 +13,57 @@
 # ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
 # SOFTWARE.
 
-from csv import DictReader
-from io import StringIO
-from os.path import exists, isdir
+from concurrent.futures import ProcessPoolExecutor
+from csv import reader
+from os.path import exists, getsize, isdir
 from os import walk, sep
+from timeit import default_timer as timer
+
+
+def _load_csv_column(csv_path, key):
+    """It returns the set of the values of a column of a CSV file."""
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        csv_reader = reader(f)
+        header = next(csv_reader, None)
+        if header is None or key not in header:
+            return set()
+        idx = header.index(key)
+        return {row[idx] for row in csv_reader if len(row) > idx}
 
 
 class CSVManager(object):
     """This class is able to load a simple CSV composed by two fields, 'id' and
     'value', and then to index all its items in a structured form so as to be
     easily queried. In addition, it allows one to store new information in the CSV,
-    if needed."""
-
-    def __init__(self, csv_path=None, line_threshold=10000, store_new=True):
+    if needed. New values can be buffered in memory and written in bulk through a
+    file handle kept open, by specifying a 'buffer_size': in this case, the
+    buffer is written when it reaches such size, when calling 'flush' or 'close',
+    or when exiting the context of a 'with' statement."""
+
+    def __init__(
+        self, csv_path=None, line_threshold=10000, store_new=True, buffer_size=0
+    ):
         self.csv_path = csv_path
         self.data = {}
         self.store_new = store_new
+        self.buffer_size = buffer_size
+        self.__buffer = []
+        self.__file = None
+
+        self.loaded_rows = 0
+        self.loaded_bytes = 0
+        self.load_time = 0.0
 
         if csv_path is not None:
-            CSVManager.__load_all_csv_files(
-                [csv_path], self.__load_csv, line_threshold=line_threshold
-            )
+            self.__load_csv(csv_path)
 
     @staticmethod
-    def load_csv_column_as_set(file_or_dir_path, key, line_threshold=10000):
+    def load_csv_column_as_set(file_or_dir_path, key, line_threshold=10000, workers=1):
+        """It returns the set of the values of the column 'key' of a CSV file, or of
+        all the CSV files contained in a directory. The files are streamed row by
+        row and, if 'workers' is greater than one, read in parallel by such number
+        of processes. The parameter 'line_threshold' is kept for compatibility and
+        it is not used anymore."""
         result = set()
 
         if exists(file_or_dir_path):
@@ -49,53 +76,22 @@ class CSVManager(object):
             else:
                 file_to_process.append(file_or_dir_path)
 
-            for item in CSVManager.__load_all_csv_files(
-                file_to_process,
-                CSVManager.__load_csv_by_key,
-                line_threshold=line_threshold,
-                key=key,
-            ):
-                result.update(item)
-
-        return result
-
-    @staticmethod
-    def __load_csv_by_key(csv_string, key):
-        result = set()
-
-        csv_metadata = DictReader(StringIO(csv_string), delimiter=",")
-        for row in csv_metadata:
-            result.add(row[key])
+            if workers > 1 and len(file_to_process) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    for item in executor.map(
+                        _load_csv_column, file_to_process, [key] * len(file_to_process)
+                    ):
+                        result.update(item)
+            else:
+                for csv_path in file_to_process:
+                    result.update(_load_csv_column(csv_path, key))
 
         return result
 
-    @staticmethod
-    def __load_all_csv_files(list_of_csv_files, fun, line_threshold, **params):
-        result = []
-        header = None
-
-        for csv_path in list_of_csv_files:
-            # NOTA: manca nella libreria
-            if not exists(csv_path):
-                # open(csv_path, "w").close() sostituito con:
-                with open(csv_path, "w", encoding="utf8") as f:
-                    f.write('"id","value"\n')
-                    f.close()  # necessario? in add_value non c'è
-            with open(csv_path, encoding="utf-8") as f:
-                csv_content = ""
-                for idx, line in enumerate(f.readlines()):
-                    if header is None:
-                        header = line
-                        csv_content = header
-                    else:
-                        if idx % line_threshold == 0:
-                            result.append(fun(csv_content, **params))
-                            csv_content = header
-                        csv_content += line
-
-            result.append(fun(csv_content, **params))
-
-        return result
+    @property
+    def load_throughput(self):
+        """It returns the number of bytes per second read when loading the CSV."""
+        return self.loaded_bytes / self.load_time if self.load_time else 0.0
 
     def get_value(self, id_string):
         """It returns the set of values associated to the input 'id_string',
@@ -114,21 +110,69 @@ class CSVManager(object):
             self.data[id_string].add(value)
 
             if self.csv_path is not None and self.store_new:
-                if not exists(self.csv_path):
-                    with open(self.csv_path, "w", encoding="utf8") as f:
-                        f.write('"id","value"\n')
-
-                with open(self.csv_path, "a", encoding="utf8") as f:
-                    f.write(
-                        '"%s","%s"\n'
-                        % (id_string.replace('"', '""'), value.replace('"', '""'))
-                    )
-
-    def __load_csv(self, csv_string):
-        csv_metadata = DictReader(StringIO(csv_string), delimiter=",")
-        for row in csv_metadata:
-            cur_id = row["id"]
-            if cur_id not in self.data:
-                self.data[cur_id] = set()
-
-            self.data[cur_id].add(row["value"])
+                self.__buffer.append(
+                    '"%s","%s"\n'
+                    % (id_string.replace('"', '""'), value.replace('"', '""'))
+                )
+                if self.buffer_size <= 0:
+                    self.close()
+                elif len(self.__buffer) >= self.buffer_size:
+                    self.flush()
+
+    def flush(self):
+        """It writes in the CSV all the values in the buffer."""
+        if self.__buffer:
+            self.__write()
+        if self.__file is not None:
+            self.__file.flush()
+
+    def close(self):
+        """It writes in the CSV all the values in the buffer and closes the file."""
+        self.flush()
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __write(self):
+        if self.__file is None:
+            new_file = not exists(self.csv_path)
+            self.__file = open(self.csv_path, "a", encoding="utf8")
+            if new_file:
+                self.__file.write('"id","value"\n')
+
+        self.__file.writelines(self.__buffer)
+        self.__buffer = []
+
+    def __load_csv(self, csv_path):
+        if not exists(csv_path):
+            with open(csv_path, "w", encoding="utf8") as f:
+                f.write('"id","value"\n')
+
+        start = timer()
+        data = self.data
+        rows = 0
+        with open(csv_path, encoding="utf-8", newline="") as f:
+            csv_reader = reader(f)
+            header = next(csv_reader, None)
+            if header is not None:
+                id_idx = header.index("id")
+                value_idx = header.index("value")
+                for row in csv_reader:
+                    if not row:
+                        continue
+                    cur_id = row[id_idx]
+                    values = data.get(cur_id)
+                    if values is None:
+                        values = data[cur_id] = set()
+                    values.add(row[value_idx])
+                    rows += 1
+
+        self.loaded_rows += rows
+        self.loaded_bytes += getsize(csv_path)
+        self.load_time += timer() - start
@@ -13,16 +13,17 @@
 # ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
 # SOFTWARE.
 
+from array import array
 from collections import deque
-from csv import DictReader
-from csv import DictWriter
+from csv import DictWriter, reader
 from datetime import datetime
+from functools import lru_cache
 from io import StringIO
 from json import dumps, load, loads, JSONDecodeError
 from os.path import exists, dirname
-from os import makedirs
-from errno import EEXIST
-from re import match, findall, sub
+from os import makedirs, SEEK_END
+from re import compile, match, findall, sub
+from threading import RLock
 from urllib.parse import quote, unquote
 from xml.etree import ElementTree
 from SPARQLWrapper import SPARQLWrapper, JSON
@@ -31,6 +32,11 @@ from dateutil.relativedelta import relativedelta
 from rdflib import ConjunctiveGraph, RDF, RDFS, XSD, URIRef, Literal, Namespace
 from requests import get
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 REFERENCE_CITATION_TYPE = "reference"
 SUPPLEMENT_CITATION_TYPE = "supplement"
 DEFAULT_CITATION_TYPE = REFERENCE_CITATION_TYPE
@@ -48,6 +54,12 @@ E = "ERROR"
 I = "INFO"
 PREFIX_REGEX = "0[1-9]+0"
 VALIDATION_REGEX = "^%s[0-9]+$" % PREFIX_REGEX
+SPACES_PATTERN = compile("\\s+")
+DATE_PATTERN = compile("^[0-9]{4}(-[0-9]{2}(-[0-9]{2})?)?$")
+DATETIME_PATTERN = compile("^[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}$")
+DURATION_PATTERN = compile("^-?P[0-9]+Y(([0-9]+M)([0-9]+D)?)?$")
+DURATION_PARTS_PATTERN = compile("^-?P([0-9]+Y)?([0-9]+M)?([0-9]+D)?$")
+DATE_CACHE_SIZE = 65536
 FORMATS = {
     "xml": "xml",
     "rdfxml": "xml",
@@ -74,9 +86,60 @@ FORMATS = {
 }
 
 
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(date):
+    """It parses a date in the form YYYY, YYYY-MM or YYYY-MM-DD, using the month
+    and the day of DEFAULT_DATE when they are missing. The dates in this form are
+    parsed directly, while any other string is parsed through dateutil.
+
+    Args:
+        date (str): the date
+
+    Returns:
+        datetime: the date parsed, None if it is not valid.
+    """
+    # dateutil does not read years before 100 as years, e.g. '0012' is a day
+    if DATE_PATTERN.match(date) and not date.startswith("00"):
+        try:
+            return datetime(
+                int(date[:4]),
+                int(date[5:7]) if len(date) >= 7 else DEFAULT_DATE.month,
+                int(date[8:10]) if len(date) >= 10 else DEFAULT_DATE.day,
+            )
+        except ValueError:
+            return None
+    try:
+        return parse(date, default=DEFAULT_DATE)
+    except ValueError:
+        return None
+
+
 class Citation(object):
     """This class represents the citation inside index."""
 
+    __slots__ = (
+        "oci",
+        "citing_url",
+        "cited_url",
+        "creation_date",
+        "citing_pub_date",
+        "cited_pub_date",
+        "duration",
+        "author_sc",
+        "journal_sc",
+        "citation_type",
+        "prov_entity_number",
+        "prov_agent_url",
+        "prov_date",
+        "service_name",
+        "prov_inv_date",
+        "prov_description",
+        "prov_update",
+        "id_type",
+        "id_shape",
+        "source",
+    )
+
     cito_base = "http://purl.org/spar/cito/"
     cites = URIRef(cito_base + "cites")
     citation = URIRef(cito_base + "Citation")
@@ -91,7 +154,7 @@ class Citation(object):
     has_identifier = URIRef(datacite_base + "hasIdentifier")
     identifier = URIRef(datacite_base + "Identifier")
     uses_identifier_scheme = URIRef(datacite_base + "usesIdentifierScheme")
-    oci = URIRef(datacite_base + "oci")
+    oci_scheme = URIRef(datacite_base + "oci")
 
     literal_base = "http://www.essepuntato.it/2010/06/literalreification/"
     has_literal_value = URIRef(literal_base + "hasLiteralValue")
@@ -114,6 +177,26 @@ class Citation(object):
     dc_base = "http://purl.org/dc/terms/"
     description = URIRef(dc_base + "description")
 
+    # N-Triples terms precomputed for the serialisation without rdflib graphs,
+    # see get_citation_nt and get_citation_prov_nq
+    _nt_type = "<%s>" % RDF.type
+    _nt_citation = "<%s>" % citation
+    _nt_author_self_citation = "<%s>" % author_self_citation
+    _nt_journal_self_citation = "<%s>" % journal_self_citation
+    _nt_has_citing_entity = "<%s>" % has_citing_entity
+    _nt_has_cited_entity = "<%s>" % has_cited_entity
+    _nt_has_citation_creation_date = "<%s>" % has_citation_creation_date
+    _nt_has_citation_time_span = "<%s>" % has_citation_time_span
+    _nt_prov_entity = "<%s>" % prov_entity
+    _nt_specialization_of = "<%s>" % specialization_of
+    _nt_was_attributed_to = "<%s>" % was_attributed_to
+    _nt_had_primary_source = "<%s>" % had_primary_source
+    _nt_generated_at_time = "<%s>" % generated_at_time
+    _nt_invalidated_at_time = "<%s>" % invalidated_at_time
+    _nt_description = "<%s>" % description
+    _nt_has_update_query = "<%s>" % has_update_query
+    _nt_was_derived_from = "<%s>" % was_derived_from
+
     header_citation_data = [
         "oci",
         "citing",
@@ -184,134 +267,161 @@ class Citation(object):
         self.oci = oci
         self.citing_url = citing_url
         self.cited_url = cited_url
-        self.duration = Citation.check_duration(timespan)
-        self.creation_date = Citation.check_date(
-            creation[:10] if creation else creation
+        (
+            self.creation_date,
+            self.citing_pub_date,
+            self.cited_pub_date,
+            self.duration,
+        ) = Citation.normalise_dates(
+            creation, timespan, citing_pub_date, cited_pub_date
         )
         self.author_sc = "yes" if author_sc else "no"
         self.journal_sc = "yes" if journal_sc else "no"
-        self.citing_pub_date = Citation.check_date(
-            citing_pub_date[:10] if citing_pub_date else citing_pub_date
-        )
-        self.cited_pub_date = Citation.check_date(
-            cited_pub_date[:10] if cited_pub_date else cited_pub_date
-        )
 
         self.citation_type = (
             citation_type if citation_type in CITATION_TYPES else DEFAULT_CITATION_TYPE
         )
 
+        self.prov_entity_number = prov_entity_number
+        self.prov_agent_url = prov_agent_url
+        self.prov_date = Citation.check_datetime(prov_date)
+        self.service_name = service_name
+        self.prov_inv_date = Citation.check_datetime(prov_inv_date)
+        self.prov_description = Citation.check_string(prov_description)
+        self.prov_update = Citation.check_string(prov_update)
+
+        self.id_type = id_type
+        self.id_shape = id_shape
+
+        self.source = self.resolve_source(source)
+
+    def resolve_source(self, source):
+        """It returns the source of the citation, replacing the placeholder
+        [[citing]] or [[cited]] with the id of the related entity.
+
+        Args:
+            source (str): the source, possibly containing a placeholder
+
+        Returns:
+            str: the source of the citation
+        """
+        if "[[citing]]" in source:
+            return source.replace("[[citing]]", quote(self.get_id(self.citing_url)))
+        elif "[[cited]]" in source:
+            return source.replace("[[cited]]", quote(self.get_id(self.cited_url)))
+        return source
+
+    @staticmethod
+    def normalise_dates(creation, timespan, citing_pub_date, cited_pub_date):
+        """It checks the time-related data of a citation and sets them uniformly,
+        inferring the missing ones where possible.
+
+        Args:
+            creation (str): creation time
+            timespan (str): timespan
+            citing_pub_date (str): citing publication date
+            cited_pub_date (str): cited publication date
+
+        Returns:
+            tuple: creation date, citing publication date, cited publication date
+            and timespan, each of them is None if not available.
+        """
+        duration = Citation.check_duration(timespan)
+        creation_date = Citation.check_date(creation[:10] if creation else creation)
+        citing_pub_date = Citation.check_date(
+            citing_pub_date[:10] if citing_pub_date else citing_pub_date
+        )
+        cited_pub_date = Citation.check_date(
+            cited_pub_date[:10] if cited_pub_date else cited_pub_date
+        )
+
         # Set uniformly all the time-related data in a citation
-        if self.citing_pub_date is None and self.creation_date is not None:
-            self.citing_pub_date = self.creation_date
-        if (
-            self.cited_pub_date is None
-            and self.creation_date is not None
-            and self.duration
-        ):
-            self.cited_pub_date = Citation.check_date(
-                Citation.get_date(self.creation_date, self.duration)
+        if citing_pub_date is None and creation_date is not None:
+            citing_pub_date = creation_date
+        if cited_pub_date is None and creation_date is not None and duration:
+            cited_pub_date = Citation.check_date(
+                Citation.get_date(creation_date, duration)
             )
-        if self.cited_pub_date is None:
-            self.duration = None
+        if cited_pub_date is None:
+            duration = None
 
-        if self.contains_years(self.citing_pub_date):
-            self.creation_date = self.citing_pub_date[:10]
+        if Citation.contains_years(citing_pub_date):
+            creation_date = citing_pub_date[:10]
 
-            if self.contains_years(self.cited_pub_date):
-                citing_contains_months = Citation.contains_months(self.citing_pub_date)
-                cited_contains_months = Citation.contains_months(self.cited_pub_date)
-                citing_contains_days = Citation.contains_days(self.citing_pub_date)
-                cited_contains_days = Citation.contains_days(self.cited_pub_date)
+            if Citation.contains_years(cited_pub_date):
+                citing_contains_months = Citation.contains_months(citing_pub_date)
+                cited_contains_months = Citation.contains_months(cited_pub_date)
+                citing_contains_days = Citation.contains_days(citing_pub_date)
+                cited_contains_days = Citation.contains_days(cited_pub_date)
 
                 # Handling incomplete dates
-                citing_complete_pub_date = self.creation_date
-                cited_complete_pub_date = self.cited_pub_date[:10]
+                citing_complete_pub_date = creation_date
+                cited_complete_pub_date = cited_pub_date[:10]
                 if citing_contains_months and not cited_contains_months:
-                    cited_complete_pub_date += self.citing_pub_date[4:7]
+                    cited_complete_pub_date += citing_pub_date[4:7]
                 elif not citing_contains_months and cited_contains_months:
-                    citing_complete_pub_date += self.cited_pub_date[4:7]
+                    citing_complete_pub_date += cited_pub_date[4:7]
                 if citing_contains_days and not cited_contains_days:
-                    cited_complete_pub_date += self.citing_pub_date[7:]
+                    cited_complete_pub_date += citing_pub_date[7:]
                 elif not citing_contains_days and cited_contains_days:
-                    citing_complete_pub_date += self.cited_pub_date[7:]
+                    citing_complete_pub_date += cited_pub_date[7:]
 
-                try:
-                    citing_pub_datetime = parse(
-                        citing_complete_pub_date, default=DEFAULT_DATE
-                    )
-                except ValueError:  # It is not a leap year
-                    citing_pub_datetime = parse(
-                        citing_complete_pub_date[:7] + "-28", default=DEFAULT_DATE
-                    )
-                try:
-                    cited_pub_datetime = parse(
-                        cited_complete_pub_date, default=DEFAULT_DATE
-                    )
-                except ValueError:  # It is not a leap year
-                    cited_pub_datetime = parse(
-                        cited_complete_pub_date[:7] + "-28", default=DEFAULT_DATE
-                    )
-
-                delta = relativedelta(citing_pub_datetime, cited_pub_datetime)
-                self.duration = Citation.get_duration(
-                    delta,
+                duration = Citation.__get_timespan(
+                    citing_complete_pub_date,
+                    cited_complete_pub_date,
                     citing_contains_months and cited_contains_months,
                     citing_contains_days and cited_contains_days,
                 )
 
-        self.prov_entity_number = prov_entity_number
-        self.prov_agent_url = prov_agent_url
-        self.prov_date = Citation.check_datetime(prov_date)
-        self.service_name = service_name
-        self.prov_inv_date = Citation.check_datetime(prov_inv_date)
-        self.prov_description = Citation.check_string(prov_description)
-        self.prov_update = Citation.check_string(prov_update)
+        return creation_date, citing_pub_date, cited_pub_date, duration
 
-        self.id_type = id_type
-        self.id_shape = id_shape
+    @staticmethod
+    @lru_cache(maxsize=DATE_CACHE_SIZE)
+    def __get_timespan(
+        citing_complete_pub_date,
+        cited_complete_pub_date,
+        consider_months,
+        consider_days,
+    ):
+        citing_pub_datetime = parse_date(citing_complete_pub_date)
+        if citing_pub_datetime is None:  # It is not a leap year
+            citing_pub_datetime = parse_date(citing_complete_pub_date[:7] + "-28")
+        cited_pub_datetime = parse_date(cited_complete_pub_date)
+        if cited_pub_datetime is None:  # It is not a leap year
+            cited_pub_datetime = parse_date(cited_complete_pub_date[:7] + "-28")
 
-        self.source = source
-        if "[[citing]]" in self.source:
-            self.source = self.source.replace(
-                "[[citing]]", quote(self.get_id(citing_url))
-            )
-        elif "[[cited]]" in self.source:
-            self.source = self.source.replace(
-                "[[cited]]", quote(self.get_id(cited_url))
-            )
+        delta = relativedelta(citing_pub_datetime, cited_pub_datetime)
+        return Citation.get_duration(delta, consider_months, consider_days)
 
     @staticmethod
+    @lru_cache(maxsize=DATE_CACHE_SIZE)
     def check_duration(s):
-        duration = sub("\s+", "", s) if s is not None else ""
-        if not match("^-?P[0-9]+Y(([0-9]+M)([0-9]+D)?)?$", duration):
+        duration = SPACES_PATTERN.sub("", s) if s is not None else ""
+        if not DURATION_PATTERN.match(duration):
             duration = None
         return duration
 
     @staticmethod
+    @lru_cache(maxsize=DATE_CACHE_SIZE)
     def check_date(s):
-        date = sub("\s+", "", s)[:10] if s is not None else ""
-        if not match("^[0-9]{4}(-[0-9]{2}(-[0-9]{2})?)?$", date):
+        date = SPACES_PATTERN.sub("", s)[:10] if s is not None else ""
+        if not DATE_PATTERN.match(date):
+            date = None
+        # Check if the date found is valid
+        elif parse_date(date) is None:
             date = None
-        if date is not None:
-            try:  # Check if the date found is valid
-                parse(date, default=DEFAULT_DATE)
-            except ValueError:
-                date = None
         return date
 
     @staticmethod
     def check_datetime(s):
-        datetime = sub("\s+", "", s)[:19] if s is not None else ""
-        if not match(
-            "^[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}$", datetime
-        ):
+        datetime = SPACES_PATTERN.sub("", s)[:19] if s is not None else ""
+        if not DATETIME_PATTERN.match(datetime):
             datetime = None
         return datetime
 
     @staticmethod
     def check_string(s):
-        if not match("^.+$", sub("\s+", "", s) if s is not None else ""):
+        if s is None or not SPACES_PATTERN.sub("", s):
             return None
         return s
 
@@ -477,6 +587,113 @@ class Citation(object):
 
         return citation_graph, citation, citation_corpus_id, prov_entity
 
+    def get_citation_nt(self, baseurl):
+        """It returns the citation data in N-Triples, i.e. the triples of
+        get_citation_rdf(baseurl, False, False, False), without building any graph.
+
+        Args:
+            baseurl (str): base url
+
+        Returns:
+            str: citation data in N-Triples format.
+        """
+        citation = "<%sci/%s>" % (baseurl, self.oci.replace("oci:", ""))
+
+        statements = [(Citation._nt_type, Citation._nt_citation)]
+        if self.author_sc == "yes":
+            statements.append((Citation._nt_type, Citation._nt_author_self_citation))
+        if self.journal_sc == "yes":
+            statements.append((Citation._nt_type, Citation._nt_journal_self_citation))
+
+        statements.append((Citation._nt_has_citing_entity, "<%s>" % self.citing_url))
+        statements.append((Citation._nt_has_cited_entity, "<%s>" % self.cited_url))
+
+        if self.creation_date is not None:
+            if Citation.contains_days(self.creation_date):
+                xsd_type = XSD.date
+            elif Citation.contains_months(self.creation_date):
+                xsd_type = XSD.gYearMonth
+            else:
+                xsd_type = XSD.gYear
+
+            statements.append(
+                (
+                    Citation._nt_has_citation_creation_date,
+                    Citation.__nt_literal(self.creation_date, xsd_type),
+                )
+            )
+            if self.duration is not None:
+                statements.append(
+                    (
+                        Citation._nt_has_citation_time_span,
+                        Citation.__nt_literal(self.duration, XSD.duration),
+                    )
+                )
+
+        return "".join("%s %s %s .\n" % (citation, p, o) for p, o in statements)
+
+    def get_citation_prov_nq(self, baseurl):
+        """It returns the citation provenance in N-Quads, i.e. the quads of
+        get_citation_prov_rdf(baseurl), without building any graph.
+
+        Args:
+            baseurl (str): base url
+
+        Returns:
+            str: citation provenance in N-Quads format.
+        """
+        citation_url = "%sci/%s" % (baseurl, self.oci.replace("oci:", ""))
+        prov_url = citation_url + "/prov/"
+        prov_entity_url = prov_url + "se/" + str(self.prov_entity_number)
+
+        statements = [
+            (Citation._nt_type, Citation._nt_prov_entity),
+            (Citation._nt_specialization_of, "<%s>" % citation_url),
+            (Citation._nt_was_attributed_to, "<%s>" % self.prov_agent_url),
+            (Citation._nt_had_primary_source, "<%s>" % self.source),
+            (
+                Citation._nt_generated_at_time,
+                Citation.__nt_literal(self.prov_date, XSD.dateTime),
+            ),
+        ]
+
+        if self.prov_inv_date is not None:
+            statements.append(
+                (
+                    Citation._nt_invalidated_at_time,
+                    Citation.__nt_literal(self.prov_inv_date, XSD.dateTime),
+                )
+            )
+        if self.prov_description is not None:
+            statements.append(
+                (Citation._nt_description, Citation.__nt_literal(self.prov_description))
+            )
+        if self.prov_update is not None:
+            statements.append(
+                (Citation._nt_has_update_query, Citation.__nt_literal(self.prov_update))
+            )
+            statements.append(
+                (
+                    Citation._nt_was_derived_from,
+                    "<%s%s>" % (prov_url + "se/", self.prov_entity_number - 1),
+                )
+            )
+
+        return "".join(
+            "<%s> %s %s <%s> .\n" % (prov_entity_url, p, o, prov_url)
+            for p, o in statements
+        )
+
+    @staticmethod
+    def __nt_literal(value, datatype=None):
+        # Same escaping adopted by rdflib when serialising N-Triples and N-Quads
+        literal = '"%s"' % value.replace("\\", "\\\\").replace("\n", "\\n").replace(
+            '"', '\\"'
+        ).replace("\r", "\\r")
+        if datatype is None:
+            return literal
+        return "%s^^<%s>" % (literal, datatype)
+
     def get_oci_rdf(self, baseurl, include_label=True, include_prov=True):
         """It returns the oci rdf.
 
@@ -508,7 +725,7 @@ class Citation(object):
                 )
             )
         identifier_graph.add((identifier, RDF.type, self.identifier))
-        identifier_graph.add((identifier, self.uses_identifier_scheme, self.oci))
+        identifier_graph.add((identifier, self.uses_identifier_scheme, self.oci_scheme))
         identifier_graph.add((identifier, self.has_literal_value, Literal(self.oci)))
 
         if include_prov:
@@ -734,7 +951,7 @@ class Citation(object):
     @staticmethod
     def get_date(creation_date, duration):
         params = {}
-        for item in findall("^-?P([0-9]+Y)?([0-9]+M)?([0-9]+D)?$", duration)[0]:
+        for item in DURATION_PARTS_PATTERN.findall(duration)[0]:
             if "Y" in item:
                 params["years"] = int(item[:-1])
             elif "M" in item:
@@ -743,7 +960,7 @@ class Citation(object):
                 params["days"] = int(item[:-1])
 
         delta = relativedelta(**params)
-        d = parse(creation_date, default=DEFAULT_DATE)
+        d = parse_date(creation_date)
         if duration.startswith("-"):
             result = d + delta
         else:
@@ -766,6 +983,163 @@ class Citation(object):
         return g.serialize(format=cur_format, encoding="utf-8").decode("utf-8")
 
 
+class CitationBatch(object):
+    """This class keeps in a columnar form several citations sharing the same
+    provenance agent, source, service and id type, taking far less memory than a
+    list of Citation objects. The values repeated across the citations, e.g. the
+    citing entities and the dates, are stored once and referenced by their position
+    in arrays, while the ocis and the cited entities, which rarely repeat, are
+    stored as they are. Iterating a batch returns its citations as Citation objects, thus
+    it can be used wherever an iterable of citations is expected, e.g. by the
+    storer."""
+
+    def __init__(
+        self,
+        prov_agent_url,
+        source,
+        service_name,
+        id_type,
+        id_shape,
+        citation_type=DEFAULT_CITATION_TYPE,
+        prov_entity_number=1,
+        prov_description=None,
+    ):
+        """CitationBatch constructor.
+
+        Args:
+            prov_agent_url (str): provenance agent url.
+            source (str): source string, it may contain [[citing]] or [[cited]].
+            service_name (str): service name.
+            id_type (str): id type, e.g. doi.
+            id_shape (str): url to the id shape.
+            citation_type (str, optional): citation type. Defaults to reference.
+            prov_entity_number (str, optional): provenance entity number. Defaults to 1.
+            prov_description (str, optional): provenance description. Defaults to None.
+        """
+        self.prov_agent_url = prov_agent_url
+        self.source = source
+        self.service_name = service_name
+        self.id_type = id_type
+        self.id_shape = id_shape
+        self.citation_type = (
+            citation_type if citation_type in CITATION_TYPES else DEFAULT_CITATION_TYPE
+        )
+        self.prov_entity_number = prov_entity_number
+        self.prov_description = Citation.check_string(prov_description)
+
+        self.__values = []
+        self.__codes = {}
+        self.__oci = []
+        self.__citing_url = array("I")
+        self.__cited_url = []
+        self.__creation_date = array("I")
+        self.__citing_pub_date = array("I")
+        self.__cited_pub_date = array("I")
+        self.__duration = array("I")
+        self.__prov_date = array("I")
+        self.__flags = array("B")
+
+    def __code(self, value):
+        code = self.__codes.get(value)
+        if code is None:
+            code = len(self.__values)
+            self.__codes[value] = code
+            self.__values.append(value)
+        return code
+
+    def append(
+        self,
+        oci,
+        citing_url,
+        citing_pub_date,
+        cited_url,
+        cited_pub_date,
+        creation,
+        timespan,
+        prov_date,
+        journal_sc=False,
+        author_sc=False,
+    ):
+        """It adds a citation to the batch, the arguments are the ones of the
+        Citation constructor which are not shared by the batch.
+
+        Args:
+            oci (str): citation identifier.
+            citing_url (str): citing url.
+            citing_pub_date (str): citing publication date.
+            cited_url (str): cited url.
+            cited_pub_date (str): cited publication date.
+            creation (str): creation time.
+            timespan (str): timespan.
+            prov_date (str): provenance date.
+            journal_sc (bool, optional): true if it is a journal self-cited. Defaults to False.
+            author_sc (bool, optional): true if it is a  author self-cited. Defaults to False.
+        """
+        (
+            creation_date,
+            citing_pub_date,
+            cited_pub_date,
+            duration,
+        ) = Citation.normalise_dates(
+            creation, timespan, citing_pub_date, cited_pub_date
+        )
+
+        self.__oci.append(oci)
+        self.__citing_url.append(self.__code(citing_url))
+        self.__cited_url.append(cited_url)
+        self.__creation_date.append(self.__code(creation_date))
+        self.__citing_pub_date.append(self.__code(citing_pub_date))
+        self.__cited_pub_date.append(self.__code(cited_pub_date))
+        self.__duration.append(self.__code(duration))
+        self.__prov_date.append(self.__code(Citation.check_datetime(prov_date)))
+        self.__flags.append((1 if author_sc else 0) | (2 if journal_sc else 0))
+
+    def __len__(self):
+        return len(self.__oci)
+
+    def __getitem__(self, idx):
+        values = self.__values
+        citation = Citation.__new__(Citation)
+        citation.oci = self.__oci[idx]
+        citation.citing_url = values[self.__citing_url[idx]]
+        citation.cited_url = self.__cited_url[idx]
+        citation.creation_date = values[self.__creation_date[idx]]
+        citation.citing_pub_date = values[self.__citing_pub_date[idx]]
+        citation.cited_pub_date = values[self.__cited_pub_date[idx]]
+        citation.duration = values[self.__duration[idx]]
+        citation.author_sc = "yes" if self.__flags[idx] & 1 else "no"
+        citation.journal_sc = "yes" if self.__flags[idx] & 2 else "no"
+        citation.citation_type = self.citation_type
+        citation.prov_entity_number = self.prov_entity_number
+        citation.prov_agent_url = self.prov_agent_url
+        citation.prov_date = values[self.__prov_date[idx]]
+        citation.service_name = self.service_name
+        citation.prov_inv_date = None
+        citation.prov_description = self.prov_description
+        citation.prov_update = None
+        citation.id_type = self.id_type
+        citation.id_shape = self.id_shape
+        citation.source = citation.resolve_source(self.source)
+        return citation
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+class _LookupTable(dict):
+    """Translation table from the ordinals of the characters to their codes in the
+    lookup, to be used with str.translate. The characters that are not in the
+    table yet are added to the lookup through the function specified."""
+
+    def __init__(self, add_character):
+        super().__init__()
+        self.__add_character = add_character
+
+    def __missing__(self, ordinal):
+        return self.__add_character(chr(ordinal))
+
+
 class OCIManager(object):
     """This class manages the oci idientifiers."""
 
@@ -805,19 +1179,13 @@ class OCIManager(object):
         self.inverse_lookup = {}
         self.lookup_file = lookup_file
         self.lookup_code = -1
+        self.__lookup_lock = RLock()
+        self.__lookup_offset = 0
+        self.__lookup_table = _LookupTable(self.__update_lookup)
         if self.lookup_file is not None:
-            if exists(self.lookup_file):
-                with open(self.lookup_file, "r", encoding="utf8") as f:
-                    lookupcsv_reader = DictReader(f)
-                    code = -1
-                    for row in lookupcsv_reader:
-                        self.lookup[row["code"]] = row["c"]
-                        self.inverse_lookup[row["c"]] = row["code"]
-                        code = int(row["code"])
-                    self.lookup_code = code
-            else:
-                with open(self.lookup_file, "w", encoding="utf8") as f:
-                    f.write('"c","code"')
+            if dirname(self.lookup_file):
+                makedirs(dirname(self.lookup_file), exist_ok=True)
+            self.__sync_lookup()
         else:
             self.add_message(
                 "__init__",
@@ -844,28 +1212,61 @@ class OCIManager(object):
             self.add_message("__init__", W, "No OCI specified!")
 
     def __match_str_to_lookup(self, str_val):
-        ci_str = []
-        for c in str_val:
-            if c not in self.inverse_lookup:
-                self.__update_lookup(c)
-            ci_str.append(str(self.inverse_lookup[c]))
-        return "".join(ci_str)
+        return str_val.translate(self.__lookup_table)
 
     def __update_lookup(self, c):
-        if c not in self.inverse_lookup:
-            self.__calc_next_lookup_code()
-            code = str(self.lookup_code)
-            if len(code) == 1:
-                code = "0" + code
-            self.inverse_lookup[c] = code
-            self.lookup[code] = c
-            self.__write_txtblock_on_csv(self.lookup_file, '\n"%s","%s"' % (c, code))
-
-    def __write_txtblock_on_csv(self, csv_path, block_txt):
-        if csv_path is not None and exists(csv_path):
-            self.__check_make_dirs(csv_path)
-            with open(csv_path, "a", newline="", encoding="utf8") as csvfile:
-                csvfile.write(block_txt)
+        with self.__lookup_lock:
+            if c not in self.inverse_lookup:
+                if self.lookup_file is not None:
+                    self.__sync_lookup(c)
+                else:
+                    self.__add_code(c, self.__next_lookup_code())
+            self.__lookup_table[ord(c)] = self.inverse_lookup[c]
+            return self.inverse_lookup[c]
+
+    def __sync_lookup(self, c=None):
+        # The lookup file is an append-only log shared by all the processes using
+        # it: the codes added by the other processes are loaded and the code of
+        # the new character, if any, is reserved while holding an exclusive lock
+        with open(self.lookup_file, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0, SEEK_END)
+                size = f.tell()
+                if size == 0:
+                    f.write(b'"c","code"')
+                elif size > self.__lookup_offset:
+                    f.seek(self.__lookup_offset)
+                    tail = f.read(size - self.__lookup_offset).decode("utf8")
+                    for row in reader(StringIO(tail)):
+                        if len(row) == 2 and row[1] != "code":
+                            self.__add_code(row[0], row[1])
+                if c is not None and c not in self.inverse_lookup:
+                    code = self.__next_lookup_code()
+                    f.write(
+                        ('\n"%s","%s"' % (c.replace('"', '""'), code)).encode("utf8")
+                    )
+                    self.__add_code(c, code)
+                f.flush()
+                self.__lookup_offset = f.tell()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __add_code(self, c, code):
+        self.lookup[code] = c
+        self.inverse_lookup[c] = code
+        if len(c) == 1:
+            self.__lookup_table[ord(c)] = code
+        self.lookup_code = max(self.lookup_code, int(code))
+
+    def __next_lookup_code(self):
+        self.__calc_next_lookup_code()
+        code = str(self.lookup_code)
+        if len(code) == 1:
+            code = "0" + code
+        return code
 
     def __calc_next_lookup_code(self):
         rem = self.lookup_code % 100
@@ -874,14 +1275,6 @@ class OCIManager(object):
             newcode = newcode * 10
         self.lookup_code = newcode
 
-    def __check_make_dirs(self, filename):
-        if not exists(dirname(filename)):
-            try:
-                makedirs(dirname(filename))
-            except OSError as exc:
-                if exc.errno != EEXIST:
-                    raise
-
     def __decode(self, s):
         result = []
 
@@ -915,6 +1308,30 @@ class OCIManager(object):
         )
         return self.oci
 
+    def get_ocis(self, pairs, prefix):
+        """It returns the ocis associated to several citations. It is faster than
+        calling get_oci for each citation, since each id is encoded once.
+
+        Args:
+            pairs (iterable): citing and cited of each citation
+            prefix (str): prefix
+
+        Returns:
+            list: the ocis, in the same order of the citations
+        """
+        encoded = {}
+        result = []
+        for doi_1, doi_2 in pairs:
+            if doi_1 not in encoded:
+                encoded[doi_1] = prefix + self.__decode_inverse(doi_1)
+            if doi_2 not in encoded:
+                encoded[doi_2] = prefix + self.__decode_inverse(doi_2)
+            result.append("oci:%s-%s" % (encoded[doi_1], encoded[doi_2]))
+
+        if result:
+            self.oci = result[-1]
+        return result
+
     @staticmethod
     def __join(l, j_value=""):
         if type(l) is list:
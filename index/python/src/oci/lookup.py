@@ -0,0 +1,331 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+from array import array
+from hashlib import blake2b
+from math import ceil
+from os import listdir, replace, stat
+from os.path import exists, join
+from struct import Struct, iter_unpack
+from zipfile import ZipFile
+
+from oc.index.utils.bloom import BloomFilter
+
+# Constants of std::hash<std::string> (libstdc++, 64 bit) and of the hash functions
+# of BooPHF, see index/cpp/include/StringHasher.hpp and index/cpp/lib/BooPHF.h
+MASK = 0xFFFFFFFFFFFFFFFF
+HASH_MUL = 0xC6A4A7935BD1E995
+HASH_SEED = 0xC70F6907
+LEVEL_SEEDS = (0xAAAAAAAA55555555, 0x33333333CCCCCCCC)
+BITS_PER_RANK_SAMPLE = 512
+
+_MPHF_HEADER = Struct("<diQQ")
+_UINT64 = Struct("<Q")
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+
+    def _popcount(value):
+        return bin(value).count("1")
+
+
+def std_hash(key):
+    """It returns the same hash that std::hash<std::string> returns in libstdc++
+    on 64 bit platforms, i.e. the one used to build the minimal perfect hash
+    functions of the OCIs.
+
+    Args:
+        key (bytes): the key
+
+    Returns:
+        int: the hash of the key
+    """
+    length = len(key)
+    aligned = length & ~7
+    result = (HASH_SEED ^ (length * HASH_MUL)) & MASK
+    for (data,) in iter_unpack("<Q", key[:aligned]):
+        data = (data * HASH_MUL) & MASK
+        data = ((data ^ (data >> 47)) * HASH_MUL) & MASK
+        result = ((result ^ data) * HASH_MUL) & MASK
+    if length & 7:
+        data = int.from_bytes(key[aligned:], "little")
+        result = ((result ^ data) * HASH_MUL) & MASK
+    result = ((result ^ (result >> 47)) * HASH_MUL) & MASK
+    return result ^ (result >> 47)
+
+
+class _LevelHashes(object):
+    """The hashes of a key for each level of a BooPHF function. They depend on the
+    key only, thus they are computed once for all the functions, and lazily since
+    most keys are found in the first levels."""
+
+    __slots__ = ("__hashes", "__state")
+
+    def __init__(self, key):
+        key_hash = std_hash(key)
+        self.__hashes = [key_hash ^ seed for seed in LEVEL_SEEDS]
+        self.__state = list(self.__hashes)
+
+    def __getitem__(self, level):
+        # Xorshift128* as in XorshiftHashFunctors::next
+        while level >= len(self.__hashes):
+            s1, s0 = self.__state
+            s1 ^= (s1 << 23) & MASK
+            s1 = s1 ^ s0 ^ (s1 >> 17) ^ (s0 >> 26)
+            self.__state = [s0, s1]
+            self.__hashes.append((s1 + s0) & MASK)
+        return self.__hashes[level]
+
+
+class _BooPHF(object):
+    """Reader of a minimal perfect hash function saved by boomphf::mphf::save."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        gamma, nb_levels, self.last_rank, self.nelem = _MPHF_HEADER.unpack_from(data)
+        offset = _MPHF_HEADER.size
+        self.levels = []
+        if self.nelem:
+            proba_collision = 1.0 - pow(
+                (gamma * self.nelem - 1) / (gamma * self.nelem), self.nelem - 1
+            )
+            hash_domain = ceil(self.nelem * gamma)
+        for level in range(nb_levels):
+            offset += _UINT64.size  # Size of the bit array
+            (words,) = _UINT64.unpack_from(data, offset)
+            offset += _UINT64.size
+            bits = array("Q", data[offset : offset + words * 8])
+            offset += words * 8
+            (ranks_size,) = _UINT64.unpack_from(data, offset)
+            offset += _UINT64.size
+            ranks = array("Q", data[offset : offset + ranks_size * 8])
+            offset += ranks_size * 8
+
+            domain = 64
+            if self.nelem:
+                domain = (
+                    (int(hash_domain * pow(proba_collision, level)) + 63) // 64 * 64
+                )
+            self.levels.append((domain or 64, bits, ranks))
+
+    def lookup(self, hashes):
+        """It returns the position of a key, as boomphf::mphf::lookup does.
+
+        Args:
+            hashes (_LevelHashes): the hashes of the key
+
+        Returns:
+            int: the position of the key, None if the key is surely not in the set.
+        """
+        # The keys of the last level are not saved, see boomphf::mphf::load
+        for level in range(len(self.levels) - 1):
+            domain, bits, ranks = self.levels[level]
+            position = hashes[level] % domain
+            word = position >> 6
+            if (bits[word] >> (position & 63)) & 1:
+                rank = ranks[position // BITS_PER_RANK_SAMPLE]
+                for w in range(position // BITS_PER_RANK_SAMPLE * 8, word):
+                    rank += _popcount(bits[w])
+                return rank + _popcount(bits[word] & ((1 << (position & 63)) - 1))
+        return None
+
+
+def _read_ocis(archive_path):
+    # The first column of each line but the header of each file of the archive
+    with ZipFile(archive_path) as archive:
+        for name in archive.namelist():
+            with archive.open(name) as f:
+                next(f, None)
+                for line in f:
+                    yield line.decode("utf8").rstrip("\n").split(",", 1)[0]
+
+
+class OCILookup(object):
+    """This class checks whether some OCIs are among the ones stored in the zip
+    archives of a directory, as the oc.index.lookup command does, using the minimal
+    perfect hash functions and the offsets built by oc.index.build. Differently
+    from the command, the functions and the offsets are loaded once, and any number
+    of queries can be run afterwards. Optionally, a Bloom filter of the OCIs stored
+    (see build_filter) is checked first, and only the OCIs which may be stored are
+    looked up in the hash functions and in the archives."""
+
+    def __init__(self, oci_dir, moph_dir, filter_path=None):
+        """OCILookup constructor.
+
+        Args:
+            oci_dir (str): path to the directory of the zip archives containing the
+            OCIs.
+            moph_dir (str): path to the directory of the minimal perfect hash
+            functions.
+            filter_path (str, optional): path to the Bloom filter of the OCIs stored
+            in oci_dir, if None no filter is used. Defaults to None.
+        """
+        self.bloom_filter = None
+        if filter_path is not None:
+            self.bloom_filter = BloomFilter.load(filter_path)
+            # A filter of other archives would reject some of the stored OCIs
+            if self.bloom_filter.tag != OCILookup.fingerprint(oci_dir):
+                raise ValueError(
+                    "%s is not the filter of the archives in %s, build it again"
+                    % (filter_path, oci_dir)
+                )
+
+        self.__entries = []
+        for archive_name in sorted(listdir(oci_dir)):
+            if not archive_name.endswith(".zip"):
+                continue
+            archive_path = join(oci_dir, archive_name)
+            with ZipFile(archive_path) as archive:
+                names = archive.namelist()
+            for idx, name in enumerate(names):
+                moph_path = join(moph_dir, "%s_%d" % (archive_name[:-4], idx))
+                starts = array("Q")
+                lengths = array("Q")
+                with open(moph_path + ".csv", encoding="utf8") as f:
+                    for line in f:
+                        start, length = line.split(",")
+                        starts.append(int(start))
+                        lengths.append(int(length))
+                self.__entries.append(
+                    (archive_path, name, _BooPHF(moph_path + ".bin"), starts, lengths)
+                )
+
+    @staticmethod
+    def fingerprint(oci_dir):
+        """It returns a digest of the names, sizes and modification times of the
+        zip archives of a directory, which changes whenever an archive is added,
+        removed or modified.
+
+        Args:
+            oci_dir (str): path to the directory of the zip archives containing the
+            OCIs.
+
+        Returns:
+            bytes: the digest
+        """
+        digest = blake2b(digest_size=32)
+        for archive_name in sorted(listdir(oci_dir)):
+            if archive_name.endswith(".zip"):
+                archive_stat = stat(join(oci_dir, archive_name))
+                digest.update(
+                    (
+                        "%s\0%d\0%d\n"
+                        % (archive_name, archive_stat.st_size, archive_stat.st_mtime_ns)
+                    ).encode("utf8")
+                )
+        return digest.digest()
+
+    @staticmethod
+    def is_filter_current(oci_dir, path):
+        """It checks whether the Bloom filter saved on file has been built from the
+        current zip archives of a directory (see fingerprint).
+
+        Args:
+            oci_dir (str): path to the directory of the zip archives containing the
+            OCIs.
+            path (str): path to the file of the filter.
+
+        Returns:
+            bool: True if the filter exists and it is current, False otherwise.
+        """
+        if not exists(path):
+            return False
+        try:
+            return BloomFilter.load(path).tag == OCILookup.fingerprint(oci_dir)
+        except (ValueError, OSError):
+            return False
+
+    @staticmethod
+    def build_filter(oci_dir, path, error_rate=0.001, max_size=0):
+        """It builds the Bloom filter of the OCIs stored in the zip archives of a
+        directory, reading them as oc.index.build does, and saves it on file. The
+        filter is tagged with the fingerprint of the archives, so that a filter
+        which is not current is detected.
+
+        Args:
+            oci_dir (str): path to the directory of the zip archives containing the
+            OCIs.
+            path (str): path to the file where the filter is saved.
+            error_rate (float, optional): expected rate of false positives. Defaults
+            to 0.001.
+            max_size (int, optional): maximum size of the filter in bytes, no limit
+            if 0. Defaults to 0.
+
+        Returns:
+            BloomFilter: the filter
+        """
+        archives = [
+            join(oci_dir, archive_name)
+            for archive_name in sorted(listdir(oci_dir))
+            if archive_name.endswith(".zip")
+        ]
+        fingerprint = OCILookup.fingerprint(oci_dir)
+        capacity = sum(1 for archive_path in archives for _ in _read_ocis(archive_path))
+        bloom_filter = BloomFilter(capacity, error_rate, max_size)
+        bloom_filter.tag = fingerprint
+        for archive_path in archives:
+            bloom_filter.update(_read_ocis(archive_path))
+        # The filter is replaced at once, since other processes may be using it
+        bloom_filter.save(path + ".tmp")
+        replace(path + ".tmp", path)
+        return bloom_filter
+
+    def __contains__(self, oci):
+        return self.exists([oci])[0]
+
+    def exists(self, ocis):
+        """It checks which OCIs are stored in the archives. The content of each
+        archive entry is read at most once, and only if some of the OCIs may be
+        in it.
+
+        Args:
+            ocis (iterable): the OCIs, without the 'oci:' prefix
+
+        Returns:
+            list: for each OCI, True if it is stored, False otherwise.
+        """
+        ocis = list(ocis)
+        result = [False] * len(ocis)
+
+        # The OCIs surely not stored are not looked up
+        probable = [
+            idx
+            for idx, oci in enumerate(ocis)
+            if self.bloom_filter is None or oci in self.bloom_filter
+        ]
+        keys = {idx: ocis[idx].encode("utf8") for idx in probable}
+        hashes = [(idx, _LevelHashes(keys[idx])) for idx in probable]
+
+        for archive_path, name, moph, starts, lengths in self.__entries:
+            candidates = []
+            for idx, key_hashes in hashes:
+                if not result[idx]:
+                    position = moph.lookup(key_hashes)
+                    if position is not None and position < len(starts):
+                        candidates.append((idx, position))
+            if candidates:
+                with ZipFile(archive_path) as archive:
+                    content = archive.read(name)
+                for idx, position in candidates:
+                    # The offsets saved by oc.index.build start from 1
+                    start = starts[position] - 1
+                    result[idx] = (
+                        content[start : start + lengths[position]] == keys[idx]
+                    )
+
+        return result
@@ -25,16 +25,73 @@ from rdflib import Graph, ConjunctiveGraph
 from rdflib.namespace import RDF
 from urllib.parse import quote
 from collections import OrderedDict
+from io import StringIO
 
 from oc.index.oci.citation import Citation
 
 
+class _CitationFileBuffer(object):
+    """This class keeps open one of the files managed by the storer and buffers
+    in memory the strings to append to it, writing them in a single call once
+    'buffer_size' entries have been collected."""
+
+    def __init__(self, f_path, buffer_size, opening="", closing=""):
+        """_CitationFileBuffer constructor.
+
+        Args:
+            f_path (str): path to the file to append to
+            buffer_size (int): number of entries to keep in memory before writing them
+            opening (str, optional): string written when the file is created, defaults to "".
+            closing (str, optional): string that terminates the file, it is removed when an
+            existing file is reopened and written again on close, defaults to "".
+        """
+        self.f_path = f_path
+        self.buffer_size = buffer_size
+        self.closing = closing
+        self.is_empty = not exists(f_path)
+
+        if not self.is_empty and closing:
+            with open(f_path, "rb+") as f:
+                f.seek(-len(closing.encode("utf8")), SEEK_END)
+                f.truncate()
+
+        self._buffer = [opening] if self.is_empty and opening else []
+        self._entries = 0
+        self._fp = open(f_path, "a", encoding="utf8")
+
+    def append(self, entry):
+        """It appends an entry to the buffer, flushing it if it is full.
+
+        Args:
+            entry (str): the string to append
+        """
+        self._buffer.append(entry)
+        self.is_empty = False
+        self._entries += 1
+        if self._entries >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """It writes the buffered entries in the file."""
+        if self._buffer:
+            self._fp.write("".join(self._buffer))
+            self._buffer = []
+        self._entries = 0
+
+    def close(self):
+        """It flushes the buffer, terminates the file and closes it."""
+        self._buffer.append(self.closing)
+        self.flush()
+        self._fp.close()
+
+
 class CitationStorer(object):
     """This class manages the saving on disk of the citations extracted from index."""
 
     CSV_EXT = "csv"
     RDF_EXT = "ttl"
     SLX_EXT = "scholix"
+    RDF_ENGINES = ("rdflib", "template")
 
     def __init__(
         self,
@@ -44,6 +101,8 @@ class CitationStorer(object):
         n_citations_rdf_file=1000000,
         n_citations_slx_file=5000000,
         suffix="",
+        buffer_size=10000,
+        rdf_engine="rdflib",
     ):
         """CitationStorer constructor.
 
@@ -54,7 +113,18 @@ class CitationStorer(object):
             n_citations_rdf_file (int, optional): number of ciitations in rdf file. Defaults to 1000000.
             n_citations_slx_file (int, optional): number of ciitations in slx file. Defaults to 5000000.
             suffix (str, optional): suffix, defaults to "".
+            buffer_size (int, optional): number of citations kept in memory for each file
+            when storing in buffered mode (see store_citations). Defaults to 10000.
+            rdf_engine (str, optional): engine used to serialise the rdf files, either "rdflib",
+            which builds and serialises rdflib graphs, or "template", which writes N-Triples and
+            N-Quads directly from string templates. Defaults to "rdflib".
         """
+        if rdf_engine not in CitationStorer.RDF_ENGINES:
+            raise ValueError(
+                "%s is not a valid rdf engine, use one of %s"
+                % (rdf_engine, ", ".join(CitationStorer.RDF_ENGINES))
+            )
+
         self.cur_time = datetime.now().strftime("%Y-%m-%dT%H%M%S")
         self.citation_dir_data_path = dir_data_path + sep + "data" + sep
         self.citation_dir_prov_path = dir_data_path + sep + "prov" + sep
@@ -97,6 +167,9 @@ class CitationStorer(object):
         self.n_citations_csv_file = n_citations_csv_file
         self.n_citations_rdf_file = n_citations_rdf_file
         self.n_citations_slx_file = n_citations_slx_file
+        self.buffer_size = buffer_size
+        self.rdf_engine = rdf_engine
+        self._buffers = None
 
         (
             self.cur_csv_filename,
@@ -262,9 +335,8 @@ class CitationStorer(object):
             dw.writerow(json_obj)
 
     @staticmethod
-    def __store_rdf_on_file(f_path, rdf_obj, format="nt"):
+    def __store_rdf_on_file(f_path, rdf_string):
         with open(f_path, "a", encoding="utf8") as f:
-            rdf_string = Citation.format_rdf(rdf_obj, format)
             f.write(rdf_string)
 
     @staticmethod
@@ -518,12 +590,82 @@ class CitationStorer(object):
 
                 yield c
 
+    def __enter__(self):
+        self._buffers = {}
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """It flushes all the citations buffered and closes the files kept open
+        by the buffered mode. It does nothing if the buffered mode is not active."""
+        if self._buffers is not None:
+            for buffer in self._buffers.values():
+                buffer.close()
+            self._buffers = None
+
+    def store_citations(self, citations):
+        """It stores all the citations in csv, rdf and scholix, keeping the files open
+        and writing them every 'buffer_size' citations. The files produced are the same
+        ones obtained calling store_citation on each citation. The same buffered mode
+        can be activated using the storer as a context manager.
+
+        Args:
+            citations (iterable): the citations to save, e.g. a list or a CitationBatch
+        """
+        if self._buffers is None:
+            with self:
+                self.store_citations(citations)
+        else:
+            for citation in citations:
+                self.store_citation(citation)
+
+    def __get_buffer(self, key, f_path, opening="", closing=""):
+        buffer = self._buffers.get(key)
+        if buffer is None or buffer.f_path != f_path:
+            if buffer is not None:
+                buffer.close()
+            buffer = _CitationFileBuffer(f_path, self.buffer_size, opening, closing)
+            self._buffers[key] = buffer
+        return buffer
+
+    @staticmethod
+    def __get_csv_row(header, json_obj=None):
+        s_res = StringIO()
+        dw = DictWriter(s_res, header)
+        if json_obj is None:
+            dw.writeheader()
+        else:
+            dw.writerow(json_obj)
+        return s_res.getvalue()
+
+    def __get_rdf_strings(self, citation):
+        if self.rdf_engine == "template":
+            return (
+                citation.get_citation_nt(self.rdf_resource_base),
+                citation.get_citation_prov_nq(self.rdf_resource_base),
+            )
+        return (
+            Citation.format_rdf(
+                citation.get_citation_rdf(self.rdf_resource_base, False, False, False),
+                "nt",
+            ),
+            Citation.format_rdf(
+                citation.get_citation_prov_rdf(self.rdf_resource_base), "nq"
+            ),
+        )
+
     def store_citation(self, citation):
-        """It stores the citation in csv, rdf and scholix.
+        """It stores the citation in csv, rdf and scholix. If the buffered mode is
+        active the citation is kept in memory until the related buffers are flushed.
 
         Args:
             citation (index.citation.Citation): the citation to save
         """
+        if self._buffers is not None:
+            self.__store_citation_buffered(citation)
+            return
 
         # Store data in CSV
         csv_filename = self.get_csv_filename(True)
@@ -546,15 +688,9 @@ class CitationStorer(object):
         data_rdf_f_path = self.data_rdf_dir + rdf_filename
         prov_rdf_f_path = self.prov_rdf_dir + rdf_filename
 
-        CitationStorer.__store_rdf_on_file(
-            data_rdf_f_path,
-            citation.get_citation_rdf(self.rdf_resource_base, False, False, False),
-        )
-        CitationStorer.__store_rdf_on_file(
-            prov_rdf_f_path,
-            citation.get_citation_prov_rdf(self.rdf_resource_base),
-            "nq",
-        )
+        data_rdf_string, prov_rdf_string = self.__get_rdf_strings(citation)
+        CitationStorer.__store_rdf_on_file(data_rdf_f_path, data_rdf_string)
+        CitationStorer.__store_rdf_on_file(prov_rdf_f_path, prov_rdf_string)
 
         # Store data in Scholix
         slx_filename = self.get_slx_filename(True)
@@ -563,3 +699,47 @@ class CitationStorer(object):
         CitationStorer.__store_slx_on_file(
             data_slx_f_path, citation.get_citation_scholix()
         )
+
+    def __store_citation_buffered(self, citation):
+        # Store data in CSV
+        csv_filename = self.get_csv_filename(True)
+        self.__get_buffer(
+            "data_csv",
+            self.data_csv_dir + csv_filename,
+            CitationStorer.__get_csv_row(Citation.header_citation_data),
+        ).append(
+            CitationStorer.__get_csv_row(
+                Citation.header_citation_data, loads(citation.get_citation_json())
+            )
+        )
+        self.__get_buffer(
+            "prov_csv",
+            self.prov_csv_dir + csv_filename,
+            CitationStorer.__get_csv_row(Citation.header_provenance_data),
+        ).append(
+            CitationStorer.__get_csv_row(
+                Citation.header_provenance_data,
+                loads(citation.get_citation_prov_json()),
+            )
+        )
+
+        # Store data in RDF
+        rdf_filename = self.get_rdf_filename(True)
+        data_rdf_string, prov_rdf_string = self.__get_rdf_strings(citation)
+        self.__get_buffer("data_rdf", self.data_rdf_dir + rdf_filename).append(
+            data_rdf_string
+        )
+        self.__get_buffer("prov_rdf", self.prov_rdf_dir + rdf_filename).append(
+            prov_rdf_string
+        )
+
+        # Store data in Scholix
+        slx_filename = self.get_slx_filename(True)
+        slx_buffer = self.__get_buffer(
+            "data_slx", self.data_slx_dir + slx_filename, "[", "]"
+        )
+        slx_buffer.append(
+            ("" if slx_buffer.is_empty else ",")
+            + "\n"
+            + citation.get_citation_scholix()
+        )
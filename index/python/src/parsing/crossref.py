@@ -16,42 +16,75 @@
 from json import load
 from oc.index.identifier.doi import DOIManager
 from oc.index.parsing.base import CitationParser
+from oc.index.utils.stream import JSONArrayReader, open_text
 
 
 class CrossrefParser(CitationParser):
-    def __init__(self):
+    def __init__(self, streaming=True):
+        """Crossref parser constructor.
+
+        Args:
+            streaming (bool, optional): if True the items of the dump files are read
+            one at a time instead of loading the whole file in memory, and the progress
+            (items and current_item) is measured in bytes of the file. Defaults to True.
+        """
         super().__init__()
         self._rows = []
+        self._reader = None
+        self._streaming = streaming
         self._doi_manager = DOIManager()
 
     def is_valid(self, filename: str):
         super().is_valid(filename)
-        return filename.endswith(".json")
+        return filename.endswith(".json") or filename.endswith(".json.gz")
 
     def parse(self, filename: str):
         super().parse(filename)
-        json_content = None
-        with open(filename, encoding="utf8") as fp:
-            json_content = load(fp)
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
 
-        if "items" in json_content:
-            self._rows = json_content.get("items")
-            self._items = len(self._rows)
+        if self._streaming:
+            self._reader = JSONArrayReader(filename, "items")
+            self._rows = iter(self._reader)
+            self._items = self._reader.size
+        else:
+            json_content = None
+            fp, _ = open_text(filename)
+            with fp:
+                json_content = load(fp)
+
+            if "items" in json_content:
+                self._rows = json_content.get("items")
+                self._items = len(self._rows)
+
+    def __next_row(self):
+        if self._reader is not None:
+            row = next(self._rows, None)
+            if row is None:
+                self._reader.close()
+                self._reader = None
+                self._current_item = self._items
+            else:
+                self._current_item = self._reader.position
+            return row
 
-    def get_next_citation_data(self):
         if len(self._rows) == 0:
             return None
-
-        row = self._rows.pop()
         self._current_item += 1
-        citing = self._doi_manager.normalise(row.get("DOI"))
-        if citing is not None and "reference" in row:
-            citations = []
-            for ref in row["reference"]:
-                cited = self._doi_manager.normalise(ref.get("DOI"))
-                if cited is not None:
-                    citations.append((citing, cited, None, None, None, None))
-            return citations
-
-        return self.get_next_citation_data()
-        
\ No newline at end of file
+        return self._rows.pop()
+
+    def get_next_citation_data(self):
+        row = self.__next_row()
+        while row is not None:
+            citing = self._doi_manager.normalise(row.get("DOI"))
+            if citing is not None and "reference" in row:
+                citations = []
+                for ref in row["reference"]:
+                    cited = self._doi_manager.normalise(ref.get("DOI"))
+                    if cited is not None:
+                        citations.append((citing, cited, None, None, None, None))
+                return citations
+            row = self.__next_row()
+
+        return None
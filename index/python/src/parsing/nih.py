@@ -13,15 +13,18 @@
 # ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
 # SOFTWARE.
 
+from collections import deque
+
 from oc.index.identifier.pmid import PMIDManager
 from oc.index.parsing.base import CitationParser
 import pandas as pd
 
 
 class NIHParser(CitationParser):
-    def __init__(self):
+    def __init__(self, chunk_size=100000):
         super().__init__()
-        self._rows = []
+        self._rows = deque()
+        self._chunk_size = chunk_size
         self._pmid_manager = PMIDManager()
 
     def is_valid(self, filename: str):
@@ -30,23 +33,23 @@ class NIHParser(CitationParser):
 
     def parse(self, filename: str):
         super().parse(filename)
-        df = pd.DataFrame()
-        for chunk in pd.read_csv(filename, chunksize=1000):
-            f = pd.concat([df, chunk], ignore_index=True)
-            f.fillna("", inplace=True)
-            self._rows = f.to_dict("records")
-            self._items = len(self._rows)
+        self._rows = deque()
+        for chunk in pd.read_csv(
+            filename,
+            usecols=["citing", "referenced"],
+            dtype=str,
+            chunksize=self._chunk_size,
+        ):
+            citing = self._pmid_manager.normalise_series(chunk["citing"])
+            cited = self._pmid_manager.normalise_series(chunk["referenced"])
+            valid = (citing != "") & (cited != "")
+            self._rows.extend(zip(citing[valid], cited[valid]))
+        self._items = len(self._rows)
 
     def get_next_citation_data(self):
-        if len(self._rows) == 0:
+        if not self._rows:
             return None
 
-        row = self._rows.pop(0)
+        citing, cited = self._rows.popleft()
         self._current_item += 1
-        citing = self._pmid_manager.normalise(row.get("citing"))
-        cited = self._pmid_manager.normalise(row.get("referenced"))
-
-        if citing is not None and cited is not None:
-            return citing, cited, None, None, None, None
-
-        return self.get_next_citation_data()
+        return citing, cited, None, None, None, None
@@ -1,9 +1,25 @@
+import gzip
 import json
 from os import sep, makedirs, walk
 from tqdm import tqdm
 import os.path
 import datetime
 
+from oc.index.utils.pipeline import batches, parallel_map
+
+RELEVANT_RELATIONS = {"references", "isreferencedby", "cites", "iscitedby"}
+
+
+def _filter_lines(lines):
+    """It returns the lines of a DataCite JSON-lines dump whose entities are
+    relevant, i.e. they are kept by DatacitePreProcessing.is_relevant."""
+    datacite_pp = DatacitePreProcessing()
+    result = []
+    for line in lines:
+        if line.strip() and datacite_pp.is_relevant(json.loads(line)):
+            result.append(line.decode("utf-8").strip())
+    return result
+
 
 class DatacitePreProcessing:
     """This class aims at pre-processing DataCite dumps.
@@ -55,162 +71,119 @@ class DatacitePreProcessing:
         result = []
         for cur_dir, cur_subdir, cur_files in walk(i_dir):
             for file in cur_files:
-                if file.lower().endswith(self._req_type):
+                if file.lower().endswith((self._req_type, self._req_type + ".gz")):
                     result.append(cur_dir + sep + file)
         return result
 
-    def counter_check(self, cur_n, target_n, out_dir, dict_to_json, data_values):
-        if int(cur_n) != 0 and int(cur_n) % int(target_n) == 0:
-            # to be logged: print( "Processed lines:", cur_n, ". Reduced json nr.", cur_n //target_n)
-            filename = "jSonFile_" + str(cur_n // target_n) + self._req_type
-            with (
-                open(os.path.join(out_dir, filename), "w", encoding="utf8")
-            ) as json_file:
-                dict_to_json["data"] = data_values
-                json.dump(dict_to_json, json_file)
-                empt_list = []
-                empt_dict = {}
-                return empt_list, empt_dict
+    def is_relevant(self, entity):
+        """It checks if an entity of the DataCite dump provides useful information,
+        i.e. either a citation to or from a DOI (for the parser) or at least a
+        date, an ORCID or an ISSN (for the glob).
+
+        Args:
+            entity (dict): the entity of the DataCite dump.
+
+        Returns:
+            bool: True if the entity must be kept, False otherwise.
+        """
+        attributes = entity["attributes"]
+        rel_ids = attributes["relatedIdentifiers"]
+
+        # Check if the entity provides citations
+        for rel_id in rel_ids:
+            if (rel_id.get("relationType") or "").lower() in RELEVANT_RELATIONS and (
+                rel_id.get("relatedIdentifierType") or ""
+            ).lower() == "doi":
+                return True
+
+        # Check if the entity provides info for support files (DATES)
+        if attributes["dates"] != []:
+            return True
+
+        # Check if the entity provides info for support files (ORCID)
+        for creator in attributes["creators"]:
+            for name_id in creator.get("nameIdentifiers") or ():
+                if (
+                    name_id.get("nameIdentifier")
+                    and (name_id.get("nameIdentifierScheme") or "").lower() == "orcid"
+                ):
+                    return True
+
+        # Check if the entity provides info for support files (ISSN)
+        if rel_ids != []:
+            for rel_id in rel_ids:
+                if (
+                    "relatedIdentifier" in rel_id
+                    and (rel_id.get("relationType") or "").lower() == "ispartof"
+                    and (rel_id.get("relatedIdentifierType") or "").lower() == "issn"
+                ):
+                    return True
         else:
-            return data_values, dict_to_json
-
-    def dump_filter_and_split(self, input_dir, output_dir, numJF):
-        relevant_relations = ["references", "isreferencedby", "cites", "iscitedby"]
-        all_files = self.get_all_files(input_dir)
-        for file_idx, file in enumerate(all_files):
-            data = []
-            datadict = {}
-            count = 0
-
-            with open(file, "r", encoding="utf-8") as f:
-                n_lines = 0
-                for line in tqdm(f):
-                    n_lines += 1
-                    # to be logged: print("Processing entity n.:", n_lines)
-
-                    linedict = json.loads(line)
-                    attributes = linedict["attributes"]
-                    rel_ids = attributes["relatedIdentifiers"]
-
-                    # Default settings
-                    creatorsWithOrcid = False
-                    issnsFromRelId = False
-                    issnsFromCont = False
-
-                    # Check if the entity provides info for support files (DATES)
-                    listDates = attributes["dates"] != []
-                    publicationYear = self.valiDate(str(attributes["publicationYear"]))
-
-                    # Check if the entity provides info for support files (ORCID)
-                    creators = attributes["creators"]
-                    if creators != []:
-                        creatorsWithIds = [
-                            author
-                            for author in creators
-                            if "nameIdentifiers" in author.keys()
-                        ]
-                        if creatorsWithIds != []:
-                            creatorsWithIdScheme = [
-                                nameId
-                                for nameId in creatorsWithIds
-                                if "nameIdentifier" in nameId.keys()
-                                and "nameIdentifierScheme" in nameId.keys()
-                            ]
-                            if creatorsWithIdScheme != []:
-                                creatorsWithOrcid = any(
-                                    idInfo["nameIdentifierScheme"].lower() == "orcid"
-                                    for idInfo in creatorsWithIdScheme
-                                )
-
-                    # Check if the entity provides info for support files (ISSN)
-                    if rel_ids != []:
-                        idsWithType = [
-                            relId
-                            for relId in rel_ids
-                            if "relationType" in relId.keys()
-                            and "relatedIdentifierType" in relId.keys()
-                            and "relatedIdentifier" in relId.keys()
-                        ]
-                        if idsWithType != []:
-                            issnsFromRelId = [
-                                relId
-                                for relId in idsWithType
-                                if relId["relationType"].lower() == "ispartof"
-                                and relId["relatedIdentifierType"].lower() == "issn"
-                            ] != []
-                    elif "container" in attributes.keys():
-                        container = attributes["container"]
-                        if (
-                            "identifier" in container.keys()
-                            and "identifierType" in container.keys()
-                        ):
-                            issnsFromCont = (
-                                container["identifier"] != ""
-                                and (container["identifierType"]).lower() == "issn"
-                            )
-
-                    # Check if the entity provides citations
-                    if rel_ids != []:
-                        for i in rel_ids:
-                            if (
-                                "relationType" in i.keys()
-                                and (i["relationType"]).lower() in relevant_relations
-                            ):
-                                if (
-                                    "relatedIdentifierType" in i.keys()
-                                    and (i["relatedIdentifierType"]).lower() == "doi"
-                                ):
-                                    data.append(linedict)
-                                    count += 1
-                                    break
-
-                                # Keep the entity if it provides at least info for the support files
-                                elif (
-                                    creatorsWithOrcid
-                                    or listDates
-                                    or publicationYear
-                                    or issnsFromRelId
-                                    or issnsFromCont
-                                ):
-                                    data.append(linedict)
-                                    count += 1
-                                    break
-
-                            # Keep the entity if it provides at least info for the support files
-                            elif (
-                                creatorsWithOrcid
-                                or listDates
-                                or publicationYear
-                                or issnsFromRelId
-                                or issnsFromCont
-                            ):
-                                data.append(linedict)
-                                count += 1
-                                break
-
-                            data, datadict = self.counter_check(
-                                count, numJF, output_dir, datadict, data
-                            )
-
-                    # Keep the entity if it provides at least info for the support files
-                    elif (
-                        creatorsWithOrcid
-                        or listDates
-                        or publicationYear
-                        or issnsFromRelId
-                        or issnsFromCont
-                    ):
-                        data.append(linedict)
-                        count += 1
-
-                    data, datadict = self.counter_check(
-                        count, numJF, output_dir, datadict, data
+            container = attributes.get("container") or {}
+            if (
+                container.get("identifier")
+                and (container.get("identifierType") or "").lower() == "issn"
+            ):
+                return True
+
+        return bool(self.valiDate(str(attributes["publicationYear"])))
+
+    def dump_filter_and_split(
+        self, input_dir, output_dir, numJF, workers=1, batch_size=10000
+    ):
+        """It keeps only the relevant entities (see is_relevant) of the DataCite
+        JSON-lines dumps, which may be compressed with gzip, and stores them in JSON
+        files containing 'numJF' entities each, plus a last file with the remaining
+        ones. The dumps are streamed in batches of lines filtered in parallel,
+        and each output file is written incrementally.
+
+        Args:
+            input_dir (str): the directory containing the DataCite dumps.
+            output_dir (str): the directory where the JSON files are stored.
+            numJF (int): the number of entities of each JSON file.
+            workers (int, optional): the number of processes filtering the
+            entities. Defaults to 1.
+            batch_size (int, optional): the number of lines sent to a process at a
+            time. Defaults to 10000.
+        """
+        numJF = int(numJF)
+        count = 0
+        out_file = None
+
+        def lines():
+            for file in self.get_all_files(input_dir):
+                opener = gzip.open if file.lower().endswith(".gz") else open
+                with opener(file, "rb") as f:
+                    yield from tqdm(f)
+
+        for kept_lines in parallel_map(
+            _filter_lines, batches(lines(), batch_size), workers
+        ):
+            for line in kept_lines:
+                if out_file is None:
+                    # Not a JSON file until it is complete, see __close_chunk
+                    out_file = open(
+                        os.path.join(output_dir, "jSonFile_part.tmp"),
+                        "w",
+                        encoding="utf8",
                     )
-
-                if len(data) > 0:
-                    filename = "jSonFile_rest" + self._req_type
-                    with (
-                        open(os.path.join(output_dir, filename), "w", encoding="utf8")
-                    ) as json_file:
-                        datadict["data"] = data
-                        json.dump(datadict, json_file)
+                    out_file.write('{"data": [')
+                else:
+                    out_file.write(", ")
+                out_file.write(line)
+                count += 1
+
+                if count % numJF == 0:
+                    self.__close_chunk(out_file, output_dir, str(count // numJF))
+                    out_file = None
+
+        if out_file is not None:
+            self.__close_chunk(out_file, output_dir, "rest")
+
+    def __close_chunk(self, out_file, output_dir, suffix):
+        out_file.write("]}")
+        out_file.close()
+        os.replace(
+            out_file.name,
+            os.path.join(output_dir, "jSonFile_" + suffix + self._req_type),
+        )
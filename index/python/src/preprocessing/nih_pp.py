@@ -1,9 +1,100 @@
 from os import sep, makedirs, walk
 import os.path
 from os.path import exists
+from itertools import islice
 import csv
 import pandas as pd
 
+from oc.index.utils.pipeline import parallel_map
+
+
+class _ChunkWriter(object):
+    """It writes rows in CSV files containing a fixed number of rows, keeping the
+    file being filled open. Each file is stored with its final name as soon as it
+    is full, while the remaining rows are stored in the 'Rem' file on close."""
+
+    def __init__(self, out_dir, num, prefix="", req_type=".csv"):
+        self.__out_dir = out_dir
+        self.__num = int(num)
+        self.__prefix = prefix
+        self.__req_type = req_type
+        self.__count = 0
+        self.__file = None
+        self.__writer = None
+
+    def write(self, headers, rows):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.__num - self.__count % self.__num))
+            if not batch:
+                break
+            if self.__file is None:
+                self.__file = open(
+                    os.path.join(self.__out_dir, "CSVFile_%spart.tmp" % self.__prefix),
+                    "w",
+                    encoding="utf8",
+                    newline="",
+                    buffering=1048576,
+                )
+                self.__writer = csv.writer(self.__file)
+                self.__writer.writerow(headers)
+            self.__writer.writerows(batch)
+            self.__count += len(batch)
+            if self.__count % self.__num == 0:
+                self.__store(str(self.__count // self.__num))
+
+    def close(self):
+        if self.__file is not None:
+            self.__store("Rem")
+
+    def __store(self, suffix):
+        self.__file.close()
+        os.replace(
+            self.__file.name,
+            os.path.join(
+                self.__out_dir,
+                "CSVFile_" + self.__prefix + suffix + self.__req_type,
+            ),
+        )
+        self.__file = None
+        self.__writer = None
+
+
+def _read_rows(file, filter_col, chunk_size):
+    """It returns the headers and an iterator over the rows of a CSV file, which
+    is read by chunks of 'chunk_size' rows and projected on 'filter_col' if
+    specified."""
+    if filter_col is None:
+        f = open(file, "r", encoding="utf8", newline="")
+        reader = csv.reader(f)
+        headers = next(reader, None) or []
+
+        def rows():
+            with f:
+                yield from reader
+
+    else:
+        headers = list(filter_col)
+
+        def rows():
+            for chunk in pd.read_csv(
+                file,
+                usecols=headers,
+                dtype=str,
+                keep_default_na=False,
+                chunksize=chunk_size,
+            ):
+                yield from chunk[headers].values.tolist()
+
+    return headers, rows()
+
+
+def _split_file(task):
+    file, output_dir, num, filter_col, prefix, chunk_size, req_type = task
+    writer = _ChunkWriter(output_dir, num, prefix, req_type)
+    writer.write(*_read_rows(file, filter_col, chunk_size))
+    writer.close()
+
 
 class NIHPreProcessing:
     """This class aims at pre-processing iCite Database Snapshots (NIH Open
@@ -48,35 +139,48 @@ class NIHPreProcessing:
                 writer.writerows(lines)
             return
 
-    def dump_split(self, input_dir, output_dir, num, filter_col=None):
+    def dump_split(
+        self, input_dir, output_dir, num, filter_col=None, workers=1, chunk_size=10000
+    ):
+        """It splits the CSV files of the iCite snapshot in CSV files containing
+        'num' rows each (named CSVFile_<n>.csv), plus a last one with the remaining
+        rows (CSVFile_Rem.csv). The input files are streamed by chunks, so that the
+        memory used does not depend on their size. If 'workers' is greater than
+        one, the input files are split in parallel and independently one from the
+        other, and the names of the output files of the i-th input file start
+        with CSVFile_<i>_.
+
+        Args:
+            input_dir (str): the directory containing the iCite CSV files.
+            output_dir (str): the directory where the CSV files are stored.
+            num (int): the number of rows of each CSV file.
+            filter_col (list, optional): the columns to keep, all if None.
+            Defaults to None.
+            workers (int, optional): the number of processes. Defaults to 1.
+            chunk_size (int, optional): the number of rows read at a time when
+            filtering the columns. Defaults to 10000.
+        """
         all_files = self.get_all_files(input_dir)
-        count = 0
-        lines = []
-        if filter_col is None:
-            for file_idx, file in enumerate(all_files):
-                with open(file, "r") as f:
-                    f = csv.reader(f)
-                    headers = next(f)
-                    for line in f:
-                        count += 1
-                        lines.append(line)
-                        if int(count) != 0 and int(count) % int(num) == 0:
-                            lines = self.chunk_to_file(
-                                count, num, output_dir, headers, lines
-                            )
+        if not exists(output_dir):
+            makedirs(output_dir)
+
+        if workers > 1:
+            tasks = [
+                (
+                    file,
+                    output_dir,
+                    num,
+                    filter_col,
+                    "%d_" % file_idx,
+                    chunk_size,
+                    self._req_type,
+                )
+                for file_idx, file in enumerate(all_files, 1)
+            ]
+            for _ in parallel_map(_split_file, tasks, workers, pending=1):
+                pass
         else:
-            for file_idx, file in enumerate(all_files):
-                df = pd.read_csv(file, usecols=filter_col, low_memory=True)
-                df.fillna("", inplace=True)
-                f = df.values.tolist()
-                headers = filter_col
-                for line in f:
-                    count += 1
-                    lines.append(line)
-                    if int(count) != 0 and int(count) % int(num) == 0:
-                        lines = self.chunk_to_file(
-                            count, num, output_dir, headers, lines
-                        )
-
-        if len(lines) > 0:
-            self.chunk_to_file(count, num, output_dir, headers, lines)
+            writer = _ChunkWriter(output_dir, num, req_type=self._req_type)
+            for file in all_files:
+                writer.write(*_read_rows(file, filter_col, chunk_size))
+            writer.close()
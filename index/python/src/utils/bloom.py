@@ -0,0 +1,143 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+from hashlib import blake2b
+from math import ceil, exp, log
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+
+_HEADER = Struct("<4sBQQB32s")
+
+
+class BloomFilter(object):
+    """This class implements a Bloom filter of strings, i.e. a compact set which
+    can tell that a string has surely not been added to it, or that it has
+    probably been added to it. The positions of the bits of each string are
+    obtained by double hashing from a single 128 bit hash. A filter can be saved
+    on file, together with a tag of up to 32 bytes identifying its content, and
+    loaded through a read-only memory map, so that the processes loading the same
+    file share its memory."""
+
+    MAGIC = b"OCBF"
+
+    def __init__(self, capacity, error_rate=0.01, max_size=0):
+        """Bloom filter constructor.
+
+        Args:
+            capacity (int): expected number of strings in the filter.
+            error_rate (float, optional): expected rate of false positives once the
+            filter contains 'capacity' strings. Defaults to 0.01.
+            max_size (int, optional): maximum size of the filter in bytes, no limit
+            if 0. If the size needed for 'error_rate' is bigger, the error rate is
+            higher. Defaults to 0.
+        """
+        capacity = max(capacity, 1)
+        nbits = ceil(-capacity * log(error_rate) / (log(2) ** 2))
+        if max_size:
+            nbits = min(nbits, max_size * 8)
+        self.nbits = max(nbits, 8)
+        self.hashes = max(1, round(self.nbits / capacity * log(2)))
+        self.count = 0
+        self.tag = b""
+        self.__bits = bytearray((self.nbits + 7) // 8)
+
+    @staticmethod
+    def load(path):
+        """It loads a filter saved by BloomFilter.save, the filter can not be
+        changed afterwards.
+
+        Args:
+            path (str): path to the file
+
+        Returns:
+            BloomFilter: the filter
+        """
+        with open(path, "rb") as f:
+            data = mmap(f.fileno(), 0, access=ACCESS_READ)
+        magic, hashes, nbits, count, tag_size, tag = _HEADER.unpack_from(data)
+        if magic != BloomFilter.MAGIC:
+            raise ValueError("%s is not a Bloom filter" % path)
+
+        bloom_filter = BloomFilter.__new__(BloomFilter)
+        bloom_filter.nbits = nbits
+        bloom_filter.hashes = hashes
+        bloom_filter.count = count
+        bloom_filter.tag = tag[:tag_size]
+        bloom_filter.__bits = memoryview(data)[_HEADER.size :]
+        return bloom_filter
+
+    def save(self, path):
+        """It saves the filter on file, with its tag.
+
+        Args:
+            path (str): path to the file
+        """
+        if len(self.tag) > 32:
+            raise ValueError("The tag of a Bloom filter can not exceed 32 bytes")
+        with open(path, "wb") as f:
+            f.write(
+                _HEADER.pack(
+                    self.MAGIC,
+                    self.hashes,
+                    self.nbits,
+                    self.count,
+                    len(self.tag),
+                    self.tag,
+                )
+            )
+            f.write(self.__bits)
+
+    @property
+    def size(self):
+        """int: size of the filter in bytes."""
+        return len(self.__bits)
+
+    @property
+    def error_rate(self):
+        """float: expected rate of false positives with the strings added so far."""
+        return (1 - exp(-self.hashes * self.count / self.nbits)) ** self.hashes
+
+    def __positions(self, key):
+        digest = blake2b(key.encode("utf8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.nbits for i in range(self.hashes)]
+
+    def add(self, key):
+        """It adds a string to the filter.
+
+        Args:
+            key (str): the string
+        """
+        bits = self.__bits
+        for position in self.__positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, keys):
+        """It adds several strings to the filter.
+
+        Args:
+            keys (iterable): the strings
+        """
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key):
+        bits = self.__bits
+        for position in self.__positions(key):
+            if not (bits[position >> 3] >> (position & 7)) & 1:
+                return False
+        return True
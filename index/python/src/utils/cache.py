@@ -0,0 +1,314 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import os
+import sqlite3
+from collections import OrderedDict
+from json import loads
+from threading import Lock
+from time import time
+
+from oc.index.utils.config import get_config
+from oc.index.utils.http import get_session
+
+_shared_cache = None
+_shared_cache_lock = Lock()
+
+
+class CachedResponse(object):
+    """This class exposes the part of the interface of requests.Response used by
+    the resource finders and the identifier managers for a cached response."""
+
+    def __init__(self, url, status_code, text):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.encoding = "utf-8"
+
+    @property
+    def content(self):
+        return self.text.encode("utf-8")
+
+    def json(self):
+        return loads(self.text)
+
+
+class ResponseCache(object):
+    """This class implements a cache of the responses of HTTP GET requests, made of
+    a LRU cache in memory in front of a SQLite database on disk. The database can
+    be shared by several processes, so that each URL is requested at most once
+    until its response expires. Only successful (200) and not found (404)
+    responses are cached, since the others may be temporary. Not found responses
+    expire much earlier, since the resource may be registered in the meantime."""
+
+    CACHED_STATUS = (200, 404)
+
+    def __init__(
+        self,
+        path=None,
+        ttl=2592000,
+        not_found_ttl=3600,
+        memory_size=10000,
+        disk_size=1000000,
+        session=None,
+    ):
+        """Response cache constructor.
+
+        Args:
+            path (str, optional): path to the SQLite database, if None the responses
+            are kept in memory only. Defaults to None.
+            ttl (int, optional): seconds after which a response expires, no
+            expiration if 0. Defaults to 2592000 (30 days).
+            not_found_ttl (int, optional): seconds after which a not found (404)
+            response expires, such responses are not cached if 0. Defaults to
+            3600 (1 hour).
+            memory_size (int, optional): maximum number of responses kept in memory.
+            Defaults to 10000.
+            disk_size (int, optional): maximum number of responses kept on disk, the
+            oldest ones are removed first. Defaults to 1000000.
+            session (requests.Session, optional): the session used to make the
+            requests, if None the shared one is used. Defaults to None.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.not_found_ttl = not_found_ttl
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.session = session
+        self.hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()
+        self._lock = Lock()
+        self._connection = None
+        self._pid = None
+        self._stored = 0
+
+    def get(self, url, headers=None, timeout=30, session=None):
+        """It returns the response to a GET request to the url, requesting it only
+        if it is not already in the cache.
+
+        Args:
+            url (str): the url to request
+            headers (dict, optional): the headers of the request. Defaults to None.
+            timeout (int, optional): seconds to wait for the response. Defaults to 30.
+            session (requests.Session, optional): the session used to make the
+            request instead of the one of the cache. Defaults to None.
+
+        Returns:
+            requests.Response or CachedResponse: the response.
+        """
+        response = self.lookup(url)
+        if response is not None:
+            return response
+
+        if session is None:
+            session = get_session() if self.session is None else self.session
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code in self.CACHED_STATUS and (
+            response.status_code != 404 or self.not_found_ttl > 0
+        ):
+            response.encoding = "utf-8"
+            self.store(url, response.status_code, response.text)
+        return response
+
+    def lookup(self, url):
+        """It returns the cached response of a url, if any.
+
+        Args:
+            url (str): the requested url
+
+        Returns:
+            CachedResponse: the response, None if not in the cache or expired.
+        """
+        now = time()
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is not None and self.__is_expired(entry, now):
+                del self._memory[url]
+                entry = None
+            if entry is None and self.path is not None:
+                entry = (
+                    self.__get_connection()
+                    .execute(
+                        "SELECT created, status, body FROM responses WHERE url = ?",
+                        (url,),
+                    )
+                    .fetchone()
+                )
+                if entry is not None and self.__is_expired(entry, now):
+                    entry = None
+                if entry is not None:
+                    self.__memorize(url, entry)
+            elif entry is not None:
+                self._memory.move_to_end(url)
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return CachedResponse(url, entry[1], entry[2])
+
+    def store(self, url, status_code, text):
+        """It adds a response to the cache.
+
+        Args:
+            url (str): the requested url
+            status_code (int): the status code of the response
+            text (str): the body of the response
+        """
+        entry = (time(), status_code, text)
+        with self._lock:
+            self.__memorize(url, entry)
+            if self.path is not None:
+                connection = self.__get_connection()
+                with connection:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                        (url,) + entry,
+                    )
+                self._stored += 1
+                if self._stored % 1000 == 0:
+                    self.__evict(connection)
+
+    def stats(self):
+        """It returns the number of hits and misses of the cache.
+
+        Returns:
+            dict: the number of hits, misses and the hit ratio.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "ratio": self.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        """It removes all the responses from the cache."""
+        with self._lock:
+            self._memory.clear()
+            if self.path is not None:
+                connection = self.__get_connection()
+                with connection:
+                    connection.execute("DELETE FROM responses")
+
+    def close(self):
+        """It closes the connection to the database."""
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def __is_expired(self, entry, now):
+        created, status = entry[0], entry[1]
+        if status == 404:
+            return now - created > self.not_found_ttl
+        return self.ttl > 0 and now - created > self.ttl
+
+    def __memorize(self, url, entry):
+        self._memory[url] = entry
+        self._memory.move_to_end(url)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def __evict(self, connection):
+        with connection:
+            if self.ttl > 0:
+                connection.execute(
+                    "DELETE FROM responses WHERE created < ?", (time() - self.ttl,)
+                )
+            connection.execute(
+                "DELETE FROM responses WHERE status = 404 AND created < ?",
+                (time() - self.not_found_ttl,),
+            )
+            excess = (
+                connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                - self.disk_size
+            )
+            if excess > 0:
+                connection.execute(
+                    "DELETE FROM responses WHERE url IN "
+                    "(SELECT url FROM responses ORDER BY created LIMIT ?)",
+                    (excess,),
+                )
+
+    def __get_connection(self):
+        # A connection can not be shared with the processes forked by this one
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(
+                self.path, timeout=60, check_same_thread=False
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            with self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS responses "
+                    "(url TEXT PRIMARY KEY, created REAL, status INTEGER, body TEXT)"
+                )
+                self._connection.execute(
+                    "CREATE INDEX IF NOT EXISTS responses_created "
+                    "ON responses (created)"
+                )
+            self._pid = os.getpid()
+        return self._connection
+
+
+def get_response_cache():
+    """It returns the response cache shared by the resource finders and the
+    identifier managers, as set in the section cache of the configuration.
+
+    Returns:
+        ResponseCache: the shared cache, None if disabled.
+    """
+    global _shared_cache
+
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            config = get_config()
+            if not config.getboolean("cache", "enabled", fallback=False):
+                return None
+            path = config.get("cache", "path", fallback="")
+            _shared_cache = ResponseCache(
+                os.path.expanduser(path) if path else None,
+                config.getint("cache", "ttl", fallback=2592000),
+                config.getint("cache", "not_found_ttl", fallback=3600),
+                config.getint("cache", "memory_size", fallback=10000),
+                config.getint("cache", "disk_size", fallback=1000000),
+            )
+        return _shared_cache
+
+
+def cached_get(url, headers=None, timeout=30, session=None):
+    """It makes a GET request through the shared response cache, or directly if
+    the cache is disabled.
+
+    Args:
+        url (str): the url to request
+        headers (dict, optional): the headers of the request. Defaults to None.
+        timeout (int, optional): seconds to wait for the response. Defaults to 30.
+        session (requests.Session, optional): the session used to make the
+        request, if None the shared one is used. Defaults to None.
+
+    Returns:
+        requests.Response or CachedResponse: the response.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        session = get_session() if session is None else session
+        return session.get(url, headers=headers, timeout=timeout)
+    return cache.get(url, headers=headers, timeout=timeout, session=session)
@@ -0,0 +1,126 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import os
+from inspect import signature
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from threading import Lock
+from urllib3.util.retry import Retry
+
+from oc.index.utils.config import get_config
+
+# Status codes of the responses whose requests are tried again
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# Keywords accepted by Retry, which changed between urllib3 1.x and 2.x
+_RETRY_PARAMETERS = signature(Retry.__init__).parameters
+
+_shared_session = None
+_shared_session_pid = None
+_shared_session_lock = Lock()
+
+
+def create_session(
+    retries=5, backoff=0.5, backoff_max=60, jitter=0.5, pool_size=10, pool_hosts=10
+):
+    """It creates a session that keeps the connections to each host alive and
+    reuses them, and tries again the requests that fail because of connection
+    errors, timeouts or the status codes in RETRY_STATUS. The time to wait before
+    trying again grows exponentially, plus a random jitter, unless the response
+    specifies it in a Retry-After header (e.g. for the 429 of Crossref and
+    DataCite). The jitter is applied only with urllib3 2.x. At most 'pool_size'
+    connections are opened to the same host: further concurrent requests wait for
+    a free connection.
+
+    Args:
+        retries (int, optional): maximum number of retries of a request.
+        Defaults to 5.
+        backoff (float, optional): seconds to wait before the second retry, doubled
+        at each retry. Defaults to 0.5.
+        backoff_max (float, optional): maximum seconds to wait between two tries.
+        Defaults to 60.
+        jitter (float, optional): maximum random seconds added to each wait, only
+        with urllib3 2.x. Defaults to 0.5.
+        pool_size (int, optional): maximum number of connections to the same host.
+        Defaults to 10.
+        pool_hosts (int, optional): number of hosts whose connections are kept.
+        Defaults to 10.
+
+    Returns:
+        requests.Session: the session.
+    """
+    retry_class = Retry
+    options = {}
+    if "backoff_max" in _RETRY_PARAMETERS:
+        options["backoff_max"] = backoff_max
+        options["backoff_jitter"] = jitter
+    else:
+        # urllib3 1.x reads the maximum wait from a class attribute, named
+        # BACKOFF_MAX before 1.26.9, and has no jitter
+        retry_class = type(
+            "Retry",
+            (Retry,),
+            {"DEFAULT_BACKOFF_MAX": backoff_max, "BACKOFF_MAX": backoff_max},
+        )
+    methods = frozenset(["GET", "HEAD"])
+    if "allowed_methods" in _RETRY_PARAMETERS:
+        options["allowed_methods"] = methods
+    else:
+        options["method_whitelist"] = methods
+
+    retry = retry_class(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+        **options,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_hosts,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+        pool_block=True,
+    )
+    session = Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """It returns the session shared by the resource finders and the identifier
+    managers of this process, as set in the section http of the configuration.
+
+    Returns:
+        requests.Session: the shared session.
+    """
+    global _shared_session, _shared_session_pid
+
+    with _shared_session_lock:
+        # The connections can not be shared with the processes forked by this one
+        if _shared_session is None or _shared_session_pid != os.getpid():
+            config = get_config()
+            _shared_session = create_session(
+                config.getint("http", "retries", fallback=5),
+                config.getfloat("http", "backoff", fallback=0.5),
+                config.getfloat("http", "backoff_max", fallback=60),
+                config.getfloat("http", "jitter", fallback=0.5),
+                config.getint("http", "pool_size", fallback=10),
+            )
+            _shared_session_pid = os.getpid()
+        return _shared_session
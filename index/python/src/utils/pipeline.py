@@ -0,0 +1,160 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from queue import Queue
+from threading import Event, Thread
+
+_END = object()
+
+
+def _produce(source, out_queue, stop, errors):
+    try:
+        for item in source:
+            if stop.is_set():
+                break
+            out_queue.put(item)
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        out_queue.put(_END)
+
+
+def _consume(fun, in_queue, out_queue, stop, errors):
+    # The input queue is always drained up to its end, even after an error,
+    # so that the previous stages are never blocked on a full queue
+    item = in_queue.get()
+    while item is not _END:
+        if not stop.is_set():
+            try:
+                out_queue.put(fun(item))
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+        item = in_queue.get()
+    out_queue.put(_END)
+
+
+def batches(iterable, size):
+    """It splits the items of an iterable in lists of at most 'size' elements,
+    without copying the items that follow each batch.
+
+    Args:
+        iterable (iterable): the items to split
+        size (int): the maximum number of items of each batch
+
+    Yields:
+        list: the next batch of items
+    """
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def parallel_map(fun, iterable, workers=1, pending=2, threads=False):
+    """It applies 'fun' to the items of an iterable with a pool of processes,
+    and returns the results in the same order of the items. The iterable is
+    consumed lazily by the calling process, so that at most 'pending' items per
+    worker are waiting to be processed at the same time.
+
+    Args:
+        fun (callable): the function to apply, it must be picklable
+        iterable (iterable): the items to process, they must be picklable
+        workers (int, optional): the number of processes, if it is lower than
+        two the items are processed in the calling process. Defaults to 1.
+        pending (int, optional): maximum number of items per worker waiting to be
+        processed. Defaults to 2.
+        threads (bool, optional): True to use a pool of threads instead, e.g. for
+        functions waiting for the network, in which case neither 'fun' nor the
+        items must be picklable. Defaults to False.
+
+    Yields:
+        any: the result of 'fun' for each item of the iterable
+    """
+    if workers <= 1:
+        yield from map(fun, iterable)
+        return
+
+    executor_class = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        futures = deque()
+        try:
+            for item in iterable:
+                if len(futures) >= workers * pending:
+                    yield futures.popleft().result()
+                futures.append(executor.submit(fun, item))
+            while futures:
+                yield futures.popleft().result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def run_pipeline(source, stages, queue_size=4):
+    """It runs a sequence of stages concurrently, each one in its own thread,
+    on the items produced by 'source'. Stages are connected by bounded queues,
+    so that a stage waits when the following one is 'queue_size' items behind.
+    The results of the last stage are returned in the same order of the items
+    of the source. If a stage raises an exception, the pipeline is stopped and
+    the exception is raised again by this generator.
+
+    Args:
+        source (iterable): the items to process, consumed in a dedicated thread
+        stages (list): functions to apply in sequence, each one taking as input
+        the result of the previous one
+        queue_size (int, optional): maximum number of items waiting between two
+        stages. Defaults to 4.
+
+    Yields:
+        any: the result of the last stage for each item of the source
+    """
+    stop = Event()
+    errors = []
+    queues = [Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    threads = [Thread(target=_produce, args=(source, queues[0], stop, errors))]
+    for idx, stage in enumerate(stages):
+        threads.append(
+            Thread(
+                target=_consume,
+                args=(stage, queues[idx], queues[idx + 1], stop, errors),
+            )
+        )
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    item = None
+    try:
+        item = queues[-1].get()
+        while item is not _END:
+            if not stop.is_set():
+                yield item
+            item = queues[-1].get()
+    finally:
+        if item is not _END:
+            # The consumer stopped before the end of the pipeline
+            stop.set()
+            while item is not _END:
+                item = queues[-1].get()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,156 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import gzip
+
+from io import TextIOWrapper
+from json import JSONDecoder, JSONDecodeError
+from os.path import getsize
+
+_decoder = JSONDecoder()
+_whitespaces = " \t\n\r"
+
+
+def open_text(filename, encoding="utf8"):
+    """It opens a text file for reading, decompressing it on the fly if its name
+    ends with '.gz'.
+
+    Args:
+        filename (str): path to the file
+        encoding (str, optional): the encoding of the file. Defaults to "utf8".
+
+    Returns:
+        tuple: the text stream and the underlying binary file, whose position
+        is the number of bytes read from the disk.
+    """
+    raw = open(filename, "rb")
+    binary = gzip.GzipFile(fileobj=raw) if filename.endswith(".gz") else raw
+    return TextIOWrapper(binary, encoding=encoding), raw
+
+
+class JSONArrayReader(object):
+    """This class reads the items of a JSON array one at a time, without loading
+    the whole file in memory. The array can be the whole document or the value of
+    a key of the root object (e.g. 'items' in the Crossref dump files). Files whose
+    name ends with '.gz' are decompressed on the fly."""
+
+    def __init__(self, filename, key=None, chunk_size=1048576):
+        """JSONArrayReader constructor.
+
+        Args:
+            filename (str): path to the JSON file
+            key (str, optional): key of the root object containing the array, None if
+            the root of the document is the array. Defaults to None.
+            chunk_size (int, optional): number of characters read at a time. Defaults to 1048576.
+        """
+        self._fp, self._raw = open_text(filename)
+        self._key = key
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self.size = getsize(filename)
+
+    @property
+    def position(self):
+        """It returns the number of bytes of the file read so far."""
+        return self.size if self._raw.closed else self._raw.tell()
+
+    def close(self):
+        """It closes the file."""
+        self._fp.close()
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        if self._key is None:
+            yield from self.__read_array()
+        else:
+            self.__expect("{")
+            if self.__peek() == "}":
+                return
+            while True:
+                cur_key = self.__decode()
+                self.__expect(":")
+                if cur_key == self._key:
+                    yield from self.__read_array()
+                else:
+                    self.__decode()
+                if self.__next_separator("}"):
+                    return
+
+    def __read_array(self):
+        self.__expect("[")
+        if self.__peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.__decode()
+            if self.__next_separator("]"):
+                return
+
+    def __fill(self):
+        # Read at least as much as the current buffer, so as to keep linear the
+        # cost of decoding items bigger than the chunk size
+        data = self._fp.read(max(self._chunk_size, len(self._buffer) - self._pos))
+        if not data:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos :] + data
+        self._pos = 0
+        return True
+
+    def __peek(self):
+        while True:
+            while self._pos < len(self._buffer):
+                if self._buffer[self._pos] not in _whitespaces:
+                    return self._buffer[self._pos]
+                self._pos += 1
+            if not self.__fill():
+                return ""
+
+    def __expect(self, c):
+        found = self.__peek()
+        if found != c:
+            raise JSONDecodeError(
+                "Expecting '%s', found '%s'" % (c, found), self._buffer, self._pos
+            )
+        self._pos += 1
+
+    def __next_separator(self, closing):
+        # It consumes the separator after a value, returning True if it closes the container
+        if self.__peek() == closing:
+            self._pos += 1
+            return True
+        self.__expect(",")
+        return False
+
+    def __decode(self):
+        self.__peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self._buffer, self._pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self._buffer) or self._eof or not self.__fill():
+                    self._pos = end
+                    return obj
+            except JSONDecodeError:
+                if self._eof or not self.__fill():
+                    raise
@@ -37,19 +37,20 @@ class CrossrefValidator(CitationValidator):
         query = []
         with open(input_file, encoding="utf8") as fp:
             json_content = json.load(fp)
+        pairs = []
         for row in tqdm(json_content["items"], disable=disable_tqdm):
             citing = self._doi_manager.normalise(row.get("DOI"))
             if citing is not None and "reference" in row:
                 for ref in row["reference"]:
                     cited = self._doi_manager.normalise(ref.get("DOI"))
                     if cited is not None:
-                        oci = self._oci_manager.get_oci(
-                            citing, cited, prefix=self._prefix
-                        ).replace("oci:", "")
-                        # Add oci only if has not been processed in the past
-                        # in the case this is a duplicate.
-                        if oci not in result_map:
-                            query.append(oci)
+                        pairs.append((citing, cited))
+        for oci in self._oci_manager.get_ocis(pairs, self._prefix):
+            oci = oci.replace("oci:", "")
+            # Add oci only if has not been processed in the past
+            # in the case this is a duplicate.
+            if oci not in result_map:
+                query.append(oci)
         return query
 
     def validate_citations(self, input_files, result_map, output_directory):
@@ -0,0 +1,194 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import unittest
+from multiprocessing import Process, Queue
+from os import listdir, makedirs
+from os.path import exists, join
+from shutil import rmtree
+
+from oc.index.glob.binary import BinaryDataSource
+
+
+def lookup(path, ids, queue):
+    queue.put(BinaryDataSource(path).mget(ids))
+
+
+def store(path, idx, n):
+    ds = BinaryDataSource(path)
+    for batch in range(n):
+        # Each batch is far bigger than the buffer of a file
+        ds.mset(
+            {
+                "doi:10.%d/%d.%d"
+                % (idx, batch, entry): {
+                    "valid": True,
+                    "orcid": ["0000-0000-0000-%04d" % orcid for orcid in range(50)],
+                }
+                for entry in range(20)
+            }
+        )
+
+
+class BinaryDataSourceTest(unittest.TestCase):
+    """This class aim at testing the class BinaryDataSource."""
+
+    def setUp(self):
+        self.tmp_dir = join("tmp", "binary")
+        if exists(self.tmp_dir):
+            rmtree(self.tmp_dir)
+        makedirs(self.tmp_dir)
+        self.path = join(self.tmp_dir, "datasource.bin")
+        self.csv = {}
+        for name, rows in (
+            ("valid", [("doi:10.1/a", "v"), ("10.1/b", "i"), ("doi:10.1/c", "v")]),
+            ("date", [("doi:10.1/a", "2019-05-27"), ("doi:10.1/c", "2020")]),
+            ("issn", [("doi:10.1/a", "1588-2861"), ("doi:10.1/a", "0138-9130")]),
+            ("orcid", [("doi:10.1/c", "0000-0003-0530-4305")] * 2),
+        ):
+            self.csv[name] = join(self.tmp_dir, name + ".csv")
+            with open(self.csv[name], "w", encoding="utf-8") as f:
+                f.write('"id","value"\n')
+                for row in rows:
+                    f.write('"%s","%s"\n' % row)
+        self.expected = {
+            "doi:10.1/a": {
+                "date": "2019-05-27",
+                "valid": True,
+                "issn": ["1588-2861", "0138-9130"],
+                "orcid": [],
+            },
+            "doi:10.1/b": {"date": None, "valid": False, "issn": [], "orcid": []},
+            "doi:10.1/c": {
+                "date": "2020",
+                "valid": True,
+                "issn": [],
+                "orcid": ["0000-0003-0530-4305"],
+            },
+            "doi:10.1/d": None,
+            "doi:10.0/a": None,
+        }
+
+    def __build(self, path=None, run_size=1000000):
+        return BinaryDataSource.build(
+            self.path if path is None else path,
+            self.csv["valid"],
+            self.csv["date"],
+            self.csv["issn"],
+            self.csv["orcid"],
+            "doi",
+            run_size,
+        )
+
+    def test_build(self):
+        self.assertEqual(3, self.__build())
+        ds = BinaryDataSource(self.path)
+        self.assertEqual(3, len(ds))
+        self.assertEqual(self.expected, ds.mget(list(self.expected.keys())))
+        self.assertEqual(self.expected["doi:10.1/a"], ds.get("doi:10.1/a"))
+        ds.close()
+
+        BinaryDataSource.build(self.path)
+        ds = BinaryDataSource(self.path)
+        self.assertEqual(0, len(ds))
+        self.assertIsNone(ds.get("doi:10.1/a"))
+
+    def test_build_runs(self):
+        # Runs of two rows are sorted separately and merged
+        self.__build()
+        self.__build(self.path + "_runs", 2)
+        with open(self.path, "rb") as f, open(self.path + "_runs", "rb") as f_runs:
+            self.assertEqual(f.read(), f_runs.read())
+        ds = BinaryDataSource(self.path + "_runs")
+        self.assertEqual(self.expected, ds.mget(list(self.expected.keys())))
+        ds.close()
+        # No temporary file is left
+        self.assertEqual(
+            {"datasource.bin", "datasource.bin_runs"},
+            {name for name in listdir(self.tmp_dir) if not name.endswith(".csv")},
+        )
+
+    def test_set(self):
+        self.__build()
+        ds = BinaryDataSource(self.path)
+        row = ds.new()
+        row["valid"] = True
+        row["issn"] = {"2532-8816"}
+        ds.set("doi:10.1/d", row)
+        ds.mset({"doi:10.1/a": ds.new()})
+        self.expected["doi:10.1/d"] = {
+            "date": None,
+            "valid": True,
+            "issn": ["2532-8816"],
+            "orcid": [],
+        }
+        self.expected["doi:10.1/a"] = ds.new()
+        self.assertEqual(self.expected, ds.mget(list(self.expected.keys())))
+
+        # The new entries are read by the other instances and merged by build
+        ds = BinaryDataSource(self.path)
+        self.assertEqual(self.expected, ds.mget(list(self.expected.keys())))
+        self.assertEqual(4, self.__build())
+        self.assertFalse(exists(self.path + ".log"))
+        ds = BinaryDataSource(self.path)
+        self.assertEqual(self.expected, ds.mget(list(self.expected.keys())))
+
+    def test_set_shared(self):
+        self.__build()
+        first = BinaryDataSource(self.path)
+        second = BinaryDataSource(self.path)
+        first.set("doi:10.1/d", first.new())
+        second.set("doi:10.1/e", second.new())
+        self.assertEqual(first.new(), second.get("doi:10.1/d"))
+        self.assertEqual(second.new(), first.get("doi:10.1/e"))
+        first.close()
+        second.close()
+
+        processes = [
+            Process(target=store, args=(self.path, idx, 10)) for idx in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        ds = BinaryDataSource(self.path)
+        for idx in range(4):
+            for batch in range(10):
+                for entry in range(20):
+                    value = ds.get("doi:10.%d/%d.%d" % (idx, batch, entry))
+                    self.assertEqual(50, len(value["orcid"]))
+        self.assertEqual(3 + 2 + 4 * 10 * 20, self.__build())
+
+    def test_processes(self):
+        self.__build()
+        queue = Queue()
+        process = Process(
+            target=lookup, args=(self.path, list(self.expected.keys()), queue)
+        )
+        process.start()
+        self.assertEqual(self.expected, queue.get(timeout=60))
+        process.join()
+
+    def test_lookup(self):
+        with open(self.csv["valid"], "w", encoding="utf-8") as f:
+            f.write('"id","value"\n')
+            for idx in range(10000):
+                f.write('"doi:10.%d/x","%s"\n' % (idx, "v" if idx % 3 else "i"))
+        self.__build()
+        ds = BinaryDataSource(self.path)
+        for idx in range(10000):
+            self.assertEqual(idx % 3 != 0, ds.get("doi:10.%d/x" % idx)["valid"])
+        self.assertIsNone(ds.get("doi:10.10000/x"))
+        self.assertIsNone(ds.get(""))
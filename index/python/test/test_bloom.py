@@ -0,0 +1,82 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import unittest
+from os import makedirs
+from os.path import exists, join
+
+from oc.index.utils.bloom import BloomFilter
+
+
+class BloomFilterTest(unittest.TestCase):
+    """This class aim at testing the class BloomFilter."""
+
+    def setUp(self):
+        if not exists("tmp"):
+            makedirs("tmp")
+        self.added = ["020%d-020%d" % (n, n * 31) for n in range(20000)]
+        self.missing = ["020%d-020%d" % (n, n * 37) for n in range(1, 20001)]
+
+    def test_error_rate(self):
+        bloom_filter = BloomFilter(len(self.added), 0.01)
+        bloom_filter.update(self.added)
+
+        # No false negatives, and false positives close to the expected rate
+        self.assertTrue(all(key in bloom_filter for key in self.added))
+        false_positives = sum(key in bloom_filter for key in self.missing)
+        self.assertLess(false_positives / len(self.missing), 0.02)
+        self.assertAlmostEqual(0.01, bloom_filter.error_rate, 2)
+        self.assertEqual(len(self.added), bloom_filter.count)
+
+    def test_max_size(self):
+        bloom_filter = BloomFilter(len(self.added), 0.001, 4096)
+        bloom_filter.update(self.added)
+
+        self.assertEqual(4096, bloom_filter.size)
+        self.assertTrue(all(key in bloom_filter for key in self.added))
+        self.assertGreater(bloom_filter.error_rate, 0.001)
+        self.assertGreater(BloomFilter(len(self.added), 0.001).size, 4096)
+
+    def test_save_load(self):
+        path = join("tmp", "bloom_filter.bin")
+        bloom_filter = BloomFilter(len(self.added), 0.01)
+        bloom_filter.update(self.added)
+        bloom_filter.tag = b"archives"
+        bloom_filter.save(path)
+
+        loaded = BloomFilter.load(path)
+        self.assertEqual(b"archives", loaded.tag)
+        self.assertEqual(bloom_filter.size, loaded.size)
+        self.assertEqual(bloom_filter.error_rate, loaded.error_rate)
+        for key in self.added + self.missing:
+            self.assertEqual(key in bloom_filter, key in loaded)
+
+        with open(path, "wb") as f:
+            f.write(b"0" * 100)
+        with self.assertRaises(ValueError):
+            BloomFilter.load(path)
+
+    def test_tag(self):
+        path = join("tmp", "bloom_filter_tag.bin")
+        bloom_filter = BloomFilter(len(self.added), 0.01)
+        # Digests can end with zero bytes, which are part of the tag
+        for tag in (b"", b"\0", b"archives\0", b"\1" * 31 + b"\0", b"\0" * 32):
+            bloom_filter.tag = tag
+            bloom_filter.save(path)
+            self.assertEqual(tag, BloomFilter.load(path).tag)
+
+        bloom_filter.tag = b"\0" * 33
+        with self.assertRaises(ValueError):
+            bloom_filter.save(path)
@@ -0,0 +1,176 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import unittest
+from json import dumps, loads
+from os import makedirs
+from os.path import exists, join
+from shutil import rmtree
+from time import sleep
+
+import oc.index.utils.cache as cache_utils
+from oc.index.finder.crossref import CrossrefResourceFinder
+from oc.index.utils.cache import ResponseCache
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.encoding = None
+
+    def json(self):
+        return loads(self.text)
+
+
+class FakeSession(object):
+    """It answers to the requests without using the network, counting them."""
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(url)
+        if "doi.org/api" in url:
+            return FakeResponse(200, dumps({"responseCode": 1}))
+        if "error" in url:
+            return FakeResponse(500, "")
+        if "missing" in url:
+            return FakeResponse(404, "")
+        return FakeResponse(
+            200,
+            dumps(
+                {
+                    "message": {
+                        "type": "journal-article",
+                        "issued": {"date-parts": [[2019, 5, 3]]},
+                        "ISSN": ["1588-2861"],
+                        "author": [{"ORCID": "0000-0003-0530-4305"}],
+                    }
+                }
+            ),
+        )
+
+
+class ResponseCacheTest(unittest.TestCase):
+    """This class aim at testing the class ResponseCache."""
+
+    def setUp(self):
+        self.tmp_dir = join("tmp", "cache")
+        if exists(self.tmp_dir):
+            rmtree(self.tmp_dir)
+        makedirs(self.tmp_dir)
+        self.path = join(self.tmp_dir, "cache.db")
+
+    def tearDown(self):
+        cache_utils._shared_cache = None
+
+    def test_get(self):
+        session = FakeSession()
+        cache = ResponseCache(self.path, session=session)
+        for _ in range(3):
+            response = cache.get("https://api/works/10.1/a")
+            self.assertEqual(200, response.status_code)
+            self.assertEqual("journal-article", response.json()["message"]["type"])
+        self.assertEqual(404, cache.get("https://api/missing").status_code)
+        self.assertEqual(404, cache.get("https://api/missing").status_code)
+        self.assertEqual(500, cache.get("https://api/error").status_code)
+        self.assertEqual(500, cache.get("https://api/error").status_code)
+        self.assertEqual(
+            [
+                "https://api/works/10.1/a",
+                "https://api/missing",
+                "https://api/error",
+                "https://api/error",
+            ],
+            session.requests,
+        )
+        self.assertEqual({"hits": 3, "misses": 4, "ratio": 3 / 7}, cache.stats())
+        cache.close()
+
+        # Another process, or a later run, finds the responses on disk
+        session = FakeSession()
+        cache = ResponseCache(self.path, session=session)
+        self.assertEqual(
+            cache.get("https://api/works/10.1/a").text,
+            ResponseCache(self.path).lookup("https://api/works/10.1/a").text,
+        )
+        self.assertEqual(b"", cache.get("https://api/missing").content)
+        self.assertEqual([], session.requests)
+        self.assertEqual(2, cache.hits)
+
+        cache.clear()
+        self.assertIsNone(cache.lookup("https://api/missing"))
+
+    def test_ttl(self):
+        cache = ResponseCache(self.path, ttl=1)
+        cache.store("https://api/1", 200, "one")
+        self.assertEqual("one", cache.lookup("https://api/1").text)
+        sleep(1.1)
+        self.assertIsNone(cache.lookup("https://api/1"))
+        self.assertIsNone(ResponseCache(self.path, ttl=1).lookup("https://api/1"))
+        self.assertEqual(
+            "one", ResponseCache(self.path, ttl=0).lookup("https://api/1").text
+        )
+
+    def test_not_found_ttl(self):
+        cache = ResponseCache(self.path, not_found_ttl=1)
+        cache.store("https://api/1", 200, "one")
+        cache.store("https://api/missing", 404, "")
+        sleep(1.1)
+        self.assertEqual("one", cache.lookup("https://api/1").text)
+        self.assertIsNone(cache.lookup("https://api/missing"))
+        self.assertIsNone(
+            ResponseCache(self.path, not_found_ttl=1).lookup("https://api/missing")
+        )
+
+        session = FakeSession()
+        cache = ResponseCache(None, not_found_ttl=0, session=session)
+        self.assertEqual(404, cache.get("https://api/missing").status_code)
+        self.assertEqual(404, cache.get("https://api/missing").status_code)
+        self.assertEqual(2, len(session.requests))
+
+    def test_eviction(self):
+        cache = ResponseCache(None, memory_size=10)
+        for idx in range(20):
+            cache.store("https://api/%d" % idx, 200, str(idx))
+        cache.lookup("https://api/10")
+        cache.store("https://api/20", 200, "20")
+        self.assertEqual(10, len(cache._memory))
+        self.assertIsNone(cache.lookup("https://api/11"))
+        self.assertEqual("10", cache.lookup("https://api/10").text)
+
+        cache = ResponseCache(self.path, memory_size=10, disk_size=500)
+        for idx in range(1000):
+            cache.store("https://api/%d" % idx, 200, str(idx))
+        cache = ResponseCache(self.path)
+        self.assertIsNone(cache.lookup("https://api/0"))
+        self.assertEqual("999", cache.lookup("https://api/999").text)
+
+    def test_resource_finder(self):
+        session = FakeSession()
+        cache_utils._shared_cache = ResponseCache(self.path, session=session)
+        finder = CrossrefResourceFinder({})
+        self.assertEqual(
+            "2019-05-03", finder.get_pub_date("10.1007/s11192-019-03217-6")
+        )
+        self.assertEqual(
+            {"1588-2861"}, finder.get_container_issn("10.1007/s11192-019-03217-6")
+        )
+        self.assertEqual(
+            {"0000-0003-0530-4305"}, finder.get_orcid("10.1007/s11192-019-03217-6")
+        )
+        # One request to check the DOI and one to retrieve its metadata
+        self.assertEqual(2, len(session.requests))
@@ -0,0 +1,204 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import unittest
+from configparser import ConfigParser
+from glob import glob
+from os import environ, makedirs, sep
+from os.path import exists, join
+from shutil import copyfile, rmtree
+from timeit import default_timer as timer
+from unittest.mock import patch
+
+from oc.index.oci.storer import CitationStorer
+from oc.index.parsing.base import CitationParser
+from oc.index.scripts import cnc
+from oc.index.scripts.cnc import collect_citation_data
+
+# The benchmarks only report their measurements, and they are run on demand
+BENCHMARK = environ.get("OC_INDEX_BENCHMARK")
+
+
+class ListParser(object):
+    """A minimal parser returning the citation data of a list, with many references
+    for each item as the Crossref parser does."""
+
+    def __init__(self, items, references, id_class=str):
+        self.items = items
+        self.current_item = 0
+        self.__references = references
+        self.__id_class = id_class
+
+    def get_next_citation_data(self):
+        if self.current_item >= self.items:
+            return None
+        self.current_item += 1
+        citing = self.__id_class("10.%d/citing" % self.current_item)
+        return [
+            (citing, self.__id_class("10.%d/cited" % idx), None, None, None, None)
+            for idx in range(self.__references)
+        ]
+
+
+class CountingId(str):
+    """A string counting the hash and equality operations made on it, and on the
+    strings obtained by adding a prefix to it."""
+
+    operations = 0
+
+    def __radd__(self, other):
+        return CountingId(other + str(self))
+
+    def __hash__(self):
+        CountingId.operations += 1
+        return str.__hash__(self)
+
+    def __eq__(self, other):
+        CountingId.operations += 1
+        return str.__eq__(self, other)
+
+
+class DictDataSource(object):
+    """A minimal data source keeping the support information in a dictionary."""
+
+    def __init__(self):
+        self.data = {}
+
+    def new(self):
+        return {"date": None, "valid": None, "issn": [], "orcid": []}
+
+    def mget(self, resources_id):
+        return {id_string: self.data.get(id_string) for id_string in resources_id}
+
+    def set(self, resource_id, value):
+        self.data[resource_id] = value
+
+
+class CNCTest(unittest.TestCase):
+    """This class aim at testing the functions of the cnc script."""
+
+    def test_collect_citation_data(self):
+        parser = ListParser(20, 10)
+        citation_data_list, ids = collect_citation_data(parser, "doi")
+        self.assertEqual(200, len(citation_data_list))
+        self.assertEqual(("10.1/citing", "10.0/cited"), citation_data_list[0][:2])
+        self.assertEqual(("10.20/citing", "10.9/cited"), citation_data_list[-1][:2])
+        self.assertEqual(30, len(ids))
+        self.assertIn("doi:10.20/citing", ids)
+        self.assertIn("doi:10.9/cited", ids)
+
+    def test_collect_citation_data_large(self):
+        parser = ListParser(16000, 10)
+        citation_data_list, ids = collect_citation_data(parser, "doi")
+        self.assertEqual(160000, len(citation_data_list))
+        self.assertEqual(16010, len(ids))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(16000, parser.current_item)
+
+    def test_collect_citation_data_linear(self):
+        # Each citation costs the same number of operations on the ids, whatever
+        # the number of the ids already collected
+        operations = []
+        for items in (1000, 2000, 3000):
+            CountingId.operations = 0
+            collect_citation_data(ListParser(items, 10, CountingId), "doi")
+            operations.append(CountingId.operations)
+        self.assertEqual(operations[1] - operations[0], operations[2] - operations[1])
+        self.assertLessEqual(operations[0], 1000 * 10 * 4)
+
+    @unittest.skipUnless(BENCHMARK, "set OC_INDEX_BENCHMARK to run the benchmarks")
+    def test_collect_citation_data_benchmark(self):
+        # It reports the time per citation at two sizes, which is about the same
+        # when the collection is linear, without any assertion on time
+        for items in (10000, 40000):
+            start = timer()
+            collect_citation_data(ListParser(items, 10), "doi")
+            duration = timer() - start
+            print(
+                "collect_citation_data, %d citations: %.2f us/citation"
+                % (items * 10, duration / (items * 10) * 10**6)
+            )
+
+    def test_prefetch_resources(self):
+        class PrefetchHandler(object):
+            def prefetch(self, ids, workers, host_workers, rate):
+                return {
+                    id_string: {
+                        "valid": "invalid" not in id_string,
+                        "date": None,
+                        "issn": [],
+                        "orcid": [],
+                    }
+                    for id_string in ids
+                }
+
+        config = ConfigParser()
+        config.read_dict(cnc._config)
+        config.set("cnc", "use_api", "true")
+        ds = DictDataSource()
+        resources = {"10.1/a": None, "10.1/invalid": None, "10.1/known": {}}
+        with patch.object(cnc, "_config", config):
+            cnc.prefetch_resources(PrefetchHandler(), resources, resources, ds)
+        # Invalid ids are not stored, since their check may have failed
+        self.assertEqual(["10.1/a"], list(ds.data))
+
+    def __run_cnc(self, config, pipeline):
+        tmp_path = join("tmp", "cnc_%s" % ("pipeline" if pipeline else "sequential"))
+        if exists(tmp_path):
+            rmtree(tmp_path)
+        makedirs(tmp_path)
+        lookup = join(tmp_path, "lookup.csv")
+        copyfile(join("index", "python", "test", "data", "lookup_full.csv"), lookup)
+        config.set("cnc", "lookup", lookup)
+
+        dump = join("index", "python", "test", "data", "crossref_dump.json")
+        parser = CitationParser.get_parser("COCI")
+        ds = DictDataSource()
+        storer = CitationStorer(
+            join(tmp_path, "output"), "https://w3id.org/oc/index/coci/", suffix="0"
+        )
+        with patch.object(cnc, "_config", config):
+            if pipeline:
+                cnc.cnc_pipeline("COCI", dump, parser, ds, storer, True)
+            else:
+                citations = cnc.cnc("COCI", dump, parser, ds, True)
+                storer.store_citations(citations)
+
+        result = {}
+        for ext in ("csv", "rdf"):
+            lines = []
+            for file in glob(
+                join(tmp_path, "output", "data", ext, "**", "*.*"), recursive=True
+            ):
+                with open(file, encoding="utf8") as f:
+                    if ext == "csv":
+                        next(f)  # header
+                    lines.extend(line for line in f if line.strip())
+            result[ext] = sorted(lines)
+        return result, ds.data
+
+    def test_cnc_pipeline(self):
+        config = ConfigParser()
+        config.read_dict(cnc._config)
+        config.set("cnc", "use_api", "false")
+        # Many small chunks, so that the stages of the pipeline overlap
+        config.set("redis", "batch_size", "3")
+
+        sequential, sequential_ds = self.__run_cnc(config, False)
+        pipeline, pipeline_ds = self.__run_cnc(config, True)
+        self.assertEqual(40, len(sequential["csv"]))
+        self.assertNotEqual([], sequential["rdf"])
+        self.assertEqual(sequential, pipeline)
+        self.assertEqual(sequential_ds, pipeline_ds)
@@ -13,11 +13,14 @@
 # ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
 # SOFTWARE.
 
+import gzip
+import json
 import unittest
 from os import makedirs
 from os.path import join, exists
 from csv import DictReader
 from oc.index.parsing.crossref import CrossrefParser
+from oc.index.utils.stream import JSONArrayReader
 
 
 class COCITest(unittest.TestCase):
@@ -52,3 +55,59 @@ class COCITest(unittest.TestCase):
             old = list(DictReader(f))
 
         self.assertCountEqual(new, old)
+
+    @staticmethod
+    def get_all_citation_data(parser, filename):
+        parser.parse(filename)
+        result = []
+        cit = parser.get_next_citation_data()
+        while cit is not None:
+            result.extend(cit)
+            cit = parser.get_next_citation_data()
+        return result
+
+    def test_citation_source_streaming(self):
+        expected = COCITest.get_all_citation_data(
+            CrossrefParser(streaming=False), self.input
+        )
+
+        gz_input = join("tmp", "crossref_dump.json.gz")
+        with open(self.input, "rb") as f_in, gzip.open(gz_input, "wb") as f_out:
+            f_out.write(f_in.read())
+
+        for filename in (self.input, gz_input):
+            parser = CrossrefParser()
+            self.assertTrue(parser.is_valid(filename))
+            self.assertCountEqual(
+                COCITest.get_all_citation_data(parser, filename), expected
+            )
+            self.assertEqual(parser.current_item, parser.items)
+
+    def test_citation_source_no_references(self):
+        # A long sequence of items without references must not exhaust the stack
+        items = [{"DOI": "10.1234/%s" % i} for i in range(5000)]
+        items.append({"DOI": "10.1234/a", "reference": [{"DOI": "10.1234/b"}]})
+        no_ref_input = join("tmp", "crossref_no_references.json")
+        with open(no_ref_input, "w", encoding="utf8") as f:
+            json.dump({"items": items}, f)
+
+        for streaming in (True, False):
+            self.assertEqual(
+                COCITest.get_all_citation_data(
+                    CrossrefParser(streaming=streaming), no_ref_input
+                ),
+                [("10.1234/a", "10.1234/b", None, None, None, None)],
+            )
+
+    def test_json_array_reader(self):
+        with open(self.input, encoding="utf8") as f:
+            expected = json.load(f)["items"]
+
+        with JSONArrayReader(self.input, "items", chunk_size=7) as reader:
+            self.assertEqual(list(reader), expected)
+
+        numbers_input = join("tmp", "numbers.json")
+        with open(numbers_input, "w", encoding="utf8") as f:
+            f.write('{"total": 123456, "items": [ 123456789 , -1.5e10, "x", [] ,{}]}')
+        with JSONArrayReader(numbers_input, "items", chunk_size=3) as reader:
+            self.assertEqual(list(reader), [123456789, -1.5e10, "x", [], {}])
@@ -15,7 +15,7 @@
 
 import unittest
 from os import remove, makedirs
-from os.path import exists, join
+from os.path import exists, getsize, join
 from oc.index.legacy.csv import CSVManager
 
 
@@ -81,3 +81,51 @@ class CSVManagerTest(unittest.TestCase):
                 "020010103003602000105370205010358000059-02001010304362801000208030304330009000400020107",
             },
         )
+
+    def test_add_value_buffered(self):
+        if exists(self.addition_path):
+            remove(self.addition_path)
+
+        with CSVManager(self.addition_path, buffer_size=2) as csv_m:
+            csv_m.add_value("doi:10.1108/jd-12-2013-0166", "orcid:0000-0003-0530-4305")
+            self.assertDictEqual(CSVManager(self.addition_path).data, {})
+            csv_m.add_value("doi:10.7717/peerj.4375", 'orcid:"0000-0003-1613-5981"')
+            self.assertEqual(len(CSVManager(self.addition_path).data), 2)
+            csv_m.add_value("doi:10.1108/jd-12-2013-0166", "orcid:0000-0001-5506-523X")
+            csv_m.flush()
+            self.assertDictEqual(CSVManager(self.addition_path).data, csv_m.data)
+            csv_m.add_value("doi:10.7717/peerj.4376", "orcid:0000-0003-1613-5981")
+
+        self.assertDictEqual(
+            CSVManager(self.addition_path).data,
+            {
+                "doi:10.1108/jd-12-2013-0166": {
+                    "orcid:0000-0003-0530-4305",
+                    "orcid:0000-0001-5506-523X",
+                },
+                "doi:10.7717/peerj.4375": {'orcid:"0000-0003-1613-5981"'},
+                "doi:10.7717/peerj.4376": {"orcid:0000-0003-1613-5981"},
+            },
+        )
+
+    def test_load_csv_column_as_set_parallel(self):
+        csv_dir = join("tmp", "csv_column")
+        if not exists(csv_dir):
+            makedirs(csv_dir)
+        with open(self.citation_path, encoding="utf8") as f:
+            header, *rows = f.readlines()
+        for idx in range(3):
+            with open(join(csv_dir, "%s.csv" % idx), "w", encoding="utf8") as f:
+                f.writelines([header] + rows[idx::3])
+
+        expected = CSVManager.load_csv_column_as_set(self.citation_path, "oci")
+        self.assertSetEqual(
+            expected, CSVManager.load_csv_column_as_set(csv_dir, "oci", workers=2)
+        )
+        self.assertSetEqual(expected, CSVManager.load_csv_column_as_set(csv_dir, "oci"))
+
+    def test_load_stats(self):
+        csv_m = CSVManager(self.initial_path)
+        self.assertEqual(2, csv_m.loaded_rows)
+        self.assertEqual(getsize(self.initial_path), csv_m.loaded_bytes)
+        self.assertGreater(csv_m.load_throughput, 0)
@@ -19,6 +19,7 @@ from os.path import join, exists
 from oc.index.preprocessing.datacite_pp import DatacitePreProcessing
 import shutil
 import json
+import gzip
 
 
 class DOCIPPTest(unittest.TestCase):
@@ -60,7 +61,7 @@ class DOCIPPTest(unittest.TestCase):
         self.assertTrue(for_parser_only)
         self.assertTrue(for_glob_only)
 
-    def test_counter_check(self):
+    def test_dump_filter_and_split_size(self):
         self.DatacitePP.dump_filter_and_split(self.input_dir, self.output_dir, self.num)
         # check that all the output files contain the number of entities specified in input, except for the last one
         all_files = self.DatacitePP.get_all_files(self.output_dir)
@@ -73,3 +74,28 @@ class DOCIPPTest(unittest.TestCase):
                 with open(file, "r", encoding="utf-8") as f:
                     dict_from_json = json.load(f)
                     self.assertLessEqual(len(dict_from_json["data"]), self.num)
+
+    def test_dump_filter_and_split_gzip(self):
+        self.DatacitePP.dump_filter_and_split(self.input_dir, self.output_dir, self.num)
+        gzip_input_dir = join("tmp", "doci_pp_gzip_input")
+        gzip_output_dir = join("tmp", "doci_pp_gzip_output")
+        for directory in (gzip_input_dir, gzip_output_dir):
+            if exists(directory):
+                shutil.rmtree(directory)
+            makedirs(directory)
+        with open(join(self.input_dir, "doci_pp_dump.json"), "rb") as f:
+            with gzip.open(join(gzip_input_dir, "doci_pp_dump.json.gz"), "wb") as gz:
+                gz.write(f.read())
+
+        self.DatacitePP.dump_filter_and_split(
+            gzip_input_dir, gzip_output_dir, self.num, workers=2, batch_size=10
+        )
+        expected = sorted(self.DatacitePP.get_all_files(self.output_dir))
+        result = sorted(self.DatacitePP.get_all_files(gzip_output_dir))
+        self.assertEqual(len(expected), len(result))
+        for expected_file, result_file in zip(expected, result):
+            with open(expected_file, encoding="utf-8") as f:
+                expected_data = json.load(f)
+            with open(result_file, encoding="utf-8") as f:
+                self.assertEqual(expected_data, json.load(f))
+        self.assertFalse(exists(join(gzip_output_dir, "jSonFile_part.tmp")))
@@ -18,6 +18,7 @@ import json
 
 from os import makedirs
 from os.path import join, exists
+from threading import Barrier, Lock
 
 from oc.index.finder.crossref import CrossrefResourceFinder
 from oc.index.finder.datacite import DataCiteResourceFinder
@@ -26,6 +27,37 @@ from oc.index.finder.orcid import ORCIDResourceFinder
 from oc.index.finder.base import ResourceFinderHandler
 
 
+class OfflineCrossrefResourceFinder(CrossrefResourceFinder):
+    """A Crossref resource finder answering without using the network, which
+    records the maximum number of concurrent calls to the api. If a barrier is
+    specified, each call waits for the other calls sharing it."""
+
+    def __init__(self, data, barrier=None):
+        super().__init__(data)
+        self._dm.is_valid = lambda id_string: "invalid" not in id_string
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.__lock = Lock()
+        self.__barrier = barrier
+
+    def _call_api(self, doi_full):
+        with self.__lock:
+            self.calls.append(doi_full)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        if self.__barrier is not None:
+            self.__barrier.wait(timeout=30)
+        with self.__lock:
+            self.running -= 1
+        return {
+            "type": "journal-article",
+            "issued": {"date-parts": [[2019, 5, 27]]},
+            "ISSN": ["1588-2861"],
+            "author": [{"ORCID": "0000-0003-0530-4305"}],
+        }
+
+
 class ResourceFinderTest(unittest.TestCase):
     """This class aim at testing resource finders."""
 
@@ -56,6 +88,54 @@ class ResourceFinderTest(unittest.TestCase):
         )
         self.assertFalse(share_issn)
 
+    def test_handler_prefetch(self):
+        data = {"10.1/known": {"valid": True, "date": "2000", "issn": [], "orcid": []}}
+        # The calls are made two at a time, since each one waits for another one
+        finder = OfflineCrossrefResourceFinder(data, Barrier(2))
+        handler = ResourceFinderHandler([finder])
+        ids = ["10.1/%d" % idx for idx in range(10)] + ["10.1/known", "10.1/invalid"]
+        result = handler.prefetch(ids, workers=8, host_workers=2)
+        self.assertEqual(11, len(result))
+        self.assertLessEqual(finder.max_running, 2)
+        self.assertEqual(10, len(finder.calls))
+        self.assertFalse(data["10.1/invalid"]["valid"])
+        self.assertEqual(
+            {
+                "valid": True,
+                "date": "2019-05-27",
+                "issn": ["1588-2861"],
+                "orcid": ["0000-0003-0530-4305"],
+            },
+            data["10.1/0"],
+        )
+
+        # The support information is now read from the data
+        self.assertEqual("2019-05-27", handler.get_date("10.1/3"))
+        self.assertEqual("2000", handler.get_date("10.1/known"))
+        self.assertTrue(handler.share_issn("10.1/1", "10.1/2")[0])
+        self.assertTrue(handler.share_orcid("10.1/1", "10.1/2")[0])
+        self.assertEqual({}, handler.prefetch(ids))
+        self.assertEqual(10, len(finder.calls))
+
+    def test_handler_prefetch_validation(self):
+        validated = []
+        finders = [OfflineCrossrefResourceFinder({}) for _ in range(3)]
+        for finder in finders:
+            finder._dm.is_valid = lambda id_string: validated.append(id_string) or (
+                "invalid" not in id_string
+            )
+        handler = ResourceFinderHandler(finders)
+        ids = ["10.1/%d" % idx for idx in range(20)] + ["10.1/invalid"]
+        result = handler.prefetch(ids, workers=4, host_workers=4)
+
+        # Each id is validated once, and only the valid ones are retrieved
+        self.assertEqual(sorted(ids), sorted(validated))
+        for finder in finders:
+            self.assertEqual(20, len(finder.calls))
+            self.assertLessEqual(finder.max_running, 4)
+        self.assertFalse(result["10.1/invalid"]["valid"])
+        self.assertEqual("2019-05-27", result["10.1/19"]["date"])
+
     def test_handler_share_orcid(self):
         handler = ResourceFinderHandler(
             [CrossrefResourceFinder(), DataCiteResourceFinder(), ORCIDResourceFinder()]
@@ -1,17 +1,21 @@
 import unittest
-from os import sep, remove, makedirs
+from os import sep, remove, makedirs, environ
 import os
 from os.path import exists, join
 import shutil
 from shutil import rmtree
 import pandas as pd
 import json
+from timeit import default_timer as timer
+from unittest.mock import patch
 
 from oc.index.legacy.csv import CSVManager
 from oc.index.identifier.issn import ISSNManager
 from oc.index.identifier.orcid import ORCIDManager
 from oc.index.identifier.doi import DOIManager
 from oc.index.identifier.pmid import PMIDManager
+from oc.index.finder.crossref import CrossrefResourceFinder
+from oc.index.finder.orcid import ORCIDResourceFinder
 from oc.index.scripts.glob_doci import (
     issn_data_recover_doci,
     issn_data_to_cache_doci,
@@ -34,6 +38,9 @@ from oc.index.scripts.glob_crossref import (
     process_coci,
 )
 
+# The benchmarks only report their measurements, and they are run on demand
+BENCHMARK = environ.get("OC_INDEX_BENCHMARK")
+
 
 class GlobTest(unittest.TestCase):
     def setUp(self):
@@ -147,6 +154,26 @@ class GlobTest(unittest.TestCase):
         self.assertEqual(self.id_date_coci.get_value(citing_doi), {"2018-02-13"})
         self.assertEqual(self.id_issn_coci.get_value(citing_doi), {"2167-8359"})
 
+    def test_process_coci_offline(self):
+        # The DOIs ending with 5 are the invalid ones, without querying the API
+        expected_dir = join(self.test_dir, "crossref_glob_dump_expected")
+        with patch.object(
+            DOIManager, "is_valid", lambda self, doi: not doi.endswith("5")
+        ):
+            for workers in (1, 2):
+                out_dir = join("tmp", "crossref_glob_offline_%d" % workers)
+                if exists(out_dir):
+                    rmtree(out_dir)
+                process_coci(self.inp_coci, out_dir, workers)
+
+                # Cited DOIs get the most common date of their references, or an
+                # empty one, and the rows are sorted
+                for name in sorted(os.listdir(expected_dir)):
+                    with open(join(expected_dir, name), encoding="utf8") as f:
+                        expected = f.read()
+                    with open(join(out_dir, name), encoding="utf8") as f:
+                        self.assertEqual(expected, f.read(), name)
+
     # TEST DOCI GLOB
     def test_issn_data_recover_doci(self):
         self.assertTrue(True)
@@ -221,6 +248,88 @@ class GlobTest(unittest.TestCase):
         self.assertEqual(self.id_date_doci.get_value(citing_doi), {"2018-11-25"})
         self.assertEqual(self.id_issn_doci.get_value(citing_doi), {"1434-193X"})
 
+    def __scale_doci(self, inp_doci, n_files):
+        # The fixtures are copied in several files with distinct DOIs
+        if exists(inp_doci):
+            rmtree(inp_doci)
+        makedirs(inp_doci)
+        with open(self.load_json_d_inp, encoding="utf8") as f:
+            dump = f.read()
+        for idx in range(n_files):
+            with open(join(inp_doci, "%s.json" % idx), "w", encoding="utf8") as f:
+                f.write(dump.replace('"10.', '"10.%s' % idx))
+        return dump
+
+    def test_process_doci_scaled(self):
+        # The validity of the related DOIs is decided offline
+        inp_doci = join("tmp", "doci_glob_scaled_input")
+        n_files = 10
+        dump = self.__scale_doci(inp_doci, n_files)
+
+        results = []
+        with patch.object(
+            DOIManager, "is_valid", lambda self, doi: not doi.endswith("0")
+        ):
+            for workers in (1, 2):
+                out_doci = join("tmp", "doci_glob_scaled_output_%s" % workers)
+                if exists(out_doci):
+                    rmtree(out_doci)
+                process_doci(inp_doci, out_doci, self.n_doci, workers=workers)
+
+                valid_doi = CSVManager(join(out_doci, "valid_doi.csv"))
+                id_date = CSVManager(join(out_doci, "id_date.csv"))
+                id_issn = CSVManager(join(out_doci, "id_issn.csv"))
+                id_orcid = CSVManager(join(out_doci, "id_orcid.csv"))
+                for idx in range(n_files):
+                    citing_doi = "doi:10.%s1002/ejoc.201800947" % idx
+                    self.assertEqual(valid_doi.get_value(citing_doi), {"v"})
+                    self.assertEqual(
+                        valid_doi.get_value("doi:10.%s1002/anie.200504236" % idx),
+                        {"v"},
+                    )
+                    self.assertEqual(
+                        valid_doi.get_value("doi:10.%s1038/sdata.2016.60" % idx),
+                        {"i"},
+                    )
+                    self.assertEqual(id_date.get_value(citing_doi), {"2018-11-25"})
+                    self.assertEqual(id_issn.get_value(citing_doi), {"1434-193X"})
+                    self.assertEqual(
+                        id_orcid.get_value(citing_doi), {"0000-0002-2397-9093"}
+                    )
+
+                result = {}
+                for name in os.listdir(out_doci):
+                    with open(join(out_doci, name), encoding="utf8") as f:
+                        result[name] = sorted(f.readlines())
+                results.append(result)
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(
+            len(json.loads(dump)["data"]) * n_files,
+            len(results[0]["id_date.csv"]) - 1,
+        )
+
+    @unittest.skipUnless(BENCHMARK, "set OC_INDEX_BENCHMARK to run the benchmarks")
+    def test_process_doci_benchmark(self):
+        # It reports the files processed per second, without any assertion on time
+        inp_doci = join("tmp", "doci_glob_benchmark_input")
+        n_files = 100
+        self.__scale_doci(inp_doci, n_files)
+        with patch.object(
+            DOIManager, "is_valid", lambda self, doi: not doi.endswith("0")
+        ):
+            for workers in (1, 4):
+                out_doci = join("tmp", "doci_glob_benchmark_output_%s" % workers)
+                if exists(out_doci):
+                    rmtree(out_doci)
+                start = timer()
+                process_doci(inp_doci, out_doci, self.n_doci, workers=workers)
+                duration = timer() - start
+                print(
+                    "process_doci, %d workers: %.1f files/s"
+                    % (workers, n_files / duration)
+                )
+
     # TEST NOCI GLOB
     def test_issn_data_recover_noci(self):
         if exists(self.dir_no_issn_map_noci):
@@ -315,6 +424,96 @@ class GlobTest(unittest.TestCase):
         #         if citing_pmid == "pmid:2":
         #             self.assertEqual(self.id_orcid.get_value(citing_pmid), {'0000-0003-0014-4963'})
 
+    def __process_noci_offline(self, out_dir, workers=1, id_orcid_dir=None):
+        # The ISSNs are taken from the DOIs, e.g. 10.1016/0006-2944(75)90147-7, and
+        # the ORCID API knows only the author of pmid:1
+        orcid_calls = []
+
+        def call_crossref(finder, doi):
+            return {"type": "journal-article", "ISSN": [doi[8:17]]}
+
+        def call_orcid(finder, doi):
+            orcid_calls.append(doi)
+            if doi == "10.1016/0006-2944(75)90147-7":
+                return [{"orcid-identifier": {"path": "0000-0001-5506-523X"}}]
+
+        if exists(out_dir):
+            rmtree(out_dir)
+        with patch.object(
+            CrossrefResourceFinder, "_call_api", call_crossref
+        ), patch.object(ORCIDResourceFinder, "_call_api", call_orcid), patch.object(
+            PMIDManager, "is_valid", lambda self, pmid: not pmid.endswith("0")
+        ):
+            process_noci(
+                self.inp_noci,
+                out_dir,
+                self.n_noci,
+                id_orcid_dir,
+                workers=workers,
+                chunk_size=3,
+            )
+        return orcid_calls
+
+    def test_process_noci_workers(self):
+        results = []
+        for workers in (1, 2):
+            out_dir = join("tmp", "noci_glob_workers_%d" % workers)
+            self.__process_noci_offline(out_dir, workers)
+            result = {}
+            for name in (
+                "valid_pmid.csv",
+                "id_date.csv",
+                "id_issn.csv",
+                "id_orcid.csv",
+            ):
+                with open(join(out_dir, name), encoding="utf8") as f:
+                    result[name] = f.read()
+            results.append(result)
+
+            valid_pmid = CSVManager(join(out_dir, "valid_pmid.csv"))
+            self.assertEqual(valid_pmid.get_value("pmid:2"), {"v"})
+            self.assertEqual(valid_pmid.get_value("pmid:4150960"), {"i"})
+            self.assertEqual(valid_pmid.get_value("pmid:4356257"), {"v"})
+            id_date = CSVManager(join(out_dir, "id_date.csv"))
+            self.assertEqual(id_date.get_value("pmid:2"), {"1975"})
+            id_issn = CSVManager(join(out_dir, "id_issn.csv"))
+            self.assertEqual(id_issn.get_value("pmid:2"), {"0006-291X"})
+            id_orcid = CSVManager(join(out_dir, "id_orcid.csv"))
+            self.assertEqual(id_orcid.get_value("pmid:1"), {"0000-0001-5506-523X"})
+            self.assertIsNone(id_orcid.get_value("pmid:2"))
+
+        # The chunks are normalised in parallel and merged in the same order
+        self.assertEqual(results[0], results[1])
+
+    def test_process_noci_orcid_map(self):
+        out_dir = join("tmp", "noci_glob_orcid_map")
+        orcid_calls = self.__process_noci_offline(
+            out_dir, id_orcid_dir=self.id_orcid_map
+        )
+
+        id_orcid = CSVManager(join(out_dir, "id_orcid.csv"))
+        self.assertEqual(id_orcid.get_value("pmid:2"), {"0000-0003-0014-4963"})
+        self.assertEqual(id_orcid.get_value("pmid:3"), {"0000-0002-0524-4077"})
+        self.assertEqual(
+            id_orcid.get_value("pmid:4"), {"0000-0002-4865-1115", "0000-0002-7445-7279"}
+        )
+        self.assertEqual(id_orcid.get_value("pmid:1"), {"0000-0001-5506-523X"})
+        self.assertIsNone(id_orcid.get_value("pmid:5"))
+
+        # Only the pmids with a DOI and without ORCIDs in the mapping are searched
+        # through the ORCID API, pmid:10 has no DOI
+        self.assertEqual(
+            [
+                "10.1016/0006-2944(75)90147-7",
+                "10.1016/0006-291x(75)90508-2",
+                "10.1016/0006-291x(75)90518-5",
+                "10.1016/0006-2952(75)90020-9",
+                "10.1016/0006-2952(75)90029-5",
+                "10.1016/0006-2952(75)90080-5",
+            ],
+            orcid_calls,
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
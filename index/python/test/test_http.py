@@ -0,0 +1,143 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import socket
+import unittest
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from threading import Thread
+from timeit import default_timer as timer
+from urllib3.util.retry import RequestHistory
+
+import oc.index.utils.cache as cache_utils
+from oc.index.finder.crossref import CrossrefResourceFinder
+from oc.index.utils.cache import ResponseCache
+from oc.index.utils.http import create_session
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """It answers as the Crossref and doi.org APIs, failing the first requests
+    to the paths containing 'fail' or 'busy'."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        failures = self.server.requests.count(self.path) - 1
+        if "busy" in self.path and failures < 1:
+            self.__send(429, "", {"Retry-After": "1"})
+        elif "fail" in self.path and failures < 2:
+            self.__send(503, "")
+        elif self.path.startswith("/handles/"):
+            self.__send(200, dumps({"responseCode": 1}))
+        else:
+            self.__send(
+                200,
+                dumps({"message": {"issued": {"date-parts": [[2019, 5, 27]]}}}),
+            )
+
+    def __send(self, status, body, headers={}):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HTTPSessionTest(unittest.TestCase):
+    """This class aim at testing the session created by create_session against
+    a local mock server."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+        self.server.daemon_threads = True
+        self.server.connections = 0
+        self.server.requests = []
+        self.url = "http://127.0.0.1:%d/" % self.server.server_address[1]
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        cache_utils._shared_cache = None
+
+    def test_keep_alive(self):
+        for idx in range(100):
+            self.assertEqual(200, requests.get(self.url + str(idx)).status_code)
+        self.assertEqual(100, self.server.connections)
+
+        self.server.connections = 0
+        session = create_session()
+        for idx in range(100):
+            self.assertEqual(200, session.get(self.url + str(idx)).status_code)
+        self.assertEqual(1, self.server.connections)
+
+    def test_retry(self):
+        session = create_session(backoff=0.1, jitter=0.1)
+        self.assertEqual(200, session.get(self.url + "fail").status_code)
+        self.assertEqual(3, self.server.requests.count("/fail"))
+
+        start = timer()
+        self.assertEqual(200, session.get(self.url + "busy").status_code)
+        self.assertGreaterEqual(timer() - start, 1)
+        self.assertEqual(2, self.server.requests.count("/busy"))
+
+        session = create_session(retries=1, backoff=0.1)
+        self.assertEqual(503, session.get(self.url + "fail/again").status_code)
+
+    def test_backoff_max(self):
+        retry = (
+            create_session(backoff=0.5, backoff_max=2, jitter=0.5)
+            .get_adapter(self.url)
+            .max_retries
+        )
+        retry = retry.new(
+            history=tuple(
+                RequestHistory("GET", self.url, None, 503, None) for _ in range(8)
+            )
+        )
+        self.assertLessEqual(retry.get_backoff_time(), 2.5)
+        self.assertGreaterEqual(retry.get_backoff_time(), 2)
+
+    def test_injection(self):
+        cache_utils._shared_cache = ResponseCache()
+        session = create_session()
+        finder = CrossrefResourceFinder(session=session)
+        finder._api = self.url + "works/"
+        finder._dm._api = self.url + "handles/"
+        self.assertEqual("2019-05-27", finder.get_pub_date("10.1234/abc"))
+        self.assertEqual("2019-05-27", finder.get_pub_date("10.1234/def"))
+        self.assertEqual(
+            [
+                "/handles/10.1234/abc",
+                "/works/10.1234/abc",
+                "/handles/10.1234/def",
+                "/works/10.1234/def",
+            ],
+            self.server.requests,
+        )
+        self.assertEqual(1, self.server.connections)
@@ -15,6 +15,7 @@
 
 import unittest
 import json
+import pandas as pd
 
 from os import makedirs
 from os.path import join, exists
@@ -76,6 +77,18 @@ class IdentifierManagerTest(unittest.TestCase):
             ),
         )
 
+    def test_doi_normalise_series(self):
+        dm = DOIManager()
+        dois = [
+            self.valid_doi_1.upper().replace("10.", "doi: 10. "),
+            "https://doi.org/" + self.valid_doi_2,
+            "10.1000/A%20B",
+            "no doi",
+        ]
+        series = pd.Series(dois + [None, float("nan")])
+        expected = [dm.normalise(doi, True) for doi in dois] + [None, None]
+        self.assertEqual(expected, dm.normalise_series(series, True).tolist())
+
     def test_doi_is_valid(self):
         dm_nofile = DOIManager()
         self.assertTrue(dm_nofile.is_valid(self.valid_doi_1))
@@ -105,6 +118,15 @@ class IdentifierManagerTest(unittest.TestCase):
         )
         self.assertEqual(self.valid_pmid_2, pm.normalise("000" + self.valid_pmid_2))
 
+    def test_pmid_normalise_series(self):
+        pm = PMIDManager()
+        pmids = ["pmid:" + self.valid_pmid_1, "000" + self.valid_pmid_2, "nan"]
+        series = pd.Series(pmids + [None, float("nan")])
+        self.assertEqual(
+            [self.valid_pmid_1, self.valid_pmid_2, "", "", ""],
+            pm.normalise_series(series).tolist(),
+        )
+
     def test_pmid_is_valid(self):
         pm_nofile = PMIDManager()
         self.assertTrue(pm_nofile.is_valid(self.valid_pmid_1))
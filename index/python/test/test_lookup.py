@@ -0,0 +1,119 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import unittest
+from os import makedirs, remove
+from os.path import exists, join
+from random import Random
+from shutil import copytree, rmtree
+from zipfile import ZipFile
+from unittest.mock import patch
+
+from oc.index.oci.lookup import OCILookup, std_hash
+
+
+class OCILookupTest(unittest.TestCase):
+    """This class aim at testing the class OCILookup."""
+
+    def setUp(self):
+        # The minimal perfect hash functions have been built by oc.index.build
+        test_dir = join("index", "python", "test", "data", "oci_lookup")
+        self.oci_dir = join(test_dir, "oci")
+        self.moph_dir = join(test_dir, "moph")
+        if not exists("tmp"):
+            makedirs("tmp")
+        self.ocis = []
+        with ZipFile(join(self.oci_dir, "2022-01-01.zip")) as archive:
+            for name in archive.namelist():
+                for line in archive.read(name).decode("utf8").splitlines()[1:]:
+                    self.ocis.append(line.split(",")[0])
+
+    def test_std_hash(self):
+        # Values returned by std::hash<std::string> in libstdc++
+        self.assertEqual(6142509188972423790, std_hash(b""))
+        self.assertEqual(4993892634952068459, std_hash(b"a"))
+        self.assertEqual(13071974230008662992, std_hash(b"oci"))
+        self.assertEqual(10613591747391057286, std_hash(b"0123456789abcdef"))
+        self.assertEqual(
+            12964473360100471146,
+            std_hash(
+                b"02001000308362819371213133704040001020809-"
+                b"020010009063615193700006300030306151914"
+            ),
+        )
+
+    def get_query(self):
+        random = Random(0)
+        new_ocis = [
+            "020%d-020%d" % (random.randint(0, 10**30), random.randint(0, 10**30))
+            for _ in range(200)
+        ]
+        # Similar to existing ones
+        new_ocis += [oci[:-1] for oci in self.ocis[:50]]
+        new_ocis += [oci + "0" for oci in self.ocis[50:100]]
+        query = self.ocis[::2] + new_ocis
+        random.shuffle(query)
+        return query, new_ocis
+
+    def test_exists(self):
+        query, new_ocis = self.get_query()
+        lookup = OCILookup(self.oci_dir, self.moph_dir)
+        stored = set(self.ocis)
+        self.assertEqual([oci in stored for oci in query], lookup.exists(query))
+        self.assertIn(self.ocis[-1], lookup)
+        self.assertNotIn(new_ocis[0], lookup)
+        self.assertEqual([], lookup.exists([]))
+
+    def test_filter(self):
+        filter_path = join("tmp", "oci_filter.bin")
+        bloom_filter = OCILookup.build_filter(self.oci_dir, filter_path, 0.01)
+        self.assertEqual(len(self.ocis), bloom_filter.count)
+        self.assertTrue(all(oci in bloom_filter for oci in self.ocis))
+
+        query, _ = self.get_query()
+        self.assertEqual(
+            OCILookup(self.oci_dir, self.moph_dir).exists(query),
+            OCILookup(self.oci_dir, self.moph_dir, filter_path).exists(query),
+        )
+
+    def test_filter_fingerprint(self):
+        oci_dir = join("tmp", "oci_lookup_fingerprint")
+        if exists(oci_dir):
+            rmtree(oci_dir)
+        copytree(self.oci_dir, oci_dir)
+        filter_path = join("tmp", "oci_filter_fingerprint.bin")
+        self.assertFalse(OCILookup.is_filter_current(oci_dir, filter_path))
+        OCILookup.build_filter(oci_dir, filter_path, 0.01)
+        self.assertTrue(OCILookup.is_filter_current(oci_dir, filter_path))
+        self.assertFalse(exists(filter_path + ".tmp"))
+
+        # A new archive makes the filter stale, since it lacks the new OCIs
+        with ZipFile(join(oci_dir, "2022-02-01.zip"), "w") as archive:
+            archive.writestr("new.csv", "oci,citing,cited\n0201-0202,a,b\n")
+        self.assertFalse(OCILookup.is_filter_current(oci_dir, filter_path))
+        with self.assertRaises(ValueError):
+            OCILookup(oci_dir, self.moph_dir, filter_path)
+
+        bloom_filter = OCILookup.build_filter(oci_dir, filter_path, 0.01)
+        self.assertTrue(OCILookup.is_filter_current(oci_dir, filter_path))
+        self.assertIn("0201-0202", bloom_filter)
+
+        # A fingerprint ending with a zero byte is kept as it is
+        remove(join(oci_dir, "2022-02-01.zip"))
+        fingerprint = OCILookup.fingerprint(oci_dir)[:31] + b"\0"
+        with patch.object(OCILookup, "fingerprint", return_value=fingerprint):
+            OCILookup.build_filter(oci_dir, filter_path, 0.01)
+            self.assertTrue(OCILookup.is_filter_current(oci_dir, filter_path))
+            OCILookup(oci_dir, self.moph_dir, filter_path)
@@ -14,12 +14,18 @@
 # SOFTWARE.
 
 import unittest
-from os import makedirs
+from os import environ, makedirs
 from os.path import join, exists
 from os.path import join
 from csv import DictReader
+from random import Random
+from timeit import default_timer as timer
+from oc.index.identifier.pmid import PMIDManager
 from oc.index.parsing.nih import NIHParser
 
+# The benchmarks only report their measurements, and they are run on demand
+BENCHMARK = environ.get("OC_INDEX_BENCHMARK")
+
 
 class NOCITest(unittest.TestCase):
     """This class aims at testing the methods of the class NIHParser."""
@@ -57,3 +63,57 @@ class NOCITest(unittest.TestCase):
             old = list(DictReader(f))
 
         self.assertEqual(new, old)
+
+    def __write_icite(self, path, rows):
+        # Synthetic file shaped as the iCite open citation collection
+        random = Random(0)
+        with open(path, "w", encoding="utf8") as f:
+            f.write("citing,referenced\n")
+            for _ in range(rows):
+                f.write(
+                    "%s,%s\n"
+                    % (
+                        random.choice(["", "0", ""])
+                        + str(random.randint(1, 4 * 10**7)),
+                        random.choice([str(random.randint(1, 4 * 10**7)), "", "x"]),
+                    )
+                )
+
+    def test_parse_large(self):
+        benchmark = join("tmp", "noci_benchmark.csv")
+        self.__write_icite(benchmark, 30000)
+
+        pmid_manager = PMIDManager()
+        expected = []
+        with open(benchmark, encoding="utf8") as f:
+            for row in DictReader(f):
+                citing = pmid_manager.normalise(row["citing"])
+                cited = pmid_manager.normalise(row["referenced"])
+                if citing and cited:
+                    expected.append((citing, cited, None, None, None, None))
+
+        parser = NIHParser()
+        parser.parse(benchmark)
+        result = []
+        cit = parser.get_next_citation_data()
+        while cit is not None:
+            result.append(cit)
+            cit = parser.get_next_citation_data()
+
+        self.assertEqual(expected, result)
+        self.assertEqual(len(expected), parser.items)
+
+    @unittest.skipUnless(BENCHMARK, "set OC_INDEX_BENCHMARK to run the benchmarks")
+    def test_parse_benchmark(self):
+        # It reports the rows parsed per second, without any assertion on time
+        rows = 1000000
+        benchmark = join("tmp", "noci_benchmark_large.csv")
+        self.__write_icite(benchmark, rows)
+
+        start = timer()
+        parser = NIHParser()
+        parser.parse(benchmark)
+        while parser.get_next_citation_data() is not None:
+            pass
+        duration = timer() - start
+        print("NIHParser: %.0f rows/s" % (rows / duration))
@@ -14,6 +14,7 @@
 # SOFTWARE.
 
 import unittest
+from os import makedirs
 from os.path import join, exists
 from oc.index.preprocessing.nih_pp import NIHPreProcessing
 import shutil
@@ -232,3 +233,33 @@ class NOCIPPTest(unittest.TestCase):
 
         # CSVFile_Rem.csv : target number (num_4) is 4 and current number (num_1) is 8 --> 8%4 == 0,  8//4  == 2
         self.assertTrue(exists(join(self.output_md_dir, "CSVFile_Rem.csv")))
+
+    def test_dump_split_parallel(self):
+        input_dir = join("tmp", "noci_pp_parallel_input")
+        output_dir = join("tmp", "noci_pp_parallel_output")
+        for directory in (input_dir, output_dir):
+            if exists(directory):
+                shutil.rmtree(directory)
+        makedirs(input_dir)
+        for idx in range(3):
+            shutil.copy(
+                join(self.input_md_dir, "CSVFile_1_iCiteMD.csv"),
+                join(input_dir, "iCiteMD_%d.csv" % idx),
+            )
+
+        self.NIHPP.dump_split(
+            input_dir, output_dir, self.num_3, filter_col=["doi", "pmid"], workers=2
+        )
+
+        # each input file is split independently in a file containing 300 items and
+        # in another one containing the remaining 56
+        files = sorted(self.NIHPP.get_all_files(output_dir))
+        self.assertEqual(len(files), 6)
+        for idx, file in enumerate(files):
+            with open(file, "r") as op_file:
+                reader = csv.reader(op_file, delimiter=",")
+                self.assertEqual(["doi", "pmid"], next(reader))
+                rows = list(reader)
+                self.assertEqual(len(rows), 56 if file.endswith("Rem.csv") else 300)
+                if idx % 2 == 0:
+                    self.assertEqual(["10.1016/0006-2944(75)90147-7", "1"], rows[0])
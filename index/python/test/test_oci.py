@@ -14,7 +14,7 @@
 # SOFTWARE.
 
 import unittest
-from os import remove, makedirs
+from os import environ, remove, makedirs
 from os.path import exists, join
 from csv import DictReader
 from json import load, loads
@@ -23,9 +23,109 @@ from io import StringIO
 from rdflib.compare import isomorphic
 from rdflib.term import _toPythonMapping
 from rdflib import XSD
-from re import findall
-
-from oc.index.oci.citation import Citation, OCIManager
+from re import findall, match, sub
+from shutil import copy
+from random import Random
+from tracemalloc import get_traced_memory, start, stop
+from multiprocessing import Process, Queue
+from datetime import datetime
+from timeit import default_timer as timer
+from dateutil.parser import parse
+from dateutil.relativedelta import relativedelta
+
+from oc.index.oci.citation import Citation, CitationBatch, OCIManager
+
+# The benchmarks only report their measurements, and they are run on demand
+BENCHMARK = environ.get("OC_INDEX_BENCHMARK")
+
+
+def encode_characters(lookup_file, characters, queue):
+    oci_man = OCIManager(lookup_file=lookup_file)
+    for c in characters:
+        oci_man.get_oci("10.%s" % c, "10.%s" % c, "")
+    queue.put({c: oci_man.inverse_lookup[c] for c in characters})
+
+
+def reference_dates(citing_pub_date, cited_pub_date):
+    # The previous implementation, based on dateutil only
+    def check_date(s):
+        date = sub("\\s+", "", s)[:10] if s is not None else ""
+        if not match("^[0-9]{4}(-[0-9]{2}(-[0-9]{2})?)?$", date):
+            return None
+        try:
+            parse(date, default=datetime(1970, 1, 1, 0, 0))
+        except ValueError:
+            return None
+        return date
+
+    def parse_date(date):
+        try:
+            return parse(date, default=datetime(1970, 1, 1, 0, 0))
+        except ValueError:  # It is not a leap year
+            return parse(date[:7] + "-28", default=datetime(1970, 1, 1, 0, 0))
+
+    citing_pub_date = check_date(citing_pub_date)
+    cited_pub_date = check_date(cited_pub_date)
+    duration = None
+    if citing_pub_date is not None and cited_pub_date is not None:
+        months = len(citing_pub_date) >= 7 and len(cited_pub_date) >= 7
+        days = len(citing_pub_date) >= 10 and len(cited_pub_date) >= 10
+        citing_complete_pub_date = citing_pub_date
+        cited_complete_pub_date = cited_pub_date
+        if len(citing_pub_date) >= 7 and len(cited_pub_date) < 7:
+            cited_complete_pub_date += citing_pub_date[4:7]
+        elif len(citing_pub_date) < 7 and len(cited_pub_date) >= 7:
+            citing_complete_pub_date += cited_pub_date[4:7]
+        if len(citing_pub_date) >= 10 and len(cited_pub_date) < 10:
+            cited_complete_pub_date += citing_pub_date[7:]
+        elif len(citing_pub_date) < 10 and len(cited_pub_date) >= 10:
+            citing_complete_pub_date += cited_pub_date[7:]
+        duration = Citation.get_duration(
+            relativedelta(
+                parse_date(citing_complete_pub_date),
+                parse_date(cited_complete_pub_date),
+            ),
+            months,
+            days,
+        )
+    return citing_pub_date, cited_pub_date, duration
+
+
+def reference_oci(oci_man, doi_1, doi_2, prefix):
+    # The previous implementation, one character at a time
+    def encode(s):
+        ci_str = []
+        for c in s:
+            ci_str.append(str(oci_man.inverse_lookup[c]))
+        return "".join(ci_str)
+
+    return "oci:%s%s-%s%s" % (
+        prefix,
+        encode(doi_1.replace("10.", "")),
+        prefix,
+        encode(doi_2.replace("10.", "")),
+    )
+
+
+def citation_dates(citing_pub_date, cited_pub_date):
+    cit = Citation(
+        None,
+        "http://dx.doi.org/10.1000/citing",
+        citing_pub_date,
+        "http://dx.doi.org/10.1000/cited",
+        cited_pub_date,
+        None,
+        None,
+        1,
+        "https://w3id.org/oc/index/prov/ra/1",
+        "https://api.crossref.org/works/[[citing]]",
+        "2018-10-31T16:17:07",
+        "OpenCitations Index: COCI",
+        "doi",
+        "http://dx.doi.org/([[XXX__decode]])",
+        None,
+    )
+    return cit.citing_pub_date, cit.cited_pub_date, cit.duration
 
 
 class CitationTest(unittest.TestCase):
@@ -199,6 +299,143 @@ class CitationTest(unittest.TestCase):
         )
         self.assertEqual(cit.duration, "P5Y")
 
+    def test_date_equivalence(self):
+        dates = [None, "", "201", "2019-13", "2019-00-10", "2019-12-00", " 2019 - 02"]
+        dates += ["0000", "0012", "0099-02", "1999-12-31T23:59:59"]
+        for year in ("1900", "1996", "2000", "2001", "2020"):
+            dates.append(year)
+            for month in ("01", "02", "04", "12"):
+                dates.append("%s-%s" % (year, month))
+                for day in ("01", "15", "28", "29", "30", "31"):
+                    dates.append("%s-%s-%s" % (year, month, day))
+
+        for citing_pub_date in dates:
+            for cited_pub_date in dates:
+                self.assertEqual(
+                    reference_dates(citing_pub_date, cited_pub_date),
+                    citation_dates(citing_pub_date, cited_pub_date),
+                    (citing_pub_date, cited_pub_date),
+                )
+
+    def __date_pairs(self, n):
+        # Publication dates repeat heavily across the references
+        random = Random(0)
+        dates = [
+            "%d-%02d-%02d" % (random.randint(1950, 2020), random.randint(1, 12), day)
+            for day in range(1, 29)
+        ]
+        dates += [date[:7] for date in dates] + [date[:4] for date in dates]
+        return [(random.choice(dates), random.choice(dates)) for _ in range(n)]
+
+    def test_date_repeated(self):
+        pairs = self.__date_pairs(3000)
+        expected = [reference_dates(citing, cited) for citing, cited in pairs]
+        # The second time the memoized dates are used
+        for _ in range(2):
+            result = [citation_dates(citing, cited) for citing, cited in pairs]
+            self.assertEqual(expected, result)
+
+    @unittest.skipUnless(BENCHMARK, "set OC_INDEX_BENCHMARK to run the benchmarks")
+    def test_date_benchmark(self):
+        # It reports the pairs of dates handled per second by the previous
+        # implementation and by Citation, whose constructor does more than
+        # parsing the dates, without any assertion on time
+        pairs = self.__date_pairs(30000)
+        for name, dates in (
+            ("dateutil", reference_dates),
+            ("Citation", citation_dates),
+        ):
+            start = timer()
+            for citing, cited in pairs:
+                dates(citing, cited)
+            duration = timer() - start
+            print("Citation dates, %s: %.0f pairs/s" % (name, len(pairs) / duration))
+
+    def test_citation_batch(self):
+        random = Random(0)
+        shared = (
+            "https://w3id.org/oc/index/prov/ra/1",
+            "https://api.crossref.org/works/[[citing]]",
+            "OpenCitations Index: COCI",
+            "doi",
+            "http://dx.doi.org/([[XXX__decode]])",
+        )
+        citing = ["10.%d/%d" % (random.randint(1000, 9999), n) for n in range(500)]
+        rows = []
+        for n in range(10000):
+            rows.append(
+                (
+                    "oci:%d-%d" % (n, n * 7),
+                    "http://dx.doi.org/" + random.choice(citing),
+                    random.choice([None, "2019", "2019-12", "2019-12-24"]),
+                    "http://dx.doi.org/10.%d/%d" % (random.randint(1000, 9999), n),
+                    random.choice([None, "1996", "1996-02", "1996-02-29"]),
+                    random.choice([None, "2019-12-24"]),
+                    random.choice([None, "P12Y"]),
+                    "2022-10-18T10:%02d:00" % (n // 1000),
+                    n % 3 == 0,
+                    n % 5 == 0,
+                )
+            )
+
+        def get_citations():
+            return [
+                Citation(
+                    *row[:7],
+                    1,
+                    shared[0],
+                    shared[1],
+                    row[7],
+                    *shared[2:],
+                    "reference",
+                    *row[8:],
+                    None,
+                    "Creation of the citation",
+                )
+                for row in rows
+            ]
+
+        def get_batch():
+            batch = CitationBatch(*shared, "reference", 1, "Creation of the citation")
+            for row in rows:
+                batch.append(*row)
+            return batch
+
+        # The batch returns the same citations
+        citations = get_citations()
+        batch = get_batch()
+        self.assertEqual(len(citations), len(batch))
+        for citation, batch_citation in zip(citations, batch):
+            for method in (
+                "get_citation_csv",
+                "get_citation_prov_csv",
+                "get_citation_scholix",
+            ):
+                self.assertEqual(
+                    getattr(citation, method)(), getattr(batch_citation, method)()
+                )
+            self.assertEqual(
+                citation.get_citation_nt(self.base_url),
+                batch_citation.get_citation_nt(self.base_url),
+            )
+            self.assertEqual(
+                citation.get_citation_prov_nq(self.base_url),
+                batch_citation.get_citation_prov_nq(self.base_url),
+            )
+        del citations, batch
+
+        # ... taking a fraction of the memory
+        start()
+        citations = get_citations()
+        citations_memory = get_traced_memory()[0]
+        stop()
+        del citations
+        start()
+        batch = get_batch()
+        batch_memory = get_traced_memory()[0]
+        stop()
+        self.assertLess(batch_memory * 3, citations_memory)
+
     def test_invalid_date_for_citation(self):
         cit = Citation(
             "020010103003602000105370205010358000059-02001010304362801000208030304330009000400020107",
@@ -427,6 +664,60 @@ class CitationTest(unittest.TestCase):
 
         self.assertTrue(isomorphic(g1, g2))
 
+    def test_citation_nt_nq(self):
+        # Citation with an update, whose literals contain characters to escape
+        citation_7 = Citation(
+            "02001000002361927283705040000-02001000002361927283705030002",
+            "http://dx.doi.org/10.1002/jrs.5400",
+            "2018-06",
+            "http://dx.doi.org/10.1002/jrs.5302",
+            "2017-12-05",
+            None,
+            None,
+            2,
+            "https://w3id.org/oc/index/prov/ra/1",
+            "https://api.crossref.org/works/10.1002/jrs.5400",
+            "2018-11-01T14:51:52",
+            "OpenCitations Index: COCI",
+            "doi",
+            "http://dx.doi.org/([[XXX__decode]])",
+            None,
+            journal_sc=True,
+            author_sc=True,
+            prov_inv_date="2019-01-01T10:00:00",
+            prov_description='Update of the "citation"\nwith a \\ and a \r',
+            prov_update='DELETE DATA { GRAPH <x> { <a> <b> "c\\d" } }',
+        )
+
+        for c in [
+            self.citation_1,
+            self.citation_2,
+            self.citation_3,
+            self.citation_4,
+            self.citation_5,
+            self.citation_6,
+            citation_7,
+        ]:
+            g1 = ConjunctiveGraph()
+            for s, p, o in c.get_citation_rdf(self.base_url, False, False, False):
+                g1.add((s, p, o))
+            g2 = ConjunctiveGraph()
+            g2.parse(data=c.get_citation_nt(self.base_url), format="nt11")
+            self.assertTrue(isomorphic(g1, g2))
+
+            g1 = ConjunctiveGraph()
+            for s, p, o, g in c.get_citation_prov_rdf(self.base_url).quads(
+                (None, None, None, None)
+            ):
+                g1.add((s, p, o, g))
+            g2 = ConjunctiveGraph()
+            g2.parse(data=c.get_citation_prov_nq(self.base_url), format="nquads")
+            self.assertTrue(isomorphic(g1, g2))
+            self.assertEqual(
+                set(g.identifier for g in g1.contexts()),
+                set(g.identifier for g in g2.contexts()),
+            )
+
     def test_citation_data_prov_scholix(self):
         citation_data_prov_scholix = None
 
@@ -590,3 +881,112 @@ class CitationTest(unittest.TestCase):
             len(oci_man.lookup.keys()),
             len(set(doi_1 + doi_2 + doi_3 + doi_4 + doi_5 + doi_6)),
         )
+
+    def test_get_ocis(self):
+        dois = [
+            "10.1038/sj.cdd.4401289",
+            "10.1096/fj.00-0336fje",
+            "10.1002/jrs.5400",
+            "10.1234/456789qwertyuiopasdfghjklzxcvbnmè+òàù,.-åß∂ƒ∞∆ªº¬∑≤†©√∫˜≥»”’¢‰",
+        ]
+        pairs = [(doi_1, doi_2) for doi_1 in dois for doi_2 in dois]
+        new_file_path = join("tmp", "lookup_ocis.csv")
+        if exists(new_file_path):
+            remove(new_file_path)
+
+        ocis = OCIManager(lookup_file=new_file_path).get_ocis(pairs, "020")
+        oci_man = OCIManager(lookup_file=new_file_path)
+        self.assertEqual(
+            [oci_man.get_oci(doi_1, doi_2, "020") for doi_1, doi_2 in pairs], ocis
+        )
+        self.assertEqual(
+            len(set("".join(dois).replace("10.", ""))), len(oci_man.lookup)
+        )
+        self.assertEqual([], OCIManager().get_ocis([], "020"))
+
+    def test_oci_round_trip(self):
+        # Any id not containing '10.' is decoded to itself, whatever its characters
+        random = Random(0)
+        alphabet = "abcdefghijklmnopqrstuvwxyz0123456789-._;()/<>:#%&@àèéìòùß∂ƒ∞∆€®™"
+        lookup_path = join("tmp", "lookup_round_trip.csv")
+        copy(join("index", "python", "test", "data", "lookup_full.csv"), lookup_path)
+        oci_man = OCIManager(lookup_file=lookup_path)
+        for _ in range(500):
+            doi = "10." + "".join(
+                random.choice(alphabet) for _ in range(random.randint(1, 40))
+            )
+            if "10." in doi[3:]:
+                continue
+            oci = oci_man.get_oci(doi, doi, "020").replace("oci:020", "")
+            self.assertEqual(doi, oci_man._OCIManager__decode(oci.split("-")[0]))
+
+        # The characters added are stored in the lookup file
+        self.assertEqual(oci_man.lookup, OCIManager(lookup_file=lookup_path).lookup)
+
+    def test_shared_lookup(self):
+        # Several processes add new characters to the same lookup file at once
+        lookup_path = join("tmp", "lookup_shared.csv")
+        if exists(lookup_path):
+            remove(lookup_path)
+        alphabet = "abcdefghijklmnopqrstuvwxyzàèéìòùß∂ƒ∞∆€®™"
+        random = Random(0)
+        queue = Queue()
+        processes = []
+        for _ in range(6):
+            characters = random.sample(alphabet, 20)
+            processes.append(
+                Process(target=encode_characters, args=(lookup_path, characters, queue))
+            )
+        for process in processes:
+            process.start()
+        codes = {}
+        for _ in processes:
+            for c, code in queue.get().items():
+                # Each character has the same code in all the processes
+                self.assertEqual(code, codes.setdefault(c, code))
+        for process in processes:
+            process.join()
+
+        self.assertEqual(len(codes), len(set(codes.values())))
+        self.assertEqual(codes, OCIManager(lookup_file=lookup_path).inverse_lookup)
+
+    def __encoding_pairs(self, n):
+        random = Random(0)
+        alphabet = "abcdefghijklmnopqrstuvwxyz0123456789-._;()/"
+        dois = [
+            "10.%d/" % random.randint(1000, 9999)
+            + "".join(random.choice(alphabet) for _ in range(30))
+            for _ in range(n)
+        ]
+        return list(zip(dois, reversed(dois)))
+
+    def test_oci_encoding_equivalence(self):
+        pairs = self.__encoding_pairs(2000)
+        oci_man = OCIManager(
+            lookup_file=join("index", "python", "test", "data", "lookup_full.csv")
+        )
+        expected = [
+            reference_oci(oci_man, doi_1, doi_2, "020") for doi_1, doi_2 in pairs
+        ]
+        self.assertEqual(expected, oci_man.get_ocis(pairs, "020"))
+
+    @unittest.skipUnless(BENCHMARK, "set OC_INDEX_BENCHMARK to run the benchmarks")
+    def test_oci_encoding_benchmark(self):
+        # It reports the OCIs encoded per second by the previous implementation
+        # and by get_ocis, without any assertion on time
+        pairs = self.__encoding_pairs(100000)
+        oci_man = OCIManager(
+            lookup_file=join("index", "python", "test", "data", "lookup_full.csv")
+        )
+        oci_man.get_ocis(pairs, "020")
+        for name, encode in (
+            (
+                "one character at a time",
+                lambda: [reference_oci(oci_man, *pair, "020") for pair in pairs],
+            ),
+            ("get_ocis", lambda: oci_man.get_ocis(pairs, "020")),
+        ):
+            start = timer()
+            encode()
+            duration = timer() - start
+            print("OCI encoding, %s: %.0f OCIs/s" % (name, len(pairs) / duration))
@@ -0,0 +1,94 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import unittest
+from threading import Lock
+from time import sleep
+
+from oc.index.utils.pipeline import batches, parallel_map, run_pipeline
+
+
+class PipelineTest(unittest.TestCase):
+    """This class aim at testing the function run_pipeline."""
+
+    def test_run_pipeline(self):
+        result = list(
+            run_pipeline(range(100), [lambda x: x * 2, lambda x: x + 1], queue_size=2)
+        )
+        self.assertEqual([x * 2 + 1 for x in range(100)], result)
+        self.assertEqual([], list(run_pipeline([], [lambda x: x])))
+
+    def test_run_pipeline_backpressure(self):
+        lock = Lock()
+        produced = []
+
+        def source():
+            for idx in range(50):
+                with lock:
+                    produced.append(idx)
+                yield idx
+
+        pipeline = run_pipeline(source(), [lambda x: x, lambda x: x], queue_size=2)
+        self.assertEqual(0, next(pipeline))
+        sleep(0.2)
+        # Three bounded queues of two items, one item per thread in progress
+        # and the item already consumed
+        with lock:
+            self.assertLessEqual(len(produced), 3 * 2 + 3 + 1)
+        self.assertEqual(list(range(1, 50)), list(pipeline))
+
+    def test_run_pipeline_error(self):
+        def fail(x):
+            if x == 10:
+                raise ValueError("failure")
+            return x
+
+        result = []
+        with self.assertRaises(ValueError):
+            for item in run_pipeline(range(1000), [fail, lambda x: x], queue_size=1):
+                result.append(item)
+        # Items already processed may be discarded when the pipeline stops
+        self.assertEqual(list(range(len(result))), result)
+        self.assertLessEqual(len(result), 10)
+
+        def source():
+            yield 1
+            raise KeyError("failure")
+
+        with self.assertRaises(KeyError):
+            list(run_pipeline(source(), [lambda x: x]))
+
+    def test_run_pipeline_close(self):
+        pipeline = run_pipeline(range(1000), [lambda x: x], queue_size=1)
+        self.assertEqual([0, 1, 2], [next(pipeline) for _ in range(3)])
+        pipeline.close()
+
+    def test_batches(self):
+        self.assertEqual([[0, 1, 2], [3, 4, 5], [6]], list(batches(range(7), 3)))
+        self.assertEqual([[0, 1]], list(batches([0, 1], 2)))
+        self.assertEqual([], list(batches([], 2)))
+
+    def test_parallel_map(self):
+        items = range(-50, 50)
+        expected = [abs(item) for item in items]
+        self.assertEqual(expected, list(parallel_map(abs, items)))
+        self.assertEqual(expected, list(parallel_map(abs, items, workers=3)))
+        with self.assertRaises(TypeError):
+            list(parallel_map(abs, ["a"], workers=2))
+
+        # Threads accept functions that can not be pickled
+        self.assertEqual(
+            expected, list(parallel_map(lambda x: abs(x), items, 3, threads=True))
+        )
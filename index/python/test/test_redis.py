@@ -0,0 +1,143 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import json
+import unittest
+
+from oc.index.glob.redis import RedisDataSource
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is needed as a local Redis stand-in")
+class RedisDataSourceTest(unittest.TestCase):
+    """This class aim at testing the class RedisDataSource, using fakeredis as a
+    local Redis stand-in."""
+
+    def setUp(self):
+        self.entries = {
+            "doi:10.1/a": {
+                "date": "2019-05-27",
+                "valid": True,
+                "issn": ["1588-2861", "0138-9130"],
+                "orcid": ["0000-0003-0530-4305"],
+            },
+            "doi:10.1/b": {"date": None, "valid": False, "issn": [], "orcid": []},
+            "doi:10.1/c": {"date": "2020", "valid": True, "issn": [], "orcid": []},
+        }
+        # Updates made by the datasource script, as read from the glob files
+        self.updates = [
+            ("orcid", [("doi:10.1/a", "0000-0002-1825-0097")], True),
+            ("orcid", [("doi:10.1/d", "0000-0002-1825-0097")] * 2, True),
+            ("date", [("doi:10.1/b", "2021-01"), ("doi:10.1/d", "1999")], False),
+            ("valid", [("doi:10.1/b", True), ("doi:10.1/e", False)], False),
+            ("issn", [("doi:10.1/a", "1588-2861"), ("doi:10.1/c", "2532-8816")], True),
+        ]
+        self.ids = ["doi:10.1/%s" % c for c in "abcdef"]
+
+    def __datasource(self, encoding, use_lua=True, connection=None):
+        if connection is None:
+            connection = fakeredis.FakeRedis()
+        return RedisDataSource(connection, encoding, use_lua)
+
+    def test_encoding(self):
+        for encoding in RedisDataSource.ENCODINGS:
+            ds = self.__datasource(encoding)
+            ds.mset(self.entries)
+            ds.set("doi:10.1/d", ds.new())
+            expected = dict(self.entries)
+            expected["doi:10.1/d"] = ds.new()
+            expected["doi:10.1/e"] = None
+            expected["doi:10.1/f"] = None
+            self.assertEqual(expected, ds.mget(self.ids))
+            self.assertEqual(self.entries["doi:10.1/a"], ds.get("doi:10.1/a"))
+        with self.assertRaises(ValueError):
+            self.__datasource("msgpack")
+
+    def test_migration(self):
+        connection = fakeredis.FakeRedis()
+        self.__datasource("json", connection=connection).mset(self.entries)
+        ds = self.__datasource("hash", connection=connection)
+        ds.set("doi:10.1/d", ds.new())
+
+        # Entries stored as JSON strings are still readable
+        expected = ds.mget(self.ids)
+        self.assertEqual(self.entries["doi:10.1/a"], expected["doi:10.1/a"])
+        self.assertEqual(3, ds.migrate(batch_size=2))
+        self.assertEqual(b"hash", connection.type("doi:10.1/a"))
+        self.assertEqual(expected, ds.mget(self.ids))
+        self.assertEqual(0, ds.migrate())
+
+    def test_update(self):
+        results = []
+        for encoding, use_lua in (("json", False), ("hash", False), ("hash", True)):
+            connection = fakeredis.FakeRedis()
+            # Part of the entries still stored as JSON strings
+            self.__datasource("json", connection=connection).mset(
+                {"doi:10.1/a": self.entries["doi:10.1/a"]}
+            )
+            ds = self.__datasource(encoding, use_lua, connection)
+            ds.mset({k: v for k, v in self.entries.items() if k != "doi:10.1/a"})
+            for column, values, append in self.updates:
+                ds.update(column, values, append)
+            results.append(ds.mget(self.ids))
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], results[2])
+        self.assertEqual(
+            ["0000-0003-0530-4305", "0000-0002-1825-0097"],
+            results[0]["doi:10.1/a"]["orcid"],
+        )
+        self.assertEqual(
+            {
+                "date": "1999",
+                "valid": False,
+                "issn": [],
+                "orcid": ["0000-0002-1825-0097"],
+            },
+            results[0]["doi:10.1/d"],
+        )
+        self.assertTrue(results[0]["doi:10.1/b"]["valid"])
+        self.assertIsNone(results[0]["doi:10.1/f"])
+
+    def test_update_without_reading(self):
+        ds = self.__datasource("hash")
+
+        def mget(resources_id):
+            raise AssertionError("The entries should not be read")
+
+        ds.mget = mget
+        ds.update("issn", [("doi:10.1/a", "1588-2861")], True)
+        ds.update("date", [("doi:10.1/a", "2019")], False)
+        self.assertEqual(
+            {b"v": b"0", b"i": b"1588-2861", b"d": b"2019"},
+            ds._r.hgetall("doi:10.1/a"),
+        )
+
+    def test_memory(self):
+        connection = fakeredis.FakeRedis()
+        json_size = 0
+        for key, value in self.entries.items():
+            json_size += len(json.dumps(value))
+        ds = self.__datasource("hash", connection=connection)
+        ds.mset(self.entries)
+        hash_size = 0
+        for key in self.entries:
+            for field, value in connection.hgetall(key).items():
+                hash_size += len(field) + len(value)
+        self.assertLess(hash_size * 2, json_size)
@@ -18,6 +18,7 @@ from os import sep, makedirs
 from shutil import rmtree
 from os.path import exists, join
 from rdflib import ConjunctiveGraph
+from rdflib.compare import isomorphic
 from rdflib.namespace import XSD
 from rdflib.term import _toPythonMapping
 from glob import glob
@@ -285,6 +286,100 @@ class CitationStorerTest(unittest.TestCase):
             4,
         )
 
+    def test_store_citations_buffered(self):
+        origin_citation_list = list(
+            CitationStorer.load_citations_from_file(
+                self.citation_data_csv_path,
+                self.citation_prov_csv_path,
+                baseurl="http://dx.doi.org/",
+                service_name="OpenCitations Index: COCI",
+                id_type="doi",
+                id_shape="http://dx.doi.org/([[XXX__decode]])",
+                citation_type=None,
+            )
+        )
+
+        stored_files = []
+        for tmp_subpath, buffered in (("_unbuffered", False), ("_buffered", True)):
+            tmp_path = self.tmp_path + tmp_subpath
+            if exists(tmp_path):
+                rmtree(tmp_path)
+
+            cs = CitationStorer(
+                tmp_path,
+                self.baseurl,
+                n_citations_csv_file=4,
+                n_citations_rdf_file=2,
+                n_citations_slx_file=3,
+                buffer_size=2,
+            )
+            # Store the citations twice, so as to reopen and extend existing files
+            for _ in range(2):
+                if buffered:
+                    cs.store_citations(origin_citation_list)
+                else:
+                    for citation in origin_citation_list:
+                        cs.store_citation(citation)
+
+            files = []
+            for ext in ("csv", "ttl", "scholix"):
+                for sub_dir in ("data", "prov"):
+                    for f_path in sorted(
+                        glob(
+                            tmp_path + sep + sub_dir + sep + "**" + sep + "*." + ext,
+                            recursive=True,
+                        )
+                    ):
+                        with open(f_path, "rb") as f:
+                            files.append(f.read())
+            stored_files.append(files)
+
+        self.assertEqual(len(stored_files[0]), 22)
+        self.assertEqual(stored_files[0], stored_files[1])
+
+    def test_store_citation_rdf_engine(self):
+        origin_citation_list = list(
+            CitationStorer.load_citations_from_file(
+                self.citation_data_csv_path,
+                self.citation_prov_csv_path,
+                baseurl="http://dx.doi.org/",
+                service_name="OpenCitations Index: COCI",
+                id_type="doi",
+                id_shape="http://dx.doi.org/([[XXX__decode]])",
+                citation_type=None,
+            )
+        )
+
+        with self.assertRaises(ValueError):
+            CitationStorer(self.tmp_path + "_engine", self.baseurl, rdf_engine="none")
+
+        graphs = []
+        for rdf_engine in CitationStorer.RDF_ENGINES:
+            tmp_path = self.tmp_path + "_engine_" + rdf_engine
+            if exists(tmp_path):
+                rmtree(tmp_path)
+
+            cs = CitationStorer(
+                tmp_path, self.baseurl, n_citations_rdf_file=2, rdf_engine=rdf_engine
+            )
+            cs.store_citations(origin_citation_list)
+
+            data_graph = ConjunctiveGraph()
+            for f in glob(
+                tmp_path + sep + "data" + sep + "**" + sep + "*.ttl", recursive=True
+            ):
+                data_graph.parse(f, format="nt11")
+            prov_graph = ConjunctiveGraph()
+            for f in glob(
+                tmp_path + sep + "prov" + sep + "**" + sep + "*.ttl", recursive=True
+            ):
+                prov_graph.parse(f, format="nquads")
+            graphs.append((data_graph, prov_graph))
+
+        self.assertEqual(len(graphs[0][0]), 31)
+        self.assertTrue(isomorphic(graphs[0][0], graphs[1][0]))
+        self.assertTrue(isomorphic(graphs[0][1], graphs[1][1]))
+
     @staticmethod
     def get_stored_citation_list(data_path, ext):
         stored_citation_list = []
@@ -0,0 +1,154 @@
+#!python
+# Copyright (c) 2022 The OpenCitations Index Authors.
+#
+# Permission to use, copy, modify, and/or distribute this software for any purpose
+# with or without fee is hereby granted, provided that the above copyright notice
+# and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH
+# REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT,
+# OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE,
+# DATA OR PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS
+# ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS
+# SOFTWARE.
+
+import unittest
+from json import dumps, load
+from os import listdir, makedirs
+from os.path import exists, join
+from shutil import copyfile, rmtree
+
+from oc.index.scripts.trim_crossref import (
+    _ItemsWriter,
+    compile_predicate,
+    process,
+)
+
+
+class TrimCrossrefTest(unittest.TestCase):
+    """This class aim at testing the filter of the Crossref dump."""
+
+    def setUp(self):
+        self.input = join("index", "python", "test", "data", "crossref_glob_dump_input")
+        self.tmp_dir = join("tmp", "trim_crossref")
+        if exists(self.tmp_dir):
+            rmtree(self.tmp_dir)
+        makedirs(self.tmp_dir)
+        self.item = {"member": "78", "deposited": {"date-time": "2019-09-26T05:41:04Z"}}
+
+    def __read_output(self, output_dir):
+        result = {}
+        for name in listdir(output_dir):
+            with open(join(output_dir, name), encoding="utf8") as f:
+                result[name] = [item["DOI"] for item in load(f)["items"]]
+        return result
+
+    def test_compile_predicate(self):
+        date = [["deposited", "date-time"]]
+        for op, to_check, expected in (
+            ("==", "2019-09-26T05:41:04Z", True),
+            ("==", "2019-09-27T00:00:00Z", False),
+            ("!=", "2019-09-27T00:00:00Z", True),
+            ("!=", "2019-09-26T05:41:04Z", False),
+            (">=", "2019-09-26T05:41:04Z", True),
+            (">=", "2019-09-27T00:00:00Z", False),
+            ("<=", "2019-09-26T05:41:04Z", True),
+            ("<=", "2019-09-25T00:00:00Z", False),
+            (">", "2019-09-25T00:00:00Z", True),
+            (">", "2019-09-26T05:41:04Z", False),
+            ("<", "2019-09-27T00:00:00Z", True),
+            ("<", "2019-09-26T05:41:04Z", False),
+        ):
+            predicate = compile_predicate(date, [[op, to_check]])
+            self.assertEqual(expected, predicate(self.item), op + to_check)
+
+        # A missing metadata, at any level, satisfies the condition
+        predicate = compile_predicate(date, [["==", "2019-09-27T00:00:00Z"]])
+        self.assertTrue(predicate({"member": "78"}))
+        self.assertTrue(predicate({"deposited": {}}))
+
+        # At least one of the conditions must be satisfied
+        predicate = compile_predicate(
+            date + [["member"]], [[">=", "2020"], ["==", "316"]]
+        )
+        self.assertFalse(predicate(self.item))
+        self.assertTrue(predicate(dict(self.item, member="316")))
+
+    def test_compile_predicate_operator(self):
+        with self.assertRaises(SystemExit):
+            compile_predicate([["member"]], [["=", "78"]])
+
+        # The conditions are checked before reading the dump
+        output_dir = join(self.tmp_dir, "operator")
+        with self.assertRaises(SystemExit):
+            process(
+                join(self.tmp_dir, "missing"), output_dir, [["member"]], [["~", "1"]]
+            )
+        self.assertFalse(exists(output_dir))
+
+    def test_process(self):
+        output_dir = join(self.tmp_dir, "process")
+        process(
+            self.input,
+            output_dir,
+            [["deposited", "date-time"]],
+            [[">=", "2019-01-01T00:00:00Z"]],
+        )
+        # Only the items with references are kept
+        self.assertEqual(
+            {"1.json": ["10.1108/jd-12-2013-0166"]}, self.__read_output(output_dir)
+        )
+
+    def test_process_workers(self):
+        input_dir = join(self.tmp_dir, "input")
+        makedirs(input_dir)
+        for idx in range(5):
+            copyfile(
+                join(self.input, "crossref_dump.json"),
+                join(input_dir, "%d.json" % idx),
+            )
+
+        results = []
+        for workers in (1, 2):
+            output_dir = join(self.tmp_dir, "workers_%d" % workers)
+            process(input_dir, output_dir, [["member"]], [["!=", "78"]], workers)
+            result = {}
+            for name in listdir(output_dir):
+                with open(join(output_dir, name), encoding="utf8") as f:
+                    result[name] = f.read()
+            results.append(result)
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(
+            ["10.7717/peerj.4375", "10.1108/jd-12-2013-0166"] * 5,
+            self.__read_output(join(self.tmp_dir, "workers_1"))["1.json"],
+        )
+
+    def test_items_writer(self):
+        output_dir = join(self.tmp_dir, "writer")
+        makedirs(output_dir)
+        writer = _ItemsWriter(output_dir, max_items=2)
+        for idx in range(5):
+            writer.write(dumps({"DOI": "10.1/%d" % idx}))
+        writer.close()
+        writer.close()
+
+        self.assertEqual(
+            {
+                "1.json": ["10.1/0", "10.1/1"],
+                "2.json": ["10.1/2", "10.1/3"],
+                "3.json": ["10.1/4"],
+            },
+            self.__read_output(output_dir),
+        )
+
+        # No file is created when there are no items
+        output_dir = join(self.tmp_dir, "writer_empty")
+        makedirs(output_dir)
+        _ItemsWriter(output_dir, max_items=2).close()
+        self.assertEqual([], listdir(output_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -30,10 +30,12 @@ from oc.index.finder.base import ResourceFinderHandler
 from oc.index.finder.orcid import ORCIDResourceFinder
 from oc.index.finder.crossref import CrossrefResourceFinder
 from oc.index.finder.datacite import DataCiteResourceFinder
-from oc.index.oci.citation import Citation, OCIManager
+from oc.index.oci.citation import CitationBatch, OCIManager
 from oc.index.oci.storer import CitationStorer
 from oc.index.glob.redis import RedisDataSource
 from oc.index.glob.csv import CSVDataSource
+from oc.index.glob.binary import BinaryDataSource
+from oc.index.utils.pipeline import batches, run_pipeline
 
 _config = get_config()
 
@@ -49,68 +51,137 @@ def cnc(service, file, parser, ds, multiprocess):
     logger.info("Reading citation data from " + file)
     parser.parse(file)
     pbar = tqdm(total=parser.items, disable=multiprocess)
-    citation_data = 1
-    citation_data_list = []
-    ids = []
-
-    citation_data = parser.get_next_citation_data()
     identifier = _config.get(service, "identifier")
-    while citation_data is not None:
-        if isinstance(citation_data, list):
-            citation_data_list = citation_data_list + citation_data
-            for c_citation_data in citation_data:
-                ids = ids + [
-                    identifier + ":" + c_citation_data[0],
-                    identifier + ":" + c_citation_data[1],
-                ]
-        else:
-            citation_data_list.append(citation_data)
-            ids = ids + [
-                identifier + ":" + citation_data[0],
-                identifier + ":" + citation_data[1],
-            ]
-        pbar.update(parser.current_item - pbar.n)
-        citation_data = parser.get_next_citation_data()
+    citation_data_list, ids = collect_citation_data(parser, identifier, pbar)
     pbar.close()
 
-    ids = list(set(ids))
-
     logger.info("Retrieving citation data informations from data source")
     resources = {}
     batch_size = _config.getint("redis", "batch_size")
     pbar = tqdm(total=len(ids), disable=multiprocess)
-    while len(ids) > 0:
-        current_size = min(len(ids), batch_size)
-        batch = ids[:current_size]
+    for batch in batches(ids, batch_size):
         batch_result = ds.mget(batch)
         for key in batch_result.keys():
             resources[key.replace(identifier + ":", "")] = batch_result[key]
-        ids = ids[batch_size:] if batch_size < len(ids) else []
-        pbar.update(current_size)
+        pbar.update(len(batch))
     pbar.close()
     logger.info("Information retrivied")
+    rf_handler = get_resource_finder_handler(resources)
+    logger.info("Retrieving missing information through the APIs")
+    prefetch_resources(rf_handler, resources.keys(), resources, ds)
+
+    logger.info(
+        f"Working on {len(citation_data_list)} citation data with related support information"
+    )
+    citations = create_citations(
+        service,
+        citation_data_list,
+        resources,
+        ds,
+        rf_handler,
+        oci_manager,
+        multiprocess,
+    )
+    logger.info(f"{len(citations)}/{len(citation_data_list)} Citations created")
+    return citations
+
+
+def collect_citation_data(parser, identifier, pbar=None):
+    """It reads all the citation data of the file currently parsed by the parser.
+
+    Args:
+        parser (CitationParser): the parser, after the call to parse
+        identifier (str): the prefix of the ids in the data source, e.g. doi
+        pbar (tqdm, optional): progress bar to update with the items parsed
+
+    Returns:
+        tuple: the list of the citation data and the list of the distinct ids
+        of the citing and cited entities, in the form used by the data source.
+    """
+    citation_data_list = []
+    ids = set()
+
+    citation_data = parser.get_next_citation_data()
+    while citation_data is not None:
+        if isinstance(citation_data, list):
+            citation_data_list.extend(citation_data)
+        else:
+            citation_data = [citation_data]
+            citation_data_list.extend(citation_data)
+        for c_citation_data in citation_data:
+            ids.add(identifier + ":" + c_citation_data[0])
+            ids.add(identifier + ":" + c_citation_data[1])
+        if pbar is not None:
+            pbar.update(parser.current_item - pbar.n)
+        citation_data = parser.get_next_citation_data()
+
+    return citation_data_list, list(ids)
+
+
+def get_resource_finder_handler(resources):
+    global _config
+
     use_api = _config.getboolean("cnc", "use_api")
-    crossref_rc = CrossrefResourceFinder(resources, use_api)
-    rf_handler = ResourceFinderHandler(
+    return ResourceFinderHandler(
         [
-            crossref_rc,
+            CrossrefResourceFinder(resources, use_api),
             ORCIDResourceFinder(resources, use_api, _config.get("cnc", "orcid")),
             DataCiteResourceFinder(resources, use_api),
         ]
     )
 
-    logger.info(
-        f"Working on {len(citation_data_list)} citation data with related support information"
+
+def prefetch_resources(rf_handler, ids, resources, ds):
+    global _config
+
+    if not _config.getboolean("cnc", "use_api"):
+        return
+    missing = [id_string for id_string in ids if resources.get(id_string) is None]
+    rows = rf_handler.prefetch(
+        missing,
+        _config.getint("cnc", "prefetch_workers", fallback=8),
+        _config.getint("cnc", "prefetch_host_workers", fallback=4),
+        _config.getfloat("cnc", "prefetch_rate", fallback=0),
     )
-    
-    citations_created = 0
+    for id_string, row in rows.items():
+        # The validation may have failed because of a temporary error, then only
+        # valid ids are stored, as create_citations does
+        if row["valid"]:
+            ds.set(id_string, row)
+
+
+def create_citations(
+    service,
+    citation_data_list,
+    resources,
+    ds,
+    rf_handler,
+    oci_manager,
+    multiprocess=True,
+):
+    global _config
+
+    identifier = _config.get(service, "identifier")
     idbase_url = _config.get(service, "idbaseurl")
     prefix = _config.get(service, "prefix")
     agent = _config.get(service, "agent")
     source = _config.get(service, "source")
     service_name = _config.get(service, "service")
-    citations = []
-    for citation_data in tqdm(citation_data_list, disable=multiprocess):
+    citations = CitationBatch(
+        agent,
+        source,
+        service_name,
+        identifier,
+        idbase_url + "([[XXX__decode]])",
+        "reference",
+        1,
+        "Creation of the citation",
+    )
+    ocis = oci_manager.get_ocis(
+        [(citation_data[0], citation_data[1]) for citation_data in citation_data_list],
+        prefix,
+    )
+    for idx, citation_data in enumerate(tqdm(citation_data_list, disable=multiprocess)):
         (
             citing,
             cited,
@@ -158,31 +229,18 @@ def cnc(service, file, parser, ds, multiprocess):
                 ds.set(cited, row)
 
             citations.append(
-                Citation(
-                    oci_manager.get_oci(citing, cited, prefix),
-                    idbase_url + quote(citing),
-                    citing_date,
-                    idbase_url + quote(cited),
-                    cited_date,
-                    None,
-                    None,
-                    1,
-                    agent,
-                    source,
-                    datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
-                    service_name,
-                    identifier,
-                    idbase_url + "([[XXX__decode]])",
-                    "reference",
-                    journal_sc,
-                    author_sc,
-                    None,
-                    "Creation of the citation",
-                    None,
-                )
+                ocis[idx],
+                idbase_url + quote(citing),
+                citing_date,
+                idbase_url + quote(cited),
+                cited_date,
+                None,
+                None,
+                datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+                journal_sc,
+                author_sc,
             )
 
-            citations_created += 1
         else:
             if citing is resources:
                 if resources[citing] is None:
@@ -194,11 +252,85 @@ def cnc(service, file, parser, ds, multiprocess):
                     row = ds.new()
                     row["valid"] = False
                     ds.set(cited, row)
-    logger.info(f"{citations_created}/{len(citation_data_list)} Citations created")
     return citations
 
 
-def worker_body(input_files, output, service, tid, multiprocess):
+def read_citation_data(parser, chunk_size, pbar):
+    citation_data_list = []
+    citation_data = parser.get_next_citation_data()
+    while citation_data is not None:
+        if isinstance(citation_data, list):
+            citation_data_list.extend(citation_data)
+        else:
+            citation_data_list.append(citation_data)
+        pbar.update(parser.current_item - pbar.n)
+        if len(citation_data_list) >= chunk_size:
+            yield citation_data_list
+            citation_data_list = []
+        citation_data = parser.get_next_citation_data()
+    pbar.close()
+
+    if citation_data_list:
+        yield citation_data_list
+
+
+def cnc_pipeline(service, file, parser, ds, storer, multiprocess):
+    """It creates and stores the citations of a file as cnc and worker_body do, but
+    working on chunks of citation data: parsing, retrieval of the support information
+    from the data source, creation of the citations and storage run at the same time
+    in distinct threads, connected by bounded queues. Only a few chunks are kept in
+    memory at a time and the citations are stored in the same order of cnc.
+
+    Returns:
+        int: the number of citations stored
+    """
+    global _config
+
+    oci_manager = OCIManager(
+        lookup_file=os.path.expanduser(_config.get("cnc", "lookup"))
+    )
+    logger = get_logger()
+    identifier = _config.get(service, "identifier")
+    batch_size = _config.getint("redis", "batch_size")
+    queue_size = _config.getint("cnc", "queue_size", fallback=4)
+    resources = {}
+    rf_handler = get_resource_finder_handler(resources)
+
+    def lookup(citation_data_list):
+        ids = set()
+        for citation_data in citation_data_list:
+            for id_string in citation_data[:2]:
+                if id_string not in resources:
+                    ids.add(identifier + ":" + id_string)
+        fetched = []
+        for batch in batches(ids, batch_size):
+            batch_result = ds.mget(batch)
+            for key in batch_result.keys():
+                fetched.append(key.replace(identifier + ":", ""))
+                resources[fetched[-1]] = batch_result[key]
+        prefetch_resources(rf_handler, fetched, resources, ds)
+        return citation_data_list
+
+    def enrich(citation_data_list):
+        return create_citations(
+            service, citation_data_list, resources, ds, rf_handler, oci_manager
+        )
+
+    logger.info("Reading citation data from " + file)
+    parser.parse(file)
+    pbar = tqdm(total=parser.items, disable=multiprocess)
+    citations_stored = 0
+    with storer:
+        for citations in run_pipeline(
+            read_citation_data(parser, batch_size, pbar), [lookup, enrich], queue_size
+        ):
+            storer.store_citations(citations)
+            citations_stored += len(citations)
+
+    return citations_stored
+
+
+def worker_body(input_files, output, service, tid, multiprocess, pipeline=False):
     global _config
 
     service_ds = _config.get(service, "datasource")
@@ -207,6 +339,8 @@ def worker_body(input_files, output, service, tid, multiprocess):
         ds = RedisDataSource()
     elif service_ds == "csv":
         ds = CSVDataSource()
+    elif service_ds == "binary":
+        ds = BinaryDataSource()
     else:
         raise Exception(service_ds + " is not a valid data source")
 
@@ -214,17 +348,26 @@ def worker_body(input_files, output, service, tid, multiprocess):
     parser = CitationParser.get_parser(service)
     baseurl = baseurl = _config.get(service, "baseurl")
     storer = CitationStorer(
-        output, baseurl + "/" if not baseurl.endswith("/") else baseurl, suffix=str(tid)
+        output,
+        baseurl + "/" if not baseurl.endswith("/") else baseurl,
+        suffix=str(tid),
+        rdf_engine=_config.get("cnc", "rdf_engine", fallback="rdflib"),
     )
 
     logger.info("Working on " + str(len(input_files)) + " files")
 
     for file in input_files:
+        if pipeline:
+            citations_stored = cnc_pipeline(
+                service, file, parser, ds, storer, multiprocess
+            )
+            logger.info(f"{citations_stored} citations saved")
+            continue
+
         citations = cnc(service, file, parser, ds, multiprocess)
 
         logger.info("Saving citations...")
-        for citation in tqdm(citations, disable=multiprocess):
-            storer.store_citation(citation)
+        storer.store_citations(tqdm(citations, disable=multiprocess))
 
         logger.info(f"{len(citations)} citations saved")
 
@@ -259,6 +402,13 @@ def main():
         default=1,
         help="Number of workers to use, default is 1",
     )
+    arg_parser.add_argument(
+        "-p",
+        "--pipeline",
+        action="store_true",
+        help="Parse, enrich and store the citations of each file concurrently, "
+        "working on chunks of citation data",
+    )
     args = arg_parser.parse_args()
 
     logger = get_logger()
@@ -268,6 +418,7 @@ def main():
     output = args.output
     service = args.service
     workers = args.workers
+    pipeline = args.pipeline
 
     if not os.path.exists(input):
         logger.error(
@@ -304,6 +455,7 @@ def main():
                     service,
                     tid + 1,
                     multiprocess,
+                    pipeline,
                 ),
             )
             last_index += chunk_size
@@ -314,7 +466,12 @@ def main():
 
     # No active wait also the main thread work on processing file
     worker_body(
-        input_files[last_index : len(input_files)], output, service, 0, multiprocess
+        input_files[last_index : len(input_files)],
+        output,
+        service,
+        0,
+        multiprocess,
+        pipeline,
     )
     if multiprocess:
         for worker in workers_list:
@@ -25,6 +25,7 @@ from errno import ENOENT
 from oc.index.utils.logging import get_logger
 from oc.index.utils.config import get_config
 from oc.index.glob.redis import RedisDataSource
+from oc.index.glob.binary import BinaryDataSource
 
 _config = get_config()
 
@@ -54,28 +55,18 @@ def process_glob_file(ds, filename, column, identifier, append=False):
     buffer_values = []
     while True:
         line = fp.readline()
-        resources = {}
 
         # Flushing buffered data into the datasource
         if len(buffer_keys) > batch_size or not line:
             if len(buffer_keys) > 0:
-                entries = ds.mget(list(set(buffer_keys)))
-                for i, key in enumerate(buffer_keys):
-                    value = buffer_values[i]
-                    entry = entries[key]
-                    if entries[key] is None:
-                        entry = ds.new()
-                    if append:
-                        if not value in entry[column]:
-                            entry[column].append(value)
+                if not append:
+                    if column == "valid":
+                        buffer_values = [
+                            value.strip() == "v" for value in buffer_values
+                        ]
                     else:
-                        if column == "valid":
-                            entry[column] = value.strip() == "v"
-                        else:
-                            entry[column] = value.strip()
-                    resources[key] = entry
-                    entries[key] = entry
-                ds.mset(resources)
+                        buffer_values = [value.strip() for value in buffer_values]
+                ds.update(column, list(zip(buffer_keys, buffer_values)), append)
                 pbar.update(len(buffer_keys))
                 buffer_keys = []
                 buffer_values = []
@@ -109,18 +100,19 @@ def main():
         "-o",
         "--operation",
         required=True,
-        choices=["csv2redis"],
+        choices=["csv2redis", "csv2binary", "migrate"],
+        help="csv2redis populates the datasource with glob files, csv2binary builds "
+        "the binary datasource from glob files, migrate converts the entries stored "
+        "as JSON strings to hashes",
     )
     arg_parser.add_argument(
         "-i",
         "--input",
-        required=True,
         help="Input to parse and use for the operation",
     )
     arg_parser.add_argument(
         "-id",
         "--identifier",
-        required=True,
         choices=_config.get("cnc", "identifiers").split(","),
         help="The identifier used for citing and cited in the input documents",
     )
@@ -128,6 +120,20 @@ def main():
 
     logger = get_logger()
 
+    if args.operation == "migrate":
+        logger.info("Migrating the datasource entries to hashes...")
+        start = time.time()
+        migrated = RedisDataSource(encoding="hash").migrate(
+            _config.getint("redis", "batch_size")
+        )
+        logger.info(
+            f"{migrated} entries migrated in {(time.time() - start)/ 60} minutes"
+        )
+        return
+
+    if args.input is None or args.identifier is None:
+        arg_parser.error(args.operation + " requires the arguments -i/--input and -id")
+
     # Arguments
     input = args.input
     identifier = args.identifier
@@ -151,6 +157,16 @@ def main():
         logger.error("valid_" + identifier + ".csv not found in the input directory")
         raise FileNotFoundError(ENOENT, os.strerror(ENOENT), valid_id)
 
+    if args.operation == "csv2binary":
+        path = os.path.expanduser(_config.get("binary", "path"))
+        logger.info("Building the binary datasource " + path + "...")
+        start = time.time()
+        entries = BinaryDataSource.build(
+            path, valid_id, id_date, id_issn, id_orcid, identifier
+        )
+        logger.info(f"{entries} entries stored in {(time.time() - start)/ 60} minutes")
+        return
+
     ds = RedisDataSource()
 
     logger.info("Populating the datasource with glob files...")
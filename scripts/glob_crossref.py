@@ -19,7 +19,6 @@ from os.path import exists, basename, isdir
 from json import load, loads
 from collections import Counter
 from datetime import date
-from timeit import default_timer as timer
 from re import sub
 import tarfile
 
@@ -29,6 +28,7 @@ from oc.index.legacy.csv import CSVManager
 from oc.index.identifier.doi import DOIManager
 from oc.index.identifier.issn import ISSNManager
 from oc.index.identifier.orcid import ORCIDManager
+from oc.index.utils.pipeline import parallel_map
 
 
 def build_pubdate_coci(obj):
@@ -126,133 +126,217 @@ def load_json_coci(file, targz_fd, file_idx, len_all_files):
     return result
 
 
-def process_coci(input_dir, output_dir):
-    start = timer()
+def _process_coci_data(file):
+    """It extracts, from a single file of the Crossref dump, the information about
+    the citing DOIs and the dates of the cited DOIs contained in the references.
+
+    Args:
+        file (str or bytes): either the path of a JSON file or the content of a JSON
+        file extracted from a tar.gz archive.
+
+    Returns:
+        tuple: a dictionary mapping each citing DOI to its first valid date and to
+        the first non-empty lists of ISSNs and ORCIDs found, and a dictionary
+        mapping each cited DOI to a Counter of the valid dates specified in its
+        references.
+    """
+    doi_manager = DOIManager()
+    issn_manager = ISSNManager()
+    orcid_manager = ORCIDManager()
+
+    if type(file) is bytes:
+        data = loads(file.decode("utf-8"))
+    else:
+        data = load_json_coci(file, None, None, None)
+
+    citing = {}
+    cited = {}
+    for obj in data.get("items", ()):
+        if "DOI" not in obj:
+            continue
+
+        citing_doi = doi_manager.normalise(obj["DOI"], True)
+        entry = citing.get(citing_doi)
+        if entry is None:
+            entry = citing[citing_doi] = [None, [], []]
+
+        if entry[0] is None:
+            entry[0] = Citation.check_date(build_pubdate_coci(obj))
+
+        if not entry[1]:
+            cur_type = obj.get("type")
+            if cur_type is not None and "journal" in cur_type:
+                for issn in obj.get("ISSN") or ():
+                    issn = issn_manager.normalise(issn)
+                    if issn is not None and issn not in entry[1]:
+                        entry[1].append(issn)
+
+        if not entry[2]:
+            for author in obj.get("author") or ():
+                if "ORCID" in author:
+                    orcid = orcid_manager.normalise(author["ORCID"])
+                    if orcid is not None and orcid not in entry[2]:
+                        entry[2].append(orcid)
+
+        for ref in obj.get("reference") or ():
+            if "DOI" in ref:
+                cited_doi = doi_manager.normalise(ref["DOI"], True)
+                if cited_doi is not None:
+                    cited_date = Citation.check_date(build_pubdate_coci(ref))
+                    dates = cited.get(cited_doi)
+                    if dates is None:
+                        dates = cited[cited_doi] = Counter()
+                    if cited_date is not None:
+                        dates[cited_date] += 1
+
+    return citing, cited
+
+
+def _iter_coci_data(all_files, targz_fd, workers):
+    """It processes all the files of the Crossref dump with a pool of processes,
+    and returns their results in the same order of the files.
+
+    Args:
+        all_files (list): the files returned by get_all_files_coci.
+        targz_fd (tarfile.TarFile): the tar.gz archive, None if the files are in a
+        directory.
+        workers (int): the number of processes to use.
+
+    Returns:
+        iterator: the results of _process_coci_data for each file.
+    """
+
+    def sources():
+        for file in all_files:
+            if targz_fd is None:
+                yield file
+            else:
+                # The archive is read sequentially only once, in the main process
+                yield targz_fd.extractfile(file).read()
+
+    return parallel_map(_process_coci_data, sources(), workers)
+
+
+def _store_coci(csv_manager, rows):
+    """It appends the new rows, sorted by id and value, to the CSV file of a
+    CSVManager, in the same format used by CSVManager.add_value.
+
+    Args:
+        csv_manager (CSVManager): the manager of the CSV file.
+        rows (list): the new (id, value) pairs.
+    """
+    with open(csv_manager.csv_path, "a", encoding="utf8") as f:
+        f.writelines(
+            '"%s","%s"\n' % (id_string.replace('"', '""'), value.replace('"', '""'))
+            for id_string, value in sorted(rows)
+        )
+
+
+def process_coci(input_dir, output_dir, workers=1, validation_workers=8):
+    """It creates the global files (valid DOIs, dates, ISSNs and ORCIDs) from the
+    Crossref dump, reading each file only once. The files are processed in
+    parallel and the partial results are then merged in the order of the files,
+    so that the first information found for a citing DOI is the one kept. The
+    date of a cited DOI which is not a citing DOI is the most common date
+    specified in its references (the oldest one in case of ties), and its
+    validity is checked through concurrent calls to the DOI API.
+
+    Args:
+        input_dir (str): either the directory or the tar.gz file containing the
+        Crossref dump.
+        output_dir (str): the directory where the global files are stored.
+        workers (int, optional): number of processes used to read the dump.
+        Defaults to 1.
+        validation_workers (int, optional): number of concurrent requests used to
+        check the validity of the cited DOIs. Defaults to 8.
+    """
     if not exists(output_dir):
         makedirs(output_dir)
 
-    citing_doi_with_no_date = set()
     valid_doi = CSVManager(output_dir + sep + "valid_doi.csv")
     id_date = CSVManager(output_dir + sep + "id_date.csv")
     id_issn = CSVManager(output_dir + sep + "id_issn.csv")
     id_orcid = CSVManager(output_dir + sep + "id_orcid.csv")
 
     doi_manager = DOIManager()
-    issn_manager = ISSNManager()
-    orcid_manager = ORCIDManager()
 
     all_files, targz_fd = get_all_files_coci(input_dir)
-    len_all_files = len(all_files)
-
-    # Read all the JSON file in the Crossref dump to create the main information of all the indexes
-    # print("\n\n# Add valid DOIs from Crossref metadata")
-    for file_idx, file in enumerate(all_files, 1):
-        data = load_json_coci(file, targz_fd, file_idx, len_all_files)
-
-        if "items" in data:
-            for obj in data["items"]:
-                if "DOI" in obj:
-                    citing_doi = doi_manager.normalise(obj["DOI"], True)
-                    # valid_doi.add_value(citing_doi, "v" if doi_manager.is_valid(citing_doi) else "i")
-                    valid_doi.add_value(
-                        citing_doi, "v"
-                    )  # NB:  add value aggiunge l'id se non c'era e aggiunge il valore al set di valori. Cosa succede se il valore c'è giù ed è invalid?
-
-                    if id_date.get_value(citing_doi) is None:
-                        citing_date = Citation.check_date(build_pubdate_coci(obj))
-                        if citing_date is not None:
-                            id_date.add_value(citing_doi, citing_date)
-                            if citing_doi in citing_doi_with_no_date:
-                                citing_doi_with_no_date.remove(citing_doi)
-                        else:
-                            citing_doi_with_no_date.add(citing_doi)
-
-                    if id_issn.get_value(citing_doi) is None:
-                        if "type" in obj:
-                            cur_type = obj["type"]
-                            if (
-                                cur_type is not None
-                                and "journal" in cur_type
-                                and "ISSN" in obj
-                            ):
-                                cur_issn = obj["ISSN"]
-                                if cur_issn is not None:
-                                    for issn in [
-                                        issn_manager.normalise(issn)
-                                        for issn in cur_issn
-                                    ]:
-                                        if issn is not None:
-                                            id_issn.add_value(citing_doi, issn)
-
-                    if id_orcid.get_value(citing_doi) is None:
-                        if "author" in obj:
-                            cur_author = obj["author"]
-                            if cur_author is not None:
-                                for author in cur_author:
-                                    if "ORCID" in author:
-                                        orcid = orcid_manager.normalise(author["ORCID"])
-                                        if orcid is not None:
-                                            id_orcid.add_value(citing_doi, orcid)
-
-    middle = timer()
-    # print("first process duration: :", (middle - start))
-    # Do it again for updating the dates of the cited DOIs, if these are valid
-    # print("\n\n# Check cited DOIs from Crossref reference field")
+
+    # Merge the partial results, the first file where some information about a
+    # DOI is specified wins. The dates of the cited DOIs are needed only for the
+    # ones that are not citing DOIs, thus the others are dropped as soon as
+    # possible.
+    citing = {}
     doi_date = {}
-    for file_idx, file in enumerate(all_files, 1):
-        data = load_json_coci(file, targz_fd, file_idx, len_all_files)
-
-        if "items" in data:
-            for obj in data["items"]:
-                if "DOI" in obj and "reference" in obj:
-                    for ref in obj["reference"]:
-                        if "DOI" in ref:
-                            cited_doi = str(doi_manager.normalise(ref["DOI"], True))
-                            if valid_doi.get_value(cited_doi) is None:
-                                valid_doi.add_value(
-                                    cited_doi,
-                                    "v" if doi_manager.is_valid(cited_doi) else "i",
-                                )
-                                if (
-                                    valid_doi.get_value(cited_doi) == "v"
-                                    and id_date.get_value(cited_doi) is None
-                                ):
-                                    if cited_doi not in doi_date:
-                                        doi_date[cited_doi] = []
-                                    cited_date = Citation.check_date(
-                                        build_pubdate_coci(ref)
-                                    )
-                                    if cited_date is not None:
-                                        doi_date[cited_doi].append(cited_date)
-                                        if cited_doi in citing_doi_with_no_date:
-                                            citing_doi_with_no_date.remove(cited_doi)
-
-    # Add the date to the DOI if such date is the most adopted one in the various references.
-    # In case two distinct dates are used the most, select the older one.
-    for doi in doi_date:
-        count = Counter(doi_date[doi])
-        if len(count):
-            top_value = count.most_common(1)[0][1]
-            selected_dates = []
-            for date in count:
-                if count[date] == top_value:
-                    selected_dates.append(date)
-            best_date = sorted(selected_dates)[0]
-            id_date.add_value(doi, best_date)
-        else:
-            id_date.add_value(doi, "")
-
-    # Add emtpy dates for the remaining DOIs
-    for doi in citing_doi_with_no_date:
-        id_date.add_value(doi, "")
+    for file_citing, file_cited in _iter_coci_data(all_files, targz_fd, workers):
+        for citing_doi, (cur_date, issns, orcids) in file_citing.items():
+            entry = citing.get(citing_doi)
+            if entry is None:
+                citing[citing_doi] = [cur_date, issns, orcids]
+                doi_date.pop(citing_doi, None)
+            else:
+                if entry[0] is None:
+                    entry[0] = cur_date
+                if not entry[1]:
+                    entry[1] = issns
+                if not entry[2]:
+                    entry[2] = orcids
+        for cited_doi, dates in file_cited.items():
+            if cited_doi not in citing:
+                count = doi_date.get(cited_doi)
+                if count is None:
+                    doi_date[cited_doi] = dates
+                else:
+                    count.update(dates)
 
     # Close the file descriptor of the tar.gz archive if it was used
     if targz_fd is not None:
         targz_fd.close()
 
-    end = timer()
-    # print("second process duration: ", end-middle)
-    # print("full process duration: ", end-start)
+    valid_rows = []
+    date_rows = []
+    issn_rows = []
+    orcid_rows = []
+    for citing_doi, (cur_date, issns, orcids) in citing.items():
+        if "v" not in (valid_doi.get_value(citing_doi) or ()):
+            valid_rows.append((citing_doi, "v"))
+        if id_date.get_value(citing_doi) is None:
+            date_rows.append((citing_doi, "" if cur_date is None else cur_date))
+        if id_issn.get_value(citing_doi) is None:
+            issn_rows.extend((citing_doi, issn) for issn in issns)
+        if id_orcid.get_value(citing_doi) is None:
+            orcid_rows.extend((citing_doi, orcid) for orcid in orcids)
+
+    # Check the validity of the cited DOIs that are not citing DOIs too, with a
+    # bounded number of pending requests
+    to_check = (doi for doi in doi_date if valid_doi.get_value(doi) is None)
+    validity = parallel_map(
+        lambda doi: (doi, doi_manager.is_valid(doi)),
+        to_check,
+        max(validation_workers, 1),
+        threads=True,
+    )
+    for cited_doi, is_valid in validity:
+        valid_rows.append((cited_doi, "v" if is_valid else "i"))
+
+        # Add the date to the DOI if such date is the most adopted one in the
+        # various references. In case two distinct dates are used the most,
+        # select the older one.
+        if is_valid and id_date.get_value(cited_doi) is None:
+            count = doi_date[cited_doi]
+            if len(count):
+                top_value = count.most_common(1)[0][1]
+                best_date = sorted(
+                    cur_date for cur_date in count if count[cur_date] == top_value
+                )[0]
+                date_rows.append((cited_doi, best_date))
+            else:
+                date_rows.append((cited_doi, ""))
+
+    _store_coci(valid_doi, valid_rows)
+    _store_coci(id_date, date_rows)
+    _store_coci(id_issn, issn_rows)
+    _store_coci(id_orcid, orcid_rows)
 
 
 def main():
@@ -277,8 +361,26 @@ def main():
         help="The directory where the indexes are stored.",
     )
 
+    arg_parser.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        type=int,
+        default=1,
+        help="The number of processes used to read the Crossref dump.",
+    )
+    arg_parser.add_argument(
+        "-vw",
+        "--validation_workers",
+        dest="validation_workers",
+        type=int,
+        default=8,
+        help="The number of concurrent requests used to check the validity of the "
+        "cited DOIs.",
+    )
+
     args = arg_parser.parse_args()
-    process_coci(args.input, args.output)
+    process_coci(args.input, args.output, args.workers, args.validation_workers)
 
 
 # Added for testing purposes, in the official version it should be removed
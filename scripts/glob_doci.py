@@ -14,12 +14,12 @@
 # SOFTWARE.
 
 from argparse import ArgumentParser
+from functools import lru_cache
 import os
 from os import sep, makedirs, walk
 from os.path import exists, basename, isdir
 from json import load, loads
 import datetime
-from timeit import default_timer as timer
 from tqdm import tqdm
 import json
 import tarfile
@@ -28,6 +28,9 @@ from oc.index.legacy.csv import CSVManager
 from oc.index.identifier.doi import DOIManager
 from oc.index.identifier.issn import ISSNManager
 from oc.index.identifier.orcid import ORCIDManager
+from oc.index.utils.pipeline import parallel_map
+
+RELEVANT_RELATIONS = {"references", "isreferencedby", "cites", "iscitedby"}
 
 
 def issn_data_recover_doci(directory):
@@ -71,6 +74,7 @@ def get_all_files_doci(i_dir_or_targz_file):
     return result, targz_fd
 
 
+@lru_cache(maxsize=65536)
 def valid_date_doci(date_text):
     date_text = str(date_text)
     try:
@@ -131,248 +135,229 @@ def load_json_doci(file, targz_fd, file_idx, len_all_files):
     return result
 
 
-def process_doci(input_dir, output_dir, n):
-    start = timer()
+def _get_date_doci(attributes):
+    # The first valid date of issue if there is, otherwise the year of publication
+    for cur_date in attributes["dates"]:
+        if str(cur_date["dateType"]).lower() == "issued":
+            issue_date = valid_date_doci(str(cur_date["date"]))
+            if issue_date:
+                return issue_date
+
+    publicationYear = attributes["publicationYear"]
+    if publicationYear:
+        return valid_date_doci(str(publicationYear))
+
+
+def _process_doci_data(file):
+    """It extracts, from a single file of the DataCite dump, all the information
+    needed by the glob about each entity, in the same order of the entities in
+    the file.
+
+    Args:
+        file (str or bytes): either the path of a JSON file or the content of a JSON
+        file extracted from a tar.gz archive.
+
+    Returns:
+        list: for each entity, a tuple containing the normalised DOI, the date, the
+        valid ORCIDs of the creators, the ISSNs of the related identifiers, the
+        ISSN and the title of the container (None if not specified) and the
+        normalised DOIs involved in citations with the entity.
+    """
+    doi_manager = DOIManager()
+    orcid_manager = ORCIDManager()
+
+    if type(file) is bytes:
+        data = loads(file.decode("utf-8"))
+    else:
+        data = load_json_doci(file, None, None, None)
+
+    result = []
+    for item in data.get("data", ()):
+        attributes = item["attributes"]
+        relatedIdentifiers = attributes["relatedIdentifiers"]
+
+        orcids = []
+        for author in attributes["creators"]:
+            for element in author.get("nameIdentifiers", ()):
+                if (
+                    "nameIdentifier" in element
+                    and "nameIdentifierScheme" in element
+                    and element["nameIdentifierScheme"].lower() == "orcid"
+                ):
+                    orcid = element["nameIdentifier"]
+                    if orcid is not None and orcid != "":
+                        orcid = orcid_manager.normalise(orcid)
+                        if orcid_manager.is_valid(orcid):
+                            orcids.append(orcid)
+
+        related_issns = []
+        related_dois = []
+        for related in relatedIdentifiers:
+            relationType = related.get("relationType")
+            relatedIdentifierType = str(related.get("relatedIdentifierType")).lower()
+            if not relationType or "relatedIdentifier" not in related:
+                continue
+            if relationType.lower() == "ispartof" and relatedIdentifierType == "issn":
+                relatedISSN = str(related["relatedIdentifier"])
+                if relatedISSN:
+                    related_issns.append(relatedISSN)
+            elif (
+                relationType.lower() in RELEVANT_RELATIONS
+                and relatedIdentifierType == "doi"
+            ):
+                relatedDOI = doi_manager.normalise(related["relatedIdentifier"], True)
+                if relatedDOI is not None:
+                    related_dois.append(relatedDOI)
+
+        cont_issn = None
+        journal_title = None
+        container = attributes["container"]
+        if (
+            container.get("identifier", "") != ""
+            and "identifierType" in container
+            and container["identifierType"].lower() == "issn"
+        ):
+            cont_issn = container["identifier"]
+            if "title" in container:
+                journal_title = container["title"].lower()
+
+        result.append(
+            (
+                doi_manager.normalise(attributes["doi"], True),
+                _get_date_doci(attributes),
+                orcids,
+                related_issns,
+                cont_issn,
+                journal_title,
+                related_dois,
+            )
+        )
+
+    return result
+
+
+def process_doci(input_dir, output_dir, n, workers=1, validation_workers=8):
+    """It creates the global files (valid DOIs, dates, ISSNs and ORCIDs) from the
+    DataCite dump, reading each file only once. The information about the
+    entities of each file is extracted in parallel, and it is then merged in the
+    order of the files, so that the result is the same of a sequential
+    processing. The validity of the DOIs cited by or citing the entities of the
+    dump is checked through concurrent calls to the DOI API.
+
+    Args:
+        input_dir (str): either the directory or the tar.gz file containing the
+        DataCite dump.
+        output_dir (str): the directory where the global files are stored.
+        n (int): the number of entities after which the ISSN mapping of the
+        journals is stored.
+        workers (int, optional): number of processes used to read the dump.
+        Defaults to 1.
+        validation_workers (int, optional): number of concurrent requests used to
+        check the validity of the related DOIs. Defaults to 8.
+    """
     if not exists(output_dir):
         makedirs(output_dir)
 
     citing_doi_with_no_date = set()
-    valid_doi = CSVManager(output_dir + sep + "valid_doi.csv")
-    id_date = CSVManager(output_dir + sep + "id_date.csv")
-    id_issn = CSVManager(output_dir + sep + "id_issn.csv")
-    id_orcid = CSVManager(output_dir + sep + "id_orcid.csv")
-
-    journal_issn_dict = issn_data_recover_doci(output_dir)
+    valid_doi = CSVManager(output_dir + sep + "valid_doi.csv", buffer_size=100000)
+    id_date = CSVManager(output_dir + sep + "id_date.csv", buffer_size=100000)
+    id_issn = CSVManager(output_dir + sep + "id_issn.csv", buffer_size=100000)
+    id_orcid = CSVManager(output_dir + sep + "id_orcid.csv", buffer_size=100000)
 
     doi_manager = DOIManager()
     issn_manager = ISSNManager()
-    orcid_manager = ORCIDManager()
 
     all_files, targz_fd = get_all_files_doci(input_dir)
-    len_all_files = len(all_files)
     issnDict = {}
-    relevant_relations = ["references", "isreferencedby", "cites", "iscitedby"]
+    related_dois = {}
+
+    def sources():
+        for file in all_files:
+            if targz_fd is None:
+                yield file
+            else:
+                # The archive is read sequentially only once, in the main process
+                yield targz_fd.extractfile(file).read()
 
     count = 0
-    # Read all the JSON files in the DataCite dump to create the main information of all the indexes
-    # print("\n\n# Add valid DOIs from DataCite metadata")
-    for file_idx, file in enumerate(all_files, 1):
-        data = load_json_doci(file, targz_fd, file_idx, len_all_files)
-        if "data" in data:
-            data_list = data["data"]
-            for item in tqdm(data_list):
-                count += 1
-                attributes = item["attributes"]
-                citing_doi = attributes["doi"]
-                relatedIdentifiers = attributes["relatedIdentifiers"]
-                citing_doi = doi_manager.normalise(citing_doi, True)
-                # valid_doi.add_value(citing_doi, "v" if doi_manager.is_valid(citing_doi) else "i")
-                valid_doi.add_value(
-                    citing_doi, "v"
-                )  # NB:  add value aggiunge l'id se non c'era e aggiunge il valore al set di valori. Cosa succede se il valore c'è giù ed è invalid?
-
-                # collect the date of issue if there is, otherwise the year of publciation
-                if id_date.get_value(citing_doi) is None:
-                    listDates = attributes["dates"]
-                    publicationYear = attributes["publicationYear"]
-
-                    if listDates != []:
-                        if [
-                            data
-                            for data in listDates
-                            if str(data["dateType"]).lower() == "issued"
-                        ]:
-                            issue_dates = [
-                                data
-                                for data in listDates
-                                if str(data["dateType"]).lower() == "issued"
-                            ]
-                            if [
-                                iss_date
-                                for iss_date in issue_dates
-                                if valid_date_doci(str(iss_date["date"]))
-                            ]:
-                                flt_issue_dates = [
-                                    iss_date
-                                    for iss_date in issue_dates
-                                    if valid_date_doci(str(iss_date["date"]))
-                                ]
-                                for flt_iss_date in flt_issue_dates:
-                                    id_date.add_value(
-                                        citing_doi,
-                                        valid_date_doci(str(flt_iss_date["date"])),
-                                    )
-                                    if citing_doi in citing_doi_with_no_date:
-                                        citing_doi_with_no_date.remove(citing_doi)
-                                    break
-
-                            # c'è listDates, almeno uno degli elementi ha "issued" come valore del campo "dateType"
-                            # ma nessuna delle date in listDates ha una data valida nel campo "date"
-                            elif publicationYear:
-                                publicationYear = valid_date_doci(str(publicationYear))
-                                if publicationYear:
-                                    id_date.add_value(citing_doi, publicationYear)
-                                    if citing_doi in citing_doi_with_no_date:
-                                        citing_doi_with_no_date.remove(citing_doi)
-                                else:
-                                    citing_doi_with_no_date.add(citing_doi)
-                            else:
-                                citing_doi_with_no_date.add(citing_doi)
-
-                        # c'è listDates ma nessuno degli elementi ha come dateType "issued"
-                        elif publicationYear:
-                            publicationYear = valid_date_doci(str(publicationYear))
-                            if publicationYear:
-                                id_date.add_value(citing_doi, publicationYear)
-                                if citing_doi in citing_doi_with_no_date:
-                                    citing_doi_with_no_date.remove(citing_doi)
-                            else:
-                                citing_doi_with_no_date.add(citing_doi)
-                        else:
-                            citing_doi_with_no_date.add(citing_doi)
-
-                    # Non c'è listDates, non ci sono elementi in listDates
-                    elif publicationYear:
-                        publicationYear = valid_date_doci(str(publicationYear))
-                        if publicationYear:
-                            id_date.add_value(citing_doi, publicationYear)
-                            if citing_doi in citing_doi_with_no_date:
-                                citing_doi_with_no_date.remove(citing_doi)
-                        else:
-                            citing_doi_with_no_date.add(citing_doi)
-                    else:
-                        citing_doi_with_no_date.add(citing_doi)
-
-                # collect the orcid of the contributors
-                if id_orcid.get_value(citing_doi) is None:
-                    contributorList = attributes["creators"]
-                    if contributorList != []:
-                        for author in contributorList:  # da qui!!
-                            if "nameIdentifiers" in author.keys():
-                                infoAuthor = author["nameIdentifiers"]
-                                for element in infoAuthor:
-                                    if (
-                                        "nameIdentifier" in element.keys()
-                                        and "nameIdentifierScheme" in element.keys()
-                                    ):
-                                        if (
-                                            element["nameIdentifierScheme"]
-                                        ).lower() == "orcid":
-                                            orcid = element["nameIdentifier"]
-                                            if orcid is not None and orcid != "":
-                                                orcid = orcid_manager.normalise(orcid)
-                                                if orcid_manager.is_valid(orcid):
-                                                    id_orcid.add_value(
-                                                        citing_doi, orcid
-                                                    )
-
-                if id_issn.get_value(citing_doi) is None:
-                    issn_set = set()
-
-                    if relatedIdentifiers != []:
-                        for related in relatedIdentifiers:
-                            if "relationType" in related.keys():
-                                relationType = related["relationType"]
-                                if relationType.lower() == "ispartof":
-                                    if "relatedIdentifierType" in related.keys():
-                                        relatedIdentifierType = (
-                                            str(related["relatedIdentifierType"])
-                                        ).lower()
-                                        if relatedIdentifierType == "issn":
-                                            if "relatedIdentifier" in related.keys():
-                                                relatedISSN = str(
-                                                    related["relatedIdentifier"]
-                                                )
-                                                if relatedISSN:
-                                                    issn_set.add(relatedISSN)
-
-                    container = attributes["container"]
-                    if (
-                        "identifier" in container.keys()
-                        and "identifierType" in container.keys()
-                    ):
-                        if (
-                            container["identifier"] != ""
-                            and (container["identifierType"]).lower() == "issn"
-                        ):
-                            cont_issn = container["identifier"]
-                            issn_set.add(cont_issn)
-                            if "title" in container.keys():
-                                journal_title = (container["title"]).lower()
-                                if journal_title in issnDict.keys():
-                                    issnList = issnDict[journal_title]
-                                    if issnList != []:
-                                        if [
-                                            el for el in issnList if el not in issn_set
-                                        ]:
-                                            issn_set.update(set(issnList))
-                                            issnDict[journal_title] = list(issn_set)
-                                    else:
-                                        issnDict[journal_title] = list(issn_set)
-                                else:
-                                    issnDict[journal_title] = list(issn_set)
-
-                    normalised_issn_set = set()
-                    for issn in issn_set:
-                        norm_issn = issn_manager.normalise(issn)
-                        normalised_issn_set.add(norm_issn)
-                    for issn in normalised_issn_set:
-                        if issn_manager.is_valid(issn):
-                            id_issn.add_value(citing_doi, issn)
-
-                if int(count) != 0 and int(count) % int(n) == 0:
-                    # print("data to cache. processed entities:", count, ". transcription to cache n.", (int(count)//int(n)))
-                    issn_data_to_cache_doci(issnDict, output_dir)
+    # Merge the information of all the JSON files in the DataCite dump to create the
+    # main information of all the indexes
+    for items in tqdm(
+        parallel_map(_process_doci_data, sources(), workers), total=len(all_files)
+    ):
+        for (
+            citing_doi,
+            citing_date,
+            orcids,
+            related_issns,
+            cont_issn,
+            journal_title,
+            cur_related_dois,
+        ) in items:
+            count += 1
+            valid_doi.add_value(citing_doi, "v")
+
+            if id_date.get_value(citing_doi) is None:
+                if citing_date:
+                    id_date.add_value(citing_doi, citing_date)
+                    citing_doi_with_no_date.discard(citing_doi)
+                else:
+                    citing_doi_with_no_date.add(citing_doi)
+
+            if id_orcid.get_value(citing_doi) is None:
+                for orcid in orcids:
+                    id_orcid.add_value(citing_doi, orcid)
+
+            if id_issn.get_value(citing_doi) is None:
+                issn_set = set(related_issns)
+                if cont_issn is not None:
+                    issn_set.add(cont_issn)
+                    if journal_title is not None:
+                        issnList = issnDict.get(journal_title)
+                        if not issnList:
+                            issnDict[journal_title] = list(issn_set)
+                        elif [el for el in issnList if el not in issn_set]:
+                            issn_set.update(issnList)
+                            issnDict[journal_title] = list(issn_set)
+
+                normalised_issn_set = set()
+                for issn in issn_set:
+                    normalised_issn_set.add(issn_manager.normalise(issn))
+                for issn in normalised_issn_set:
+                    if issn_manager.is_valid(issn):
+                        id_issn.add_value(citing_doi, issn)
+
+            for related_doi in cur_related_dois:
+                related_dois[related_doi] = None
+
+            if int(count) != 0 and int(count) % int(n) == 0:
+                issn_data_to_cache_doci(issnDict, output_dir)
 
     issn_data_to_cache_doci(issnDict, output_dir)
-    middle = timer()
-    # print("first process duration: :", (middle - start))
 
-    cited_dois = 0
-    count = 0
-    for file_idx, file in enumerate(all_files, 1):
-        data = load_json_doci(file, targz_fd, file_idx, len_all_files)
-        if "data" in data:
-            data_list = data["data"]
-            for item in tqdm(data_list):
-                count += 1
-                # print("processing entity n.", count, "for cited dois")
-                attributes = item["attributes"]
-                relatedIdentifiers = attributes["relatedIdentifiers"]
-                if relatedIdentifiers != []:
-                    for related in relatedIdentifiers:
-                        relationType = related["relationType"]
-                        if relationType:
-                            if relationType.lower() in relevant_relations:
-                                if "relatedIdentifierType" in related.keys():
-                                    relatedIdentifierType = (
-                                        str(related["relatedIdentifierType"])
-                                    ).lower()
-                                    if relatedIdentifierType == "doi":
-                                        if "relatedIdentifier" in related.keys():
-                                            relatedDOI = doi_manager.normalise(
-                                                related["relatedIdentifier"], True
-                                            )
-                                            if (
-                                                valid_doi.get_value(relatedDOI) is None
-                                                or valid_doi.get_value(relatedDOI)
-                                                == "i"
-                                            ):
-                                                # condizione aggiunta per evitare di validare di nuovo tramite API doi già validati
-                                                valid_doi.add_value(
-                                                    relatedDOI,
-                                                    "v"
-                                                    if doi_manager.is_valid(relatedDOI)
-                                                    else "i",
-                                                )
-                                                cited_dois += 1
+    # Close the file descriptor of the tar.gz archive if it was used
+    if targz_fd is not None:
+        targz_fd.close()
+
+    # Check the validity of the related DOIs which are not in the dump, with a
+    # bounded number of pending requests
+    to_check = (doi for doi in related_dois if valid_doi.get_value(doi) is None)
+    validity = parallel_map(
+        lambda doi: (doi, doi_manager.is_valid(doi)),
+        to_check,
+        max(validation_workers, 1),
+        threads=True,
+    )
+    for related_doi, is_valid in validity:
+        valid_doi.add_value(related_doi, "v" if is_valid else "i")
 
     for doi in citing_doi_with_no_date:
         id_date.add_value(doi, "")
 
-    end = timer()
-    # print("second process duration: ", end-middle)
-    # print("full process duration: ", end-start)
+    valid_doi.close()
+    id_date.close()
+    id_issn.close()
+    id_orcid.close()
 
 
 def main():
@@ -404,9 +389,32 @@ def main():
         required=True,
         help="Interval of processed entities after which the issn data are saved to cache files.",
     )
+    arg_parser.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        type=int,
+        default=1,
+        help="The number of processes used to read the DataCite dump.",
+    )
+    arg_parser.add_argument(
+        "-vw",
+        "--validation_workers",
+        dest="validation_workers",
+        type=int,
+        default=8,
+        help="The number of concurrent requests used to check the validity of the "
+        "related DOIs.",
+    )
 
     args = arg_parser.parse_args()
-    process_doci(args.input, args.output, args.num_entities)
+    process_doci(
+        args.input,
+        args.output,
+        args.num_entities,
+        args.workers,
+        args.validation_workers,
+    )
 
 
 # Added for testing purposes, in the official version it should be removed
@@ -35,6 +35,7 @@ from oc.index.identifier.issn import ISSNManager
 from oc.index.identifier.orcid import ORCIDManager
 from oc.index.finder.orcid import ORCIDResourceFinder
 from oc.index.finder.crossref import CrossrefResourceFinder
+from oc.index.utils.pipeline import parallel_map
 
 
 def issn_data_recover_noci(directory):
@@ -89,16 +90,58 @@ def get_all_files_noci(i_dir):
     return result, opener
 
 
-def process_noci(input_dir, output_dir, n, id_orcid_dir=None):
+def _prepare_chunk_noci(chunk):
+    """It normalises, through vectorized operations, the PMIDs, the DOIs and the
+    publication dates of a chunk of the iCite metadata, and collects the PMIDs
+    of the entities citing or cited by the entities of the chunk.
+
+    Args:
+        chunk (pandas.DataFrame): the chunk of the iCite metadata.
+
+    Returns:
+        tuple: a DataFrame with the columns 'pmid', 'doi', 'date' and 'journal',
+        and the set of the normalised related PMIDs.
+    """
+    pmid_manager = PMIDManager()
+    doi_manager = DOIManager()
+
+    years = (
+        chunk["year"]
+        .fillna("")
+        .astype(str)
+        .str.replace("[^\\d]", "", regex=True)
+        .str.slice(0, 4)
+        .astype(object)
+    )
+    rows = pd.DataFrame(
+        {
+            "pmid": pmid_manager.normalise_series(chunk["pmid"], True),
+            "doi": doi_manager.normalise_series(chunk["doi"]),
+            "date": [Citation.check_date(year) if year else None for year in years],
+            "journal": chunk["journal"].fillna("").astype(object),
+        }
+    )
+
+    related = pd.concat([chunk["references"], chunk["cited_by"]]).dropna()
+    related = related.str.split().explode().dropna()
+    related_pmids = set(pmid_manager.normalise_series(related, True))
+    related_pmids.discard(pmid_manager.normalise("", True))
+
+    return rows, related_pmids
+
+
+def process_noci(
+    input_dir, output_dir, n, id_orcid_dir=None, workers=1, chunk_size=100000
+):
     start = timer()
     if not exists(output_dir):
         makedirs(output_dir)
 
     citing_pmid_with_no_date = set()
-    valid_pmid = CSVManager(output_dir + sep + "valid_pmid.csv")
-    id_date = CSVManager(output_dir + sep + "id_date.csv")
-    id_issn = CSVManager(output_dir + sep + "id_issn.csv")
-    id_orcid = CSVManager(output_dir + sep + "id_orcid.csv")
+    valid_pmid = CSVManager(output_dir + sep + "valid_pmid.csv", buffer_size=10000)
+    id_date = CSVManager(output_dir + sep + "id_date.csv", buffer_size=10000)
+    id_issn = CSVManager(output_dir + sep + "id_issn.csv", buffer_size=10000)
+    id_orcid = CSVManager(output_dir + sep + "id_orcid.csv", buffer_size=10000)
 
     journal_issn_dict = issn_data_recover_noci(output_dir)
 
@@ -111,150 +154,106 @@ def process_noci(input_dir, output_dir, n, id_orcid_dir=None):
     pmid_manager = PMIDManager()
 
     all_files, opener = get_all_files_noci(input_dir)
-    len_all_files = len(all_files)
     pmid_doi_map = dict()
-
-    # Read all the CSV file in the NIH dump to create the main information of all the indexes
-    # print("\n\n# Add valid PMIDs from NIH metadata")
-    for file_idx, file in enumerate(all_files, 1):
-        df = pd.DataFrame()
-
-        for chunk in pd.read_csv(file, chunksize=1000):
-            f = pd.concat([df, chunk], ignore_index=True)
-            f.fillna("", inplace=True)
-
-            # print("Open file %s of %s" % (file_idx, len_all_files))
-            for index, row in f.iterrows():
-                if int(index) != 0 and int(index) % int(n) == 0:
-                    # print( "Group nr.", int(index)//int(n), "processed. Data from", int(index), "rows saved to journal_issn.json mapping file")
-                    issn_data_to_cache_noci(journal_issn_dict, output_dir)
-
-                citing_pmid = pmid_manager.normalise(row["pmid"], True)
-                valid_pmid.add_value(citing_pmid, "v")
-                citing_doi = doi_manager.normalise(row["doi"], False)
-                if citing_doi and id_orcid.get_value(citing_pmid) is None:
-                    pmid_doi_map[citing_pmid] = {"doi": citing_doi, "has_orcid": False}
-
-                if id_date.get_value(citing_pmid) is None:
-                    citing_date = Citation.check_date(build_pubdate_noci(row))
-                    if citing_date is not None:
-                        id_date.add_value(citing_pmid, citing_date)
-                        if citing_pmid in citing_pmid_with_no_date:
-                            citing_pmid_with_no_date.remove(citing_pmid)
+    orcid_pattern = re.compile("\\[(([X0-9]\\-?){4}){4}]", re.IGNORECASE)
+    related_pmids = set()
+    row_idx = 0
+
+    def chunks():
+        for file in all_files:
+            yield from pd.read_csv(file, chunksize=chunk_size, dtype=str)
+
+    # Read all the CSV file in the NIH dump to create the main information of all the indexes,
+    # the identifiers and the dates of each chunk are normalised in parallel
+    for rows, chunk_related_pmids in parallel_map(
+        _prepare_chunk_noci, chunks(), workers
+    ):
+        related_pmids.update(chunk_related_pmids)
+
+        for citing_pmid, citing_doi, citing_date, journal_name in zip(
+            rows["pmid"], rows["doi"], rows["date"], rows["journal"]
+        ):
+            if row_idx != 0 and row_idx % int(n) == 0:
+                issn_data_to_cache_noci(journal_issn_dict, output_dir)
+            row_idx += 1
+
+            valid_pmid.add_value(citing_pmid, "v")
+            if citing_doi and id_orcid.get_value(citing_pmid) is None:
+                pmid_doi_map[citing_pmid] = citing_doi
+
+            if id_date.get_value(citing_pmid) is None:
+                if citing_date is not None:
+                    id_date.add_value(citing_pmid, citing_date)
+                    if citing_pmid in citing_pmid_with_no_date:
+                        citing_pmid_with_no_date.remove(citing_pmid)
+                else:
+                    citing_pmid_with_no_date.add(citing_pmid)
+
+            if id_issn.get_value(citing_pmid) is None:
+                if journal_name:
+                    if journal_name in journal_issn_dict.keys():
+                        for issn in journal_issn_dict[journal_name]:
+                            id_issn.add_value(citing_pmid, issn)
                     else:
-                        citing_pmid_with_no_date.add(citing_pmid)
-
-                if id_issn.get_value(citing_pmid) is None:
-                    journal_name = row["journal"]
-                    if journal_name:
-                        if journal_name in journal_issn_dict.keys():
-                            for issn in journal_issn_dict[journal_name]:
-                                id_issn.add_value(citing_pmid, issn)
-                        else:
-                            if citing_doi is not None:
-                                json_res = crossref_resource_finder._call_api(
-                                    citing_doi
-                                )
-                                if json_res is not None:
-                                    issn_set = crossref_resource_finder._get_issn(
-                                        json_res
-                                    )
-                                    if len(issn_set) > 0:
-                                        journal_issn_dict[journal_name] = []
-                                    for issn in issn_set:
-                                        issn_norm = issn_manager.normalise(str(issn))
-                                        id_issn.add_value(citing_pmid, issn_norm)
-                                        journal_issn_dict[journal_name].append(
-                                            issn_norm
-                                        )
-
-            if len(pmid_doi_map) > 0:
-                if id_orcid_dir and exists(id_orcid_dir):
-                    orcid_id_files, op = get_all_files_noci(id_orcid_dir)
-                    len_orcid_id_files = len(orcid_id_files)
-                    if len_orcid_id_files > 0:
-                        for f_idx, f in enumerate(orcid_id_files, 1):
-                            unzip_file = op(f, mode="r")
-                            unzip_file = csv.DictReader(
-                                codecs.iterdecode(unzip_file, "utf-8")
-                            )
-                            for row in unzip_file:
-                                if [
-                                    k
-                                    for k, v in pmid_doi_map.items()
-                                    if v["doi"] == row["id"]
-                                ]:
-                                    c_pmid = [
-                                        k
-                                        for k, v in pmid_doi_map.items()
-                                        if v["doi"] == row["id"]
-                                    ][
-                                        0
-                                    ]  # To do: exact match
-                                    c_doi = doi_manager.normalise(row["id"], False)
-                                    orcid = re.search(
-                                        "\[(([X0-9]\-?){4}){4}]",
-                                        row["value"],
-                                        re.IGNORECASE,
-                                    ).group(0)
-                                    if orcid:
-                                        nor_orcid = orcid_manager.normalise(orcid)
-                                        id_orcid.add_value(c_pmid, nor_orcid)
-                                        if pmid_doi_map[c_pmid]["has_orcid"] == False:
-                                            pmid_doi_map[c_pmid]["has_orcid"] = True
-
-                for citing_pmid, d in pmid_doi_map.items():
-                    if d["has_orcid"] == False:
-                        json_res = orcid_resource_finder._call_api(d["doi"])
-                        if json_res is not None:
-                            orcid_set = orcid_resource_finder._get_orcid(json_res)
-                            if len(orcid_set) > 0:
-                                d["has_orcid"] = True
-                                for orcid in orcid_set:
-                                    orcid_norm = orcid_manager.normalise(orcid)
-                                    id_orcid.add_value(citing_pmid, orcid_norm)
-
-            pmid_doi_map = dict()
-            issn_data_to_cache_noci(journal_issn_dict, output_dir)
-
-    middle = timer()
-
-    # print("first process duration: :", (middle - start))
-    # print("\n\n# Checking the referenced pmids validity")
-    for file_idx, file in enumerate(all_files, 1):
-        df = pd.DataFrame()
-
-        for chunk in pd.read_csv(file, chunksize=1000):
-            f = pd.concat([df, chunk], ignore_index=True)
-            f.fillna("", inplace=True)
-            # print("Open file %s of %s" % (file_idx, len_all_files))
-            for index, row in f.iterrows():
-                if row["references"] != "":
-                    ref_string = row["references"].strip()
-                    ref_string_norm = re.sub("\s+", " ", ref_string)
-                    cited_pmids = set(ref_string_norm.split(" "))
-                    for cited_pmid in cited_pmids:
-                        cited_pmid = pmid_manager.normalise(cited_pmid, True)
-                        if valid_pmid.get_value(cited_pmid) is None:
-                            valid_pmid.add_value(
-                                cited_pmid,
-                                "v" if pmid_manager.is_valid(cited_pmid) else "i",
-                            )
-                if row["cited_by"] != "":
-                    citing_string = row["cited_by"].strip()
-                    citing_string_norm = re.sub("\s+", " ", citing_string)
-                    citing_pmids = set(citing_string_norm.split(" "))
-                    for citing_p in citing_pmids:
-                        citing_p = pmid_manager.normalise(citing_p, True)
-                        if valid_pmid.get_value(citing_p) is None:
-                            valid_pmid.add_value(
-                                citing_p,
-                                "v" if pmid_manager.is_valid(citing_p) else "i",
-                            )
+                        if citing_doi is not None:
+                            json_res = crossref_resource_finder._call_api(citing_doi)
+                            if json_res is not None:
+                                issn_set = crossref_resource_finder._get_issn(json_res)
+                                if len(issn_set) > 0:
+                                    journal_issn_dict[journal_name] = []
+                                for issn in issn_set:
+                                    issn_norm = issn_manager.normalise(str(issn))
+                                    id_issn.add_value(citing_pmid, issn_norm)
+                                    journal_issn_dict[journal_name].append(issn_norm)
+
+        issn_data_to_cache_noci(journal_issn_dict, output_dir)
+
+    # Join the citing pmids with the ORCIDs associated to their DOIs, through a single
+    # pass on the DOI-ORCID mapping files and an index from each DOI to the first
+    # pmid having such DOI
+    pmids_with_orcid = set()
+    if pmid_doi_map and id_orcid_dir and exists(id_orcid_dir):
+        doi_pmid_map = dict()
+        for citing_pmid, citing_doi in pmid_doi_map.items():
+            doi_pmid_map.setdefault(citing_doi, citing_pmid)
+
+        orcid_id_files, op = get_all_files_noci(id_orcid_dir)
+        for f in orcid_id_files:
+            with op(f, mode="r") as unzip_file:
+                for row in csv.DictReader(codecs.iterdecode(unzip_file, "utf-8")):
+                    c_pmid = doi_pmid_map.get(row["id"])
+                    if c_pmid is not None:
+                        orcid = orcid_pattern.search(row["value"])
+                        if orcid:
+                            nor_orcid = orcid_manager.normalise(orcid.group(0))
+                            id_orcid.add_value(c_pmid, nor_orcid)
+                            pmids_with_orcid.add(c_pmid)
+
+    for citing_pmid, citing_doi in pmid_doi_map.items():
+        if citing_pmid not in pmids_with_orcid:
+            json_res = orcid_resource_finder._call_api(citing_doi)
+            if json_res is not None:
+                orcid_set = orcid_resource_finder._get_orcid(json_res)
+                for orcid in orcid_set:
+                    orcid_norm = orcid_manager.normalise(orcid)
+                    id_orcid.add_value(citing_pmid, orcid_norm)
+
+    # Check the validity of the referenced and citing pmids which are not in the dump
+    for related_pmid in sorted(related_pmids):
+        if valid_pmid.get_value(related_pmid) is None:
+            valid_pmid.add_value(
+                related_pmid,
+                "v" if pmid_manager.is_valid(related_pmid) else "i",
+            )
 
     for pmid in citing_pmid_with_no_date:
         id_date.add_value(pmid, "")
 
+    valid_pmid.close()
+    id_date.close()
+    id_issn.close()
+    id_orcid.close()
+
     end = timer()
     # print("second process duration: ", end-middle)
     # print("full process duration: ", end-start)
@@ -296,8 +295,17 @@ def main():
         help="Either the directory or the zip file that contains the id-orcid mapping data.",
     )
 
+    arg_parser.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        type=int,
+        default=1,
+        help="The number of processes used to normalise the iCiteMetadata CSV files.",
+    )
+
     args = arg_parser.parse_args()
-    process_noci(args.input, args.output, args.entities, args.orcid)
+    process_noci(args.input, args.output, args.entities, args.orcid, args.workers)
 
 
 # For testing purposes
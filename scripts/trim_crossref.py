@@ -16,11 +16,14 @@
 from argparse import ArgumentParser
 from os import sep, walk, makedirs
 from os.path import isdir, basename
-from json import load, dump, loads
-from collections import deque
+from json import load, dumps, loads
+from functools import partial
 from os.path import exists
+import operator
 import tarfile
 
+from oc.index.utils.pipeline import parallel_map
+
 
 def get_all_files(i_dir_or_targz_file):
     result = []
@@ -71,70 +74,155 @@ def load_json(file, targz_fd, file_idx, len_all_files):
     return result
 
 
-def process(input_dir_or_targz, output_dir, metadata_field, metadata_value):
-    result = {"items": []}
-    idx = 1
-    item_idx = 0
+OPERATORS = {
+    "==": operator.eq,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "!=": operator.ne,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+
+
+def compile_predicate(metadata_field, metadata_value):
+    """It compiles the conditions on the metadata of the Crossref items into a
+    single function. An item satisfies the conditions if at least one of the
+    specified metadata either is not defined in the item or is compared
+    successfully with the related value.
+
+    Args:
+        metadata_field (list): for each condition, the list of the keys to follow
+        for getting the metadata in the item.
+        metadata_value (list): for each condition, the comparison operator and the
+        value to compare.
+
+    Returns:
+        callable: a function that takes an item and returns True if it satisfies
+        the conditions, False otherwise.
+    """
+    predicates = []
+    for path, (op, to_check) in zip(metadata_field, metadata_value):
+        if op not in OPERATORS:
+            print("Error: Comparison operator not found:", op)
+            exit(-1)
+        predicates.append((tuple(path), OPERATORS[op], to_check))
+
+    def predicate(item):
+        for path, compare, to_check in predicates:
+            value = None
+            for key in path:
+                if value is None:
+                    value = item.get(key)
+                else:
+                    value = value.get(key)
+
+            if value is None or compare(value, to_check):
+                return True
+        return False
+
+    return predicate
+
+
+def _trim_file(task, metadata_field, metadata_value):
+    """It returns the items of a JSON file of the Crossref dump with references
+    and satisfying the conditions, each one serialised in JSON."""
+    file, file_idx, len_all_files = task
+    if type(file) is bytes:
+        print("Open file %s of %s (in tar.gz archive)" % (file_idx, len_all_files))
+        json_doc = loads(file.decode("utf-8"))
+    else:
+        json_doc = load_json(file, None, file_idx, len_all_files)
+
+    predicate = compile_predicate(metadata_field, metadata_value)
+    return [
+        dumps(item, ensure_ascii=False)
+        for item in json_doc.get("items", [])
+        if item.get("reference") and predicate(item)
+    ]
+
+
+class _ItemsWriter(object):
+    """It writes serialised items in JSON files containing at most 'max_items'
+    items each, named with increasing numbers, keeping only the file being filled
+    open."""
+
+    def __init__(self, output_dir, max_items=10000):
+        self.__output_dir = output_dir
+        self.__max_items = max_items
+        self.__idx = 0
+        self.__items = 0
+        self.__file = None
+
+    def write(self, item):
+        if self.__file is None:
+            self.__idx += 1
+            self.__file = open(
+                self.__output_dir + sep + str(self.__idx) + ".json",
+                "w",
+                encoding="utf8",
+                buffering=1048576,
+            )
+            self.__file.write('{"items": [')
+        elif self.__items:
+            self.__file.write(", ")
+        self.__file.write(item)
+        self.__items += 1
+
+        if self.__items >= self.__max_items:
+            self.close()
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.write("]}")
+            self.__file.close()
+            self.__file = None
+            self.__items = 0
+
+
+def process(input_dir_or_targz, output_dir, metadata_field, metadata_value, workers=1):
+    """It stores, in JSON files of 10000 items each, the items of the Crossref dump
+    having references and satisfying the conditions on their metadata (see
+    compile_predicate). The files of the dump, or the members of the tar.gz
+    archive, are filtered in parallel.
+
+    Args:
+        input_dir_or_targz (str): either the directory or the tar.gz file
+        containing the Crossref dump.
+        output_dir (str): the directory where the JSON files are stored.
+        metadata_field (list): for each condition, the list of the keys to follow
+        for getting the metadata in the item.
+        metadata_value (list): for each condition, the comparison operator and the
+        value to compare.
+        workers (int, optional): number of processes. Defaults to 1.
+    """
+    # Check the conditions before reading the dump
+    compile_predicate(metadata_field, metadata_value)
 
     if not exists(output_dir):
         makedirs(output_dir)
 
     all_files, targz_fd = get_all_files(input_dir_or_targz)
     len_all_files = len(all_files)
-    for jdx, cur_file in enumerate(all_files):
-        json_doc = load_json(cur_file, targz_fd, jdx + 1, len_all_files)
-
-        for item in json_doc.get("items", []):
-            if "reference" in item and len(item["reference"]) > 0:
-
-                matching = False
-                all_to_get = deque(metadata_field)
-                all_to_check = deque(metadata_value)
-                while not matching and len(all_to_get) > 0:
-                    to_get = deque(all_to_get.popleft())
-                    op, to_check = all_to_check.popleft()
-
-                    value = None
-                    while to_get:
-                        if value is None:
-                            value = item.get(to_get.popleft())
-                        else:
-                            value = value.get(to_get.popleft())
-
-                    if value is None:
-                        matching = True
-                    elif op == "==":
-                        matching = value == to_check
-                    elif op == ">=":
-                        matching = value >= to_check
-                    elif op == "<=":
-                        matching = value <= to_check
-                    elif op == "!=":
-                        matching = value != to_check
-                    elif op == ">":
-                        matching = value > to_check
-                    elif op == "<":
-                        matching = value < to_check
-                    else:
-                        print("Error: Comparison operator not found:", op)
-                        exit(-1)
-
-                if matching:
-                    if item_idx >= 10000:
-                        with open(
-                            output_dir + sep + str(idx) + ".json", "w", encoding="utf8"
-                        ) as g:
-                            dump(result, g, ensure_ascii=False)
-                        result = {"items": []}
-                        item_idx = 0
-                        idx += 1
-
-                    item_idx += 1
-                    result.get("items").append(item)
-
-    if result.get("items"):
-        with open(output_dir + sep + str(idx) + ".json", "w", encoding="utf8") as g:
-            dump(result, g, ensure_ascii=False)
+
+    def tasks():
+        for jdx, cur_file in enumerate(all_files, 1):
+            if targz_fd is None:
+                yield cur_file, jdx, len_all_files
+            else:
+                # The archive is read sequentially only once, in the main process
+                yield targz_fd.extractfile(cur_file).read(), jdx, len_all_files
+
+    writer = _ItemsWriter(output_dir)
+    trim_file = partial(
+        _trim_file, metadata_field=metadata_field, metadata_value=metadata_value
+    )
+    for items in parallel_map(trim_file, tasks(), workers):
+        for item in items:
+            writer.write(item)
+    writer.close()
+
+    if targz_fd is not None:
+        targz_fd.close()
 
 
 def main():
@@ -171,6 +259,14 @@ def main():
         required=True,
         help="The value of the metadata to consider in the comparison",
     )
+    arg_parser.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        type=int,
+        default=1,
+        help="The number of processes used to filter the Crossref dump.",
+    )
 
     args = arg_parser.parse_args()
     metadata_fields = args.metadata_field.split(" ")
@@ -180,7 +276,13 @@ def main():
         metadata_fields = [item.split("=>") for item in metadata_fields]
         metadata_values = [item.split(":", 1) for item in metadata_values]
 
-        process(args.input, args.output, metadata_fields, metadata_values)
+        process(
+            args.input_dir,
+            args.output,
+            metadata_fields,
+            metadata_values,
+            args.workers,
+        )
     else:
         print("Error: different number of metadata fields and values specified.")
 
@@ -4,47 +4,31 @@ import math
 import multiprocessing
 
 from argparse import ArgumentParser
-from subprocess import check_output
 
+from oc.index.oci.lookup import OCILookup
 from oc.index.parsing.base import CitationParser
 from oc.index.utils.config import get_config
 from oc.index.utils.logging import get_logger
 from oc.index.validate.base import CitationValidator
 
 
-def worker_body(input_files, service, oci_dir, moph_dir, queue, pid, multiprocess):
+def worker_body(
+    input_files, service, oci_dir, moph_dir, queue, pid, multiprocess, filter_path=None
+):
     logger = get_logger()
     validator = CitationValidator.get_validator(service)
 
+    # The hash functions of the existing OCIs are loaded once for all the files
+    lookup = OCILookup(oci_dir, moph_dir, filter_path)
+
     result_map = {}
     for filename in input_files:
         query = validator.build_oci_query(filename, result_map, multiprocess)
 
-        # Create input file
-        with open("input" + str(pid) + ".csv", "w") as f:
-            for oci in query:
-                f.write(oci + "\n")
-
         # Compute lookup result
         logger.info("Checking the oci to verify existing ones")
-        query_result = str(
-            check_output(
-                [
-                    "oc.index.lookup",
-                    "-o",
-                    oci_dir,
-                    "-m",
-                    moph_dir,
-                    "-i",
-                    "input" + str(pid) + ".csv",
-                ],
-            ).split()[0]
-        )
-        query_result = query_result[1:].replace("'", "")
-        i = 0
-        for result in query_result.split(","):
-            result_map[query[i]] = int(result) == 1
-            i += 1
+        for oci, exists in zip(query, lookup.exists(query)):
+            result_map[oci] = exists
         logger.info("Result map updated")
 
     queue.put(result_map)
@@ -99,6 +83,14 @@ def main():
         required=True,
         help="The directory where the Crossref citations are stored.",
     )
+    arg_parser.add_argument(
+        "-f",
+        "--filter",
+        dest="filter",
+        default=None,
+        help="Path to the Bloom filter of the existing OCIs, built again whenever "
+        "the OCIs directory changes. Defaults to filter_path in the configuration.",
+    )
 
     logger = get_logger()
 
@@ -124,12 +116,33 @@ def main():
                 if parser.is_valid(file_path):
                     input_files.append(file_path)
 
-    logger.info("Updating OCI lookup table")
-    validator = CitationValidator.get_validator(service)
-    # Update oci lookup synchronous
-    for filename in input_files:
-        validator.build_oci_query(filename, {}, False)
-    logger.info("OCI lookup table updated")
+    # The Bloom filter of the existing OCIs is built only when the archives change,
+    # then it is shared by all the workers
+    filter_path = None
+    if config.getboolean("validate", "filter", fallback=False):
+        filter_path = args.filter
+        if filter_path is None:
+            filter_path = config.get(
+                "validate",
+                "filter_path",
+                fallback="~/.opencitations/index/oci_filter.bin",
+            )
+        filter_path = os.path.expanduser(filter_path)
+        if not OCILookup.is_filter_current(args.oci_dir, filter_path):
+            filter_dir = os.path.dirname(filter_path)
+            if filter_dir and not os.path.exists(filter_dir):
+                os.makedirs(filter_dir)
+            logger.info("Building the Bloom filter of the existing OCIs")
+            bloom_filter = OCILookup.build_filter(
+                args.oci_dir,
+                filter_path,
+                config.getfloat("validate", "filter_error_rate", fallback=0.001),
+                int(config.getfloat("validate", "filter_max_size", fallback=0) * 2**20),
+            )
+            logger.info(
+                f"Bloom filter built, {bloom_filter.size} bytes, "
+                f"error rate {bloom_filter.error_rate}"
+            )
 
     # Extract the result map containing oci => value
     # value is 1 if the citations exists, 0 otherwise.
@@ -152,6 +165,7 @@ def main():
                     queue,
                     tid + 1,
                     multiprocess,
+                    filter_path,
                 ),
             )
             last_index += chunk_size
@@ -168,6 +182,7 @@ def main():
         queue,
         0,
         multiprocess,
+        filter_path,
     )
 
     # Building the oci map with existing info
@@ -178,6 +193,7 @@ def main():
     logger.info("Result map built")
 
     # Validate citations according to the result map
+    validator = CitationValidator.get_validator(service)
     validator.validate_citations(input_files, result_map, args.output)
 
     logger.info(